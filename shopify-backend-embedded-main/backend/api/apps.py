@@ -1,6 +1,22 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        if settings.METRICS_ENABLED:
+            from django.db.backends.signals import connection_created
+            from .utils import metrics
+
+            connection_created.connect(metrics.install_query_recorder, dispatch_uid='api.metrics.install_query_recorder')
+
+        if settings.USE_AWS_SECRET_MANAGER and settings.SECRET_REFRESH_INTERVAL:
+            from backend.aws_secrets_manager import get_provider, update_database_credentials
+
+            provider = get_provider()
+            if update_database_credentials not in provider.listeners:
+                provider.on_change(update_database_credentials)
+            provider.start_refresh(settings.SECRET_REFRESH_INTERVAL)
@@ -1,9 +1,9 @@
 from django.urls import reverse
-from shopify import ApiAccess, Session, session_token
 from rest_framework.response import Response
 from rest_framework import status
-from django.conf import settings
+from django.http import JsonResponse
 from .models import Shop
+from .utils import metrics, session, shop_cache
 
 HTTP_AUTHORIZATION_HEADER = "HTTP_AUTHORIZATION"
 
@@ -15,20 +15,15 @@ def session_token_required(function):
             return Response({"error": "Authorization header is missing"}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            decoded_session_token = session_token.decode_from_header(
-                authorization_header=authorization_header,
-                api_key=settings.SHOPIFY_API_KEY,
-                secret=settings.SHOPIFY_API_SECRET,
-            )
+            with metrics.timed(metrics.AUTH, metrics.SESSION_TOKEN_DURATION):
+                decoded_session_token = session.decode_session_token(authorization_header)
 
-            shop_domain = decoded_session_token.get("dest").removeprefix("https://")
-            api_version = settings.SHOPIFY_API_VERSION
-            access_token = Shop.objects.get(domain=shop_domain).access_token
+                shop_domain = decoded_session_token.get("dest").removeprefix("https://")
+                shop_cache.get_shop_credentials(shop_domain)
 
-            with Session.temp(shop_domain, api_version, access_token):
-                return function(*args, **kwargs, shop_domain=shop_domain)
+            return function(*args, **kwargs, shop_domain=shop_domain)
 
-        except session_token.SessionTokenError:
+        except session.InvalidSessionToken:
             return Response({"error": "Invalid session token"}, status=status.HTTP_401_UNAUTHORIZED)
 
         except Shop.DoesNotExist:
@@ -40,5 +35,33 @@ def session_token_required(function):
     return wrapper
 
 
+def async_session_token_required(function):
+    """Async variant of session_token_required for native async views."""
+    async def wrapper(view, request, *args, **kwargs):
+        authorization_header = get_authorization_header(request)
+
+        if not authorization_header:
+            return JsonResponse({"error": "Authorization header is missing"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            with metrics.timed(metrics.AUTH, metrics.SESSION_TOKEN_DURATION):
+                decoded_session_token = session.decode_session_token(authorization_header)
+                shop_domain = decoded_session_token.get("dest").removeprefix("https://")
+                await shop_cache.aget_shop_credentials(shop_domain)
+
+        except session.InvalidSessionToken:
+            return JsonResponse({"error": "Invalid session token"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        except Shop.DoesNotExist:
+            return JsonResponse({"error": "Shop not found for the provided domain"}, status=status.HTTP_404_NOT_FOUND)
+
+        except Exception as e:
+            return JsonResponse({"error": f"Unable to authenticate session tokens: {str(e)}"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        return await function(view, request, *args, **kwargs, shop_domain=shop_domain)
+
+    return wrapper
+
+
 def get_authorization_header(request):
     return request.META.get(HTTP_AUTHORIZATION_HEADER)
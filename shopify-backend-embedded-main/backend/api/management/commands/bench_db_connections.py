@@ -0,0 +1,55 @@
+import json
+import time
+
+from django.core import signals
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from ...models import Shop
+from .loadtest import summarize
+
+
+class Command(BaseCommand):
+    help = "Compare per-request database latency with connections closed after every request and kept alive."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Simulated requests per run.")
+        parser.add_argument('--queries', type=int, default=2, help="Queries issued per request.")
+        parser.add_argument('--conn-max-age', type=int, default=600, help="CONN_MAX_AGE for the persistent run.")
+
+    def handle(self, *args, **options):
+        original = {key: connection.settings_dict.get(key) for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS')}
+        runs = {
+            'per-request connections': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False},
+            'persistent connections': {'CONN_MAX_AGE': options['conn_max_age'], 'CONN_HEALTH_CHECKS': True},
+        }
+        results = {}
+
+        try:
+            for label, conn_settings in runs.items():
+                connection.close()
+                connection.settings_dict.update(conn_settings)
+                results[label] = self.run(options['requests'], options['queries'])
+        finally:
+            connection.close()
+            connection.settings_dict.update(original)
+
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run(self, requests, queries):
+        latencies = []
+        started = time.perf_counter()
+
+        for _ in range(requests):
+            request_started = time.perf_counter()
+            # The same signals the request handler sends; request_finished closes
+            # the connection unless CONN_MAX_AGE allows it to be reused.
+            signals.request_started.send(sender=self.__class__)
+            for _ in range(queries):
+                Shop.objects.filter(domain='bench.myshopify.com').exists()
+            signals.request_finished.send(sender=self.__class__)
+            latencies.append(time.perf_counter() - request_started)
+
+        summary = summarize(time.perf_counter() - started, sorted(latencies), {})
+        del summary['statuses']
+        return summary
@@ -0,0 +1,50 @@
+import json
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from ...renderers import FastJSONRenderer
+from ...utils import fast_json, loadgen, payloads
+
+
+class Command(BaseCommand):
+    help = "Compare stdlib and orjson-backed JSON for order list rendering and order webhook decoding."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000, help="Operations per scenario.")
+        parser.add_argument('--page-size', type=int, default=250, help="Orders per rendered list page.")
+        parser.add_argument('--line-items', type=int, default=20, help="Line items per webhook body.")
+
+    def handle(self, *args, **options):
+        created_at = int(datetime.now(timezone.utc).timestamp())
+        page = {
+            'orders': [
+                {
+                    'id': i, 'order_id': 5000000000000 + i, 'currency': 'USD',
+                    'current_subtotal_price': Decimal('123.450'), 'created_at': created_at - i,
+                    'shop_id': 1, 'domain': 'bench.myshopify.com',
+                }
+                for i in range(options['page_size'])
+            ],
+            'next_cursor': None,
+        }
+        body = json.dumps(loadgen.order_payload(820982911946154508, '2024-01-01T10:00:00-05:00', options['line_items'])).encode('utf-8')
+        iterations = options['iterations']
+
+        stdlib_renderer, fast_renderer = JSONRenderer(), FastJSONRenderer()
+        self.measure("render page (stdlib)", iterations, lambda: stdlib_renderer.render(page))
+        self.measure("render page (fast)", iterations, lambda: fast_renderer.render(page))
+
+        self.measure("decode webhook (stdlib)", iterations, lambda: json.loads(body))
+        self.measure("decode webhook (fast)", iterations, lambda: fast_json.loads(body))
+        self.measure("decode webhook (typed)", iterations, lambda: payloads.decode_order(body))
+
+    def measure(self, label, iterations, operation):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            operation()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"{label:>24}: {elapsed / iterations * 1e6:,.1f}us/op ({iterations / elapsed:,.0f} ops/sec)")
@@ -0,0 +1,75 @@
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from ...models import Shop, WebhookEvent
+from ...utils import ingest, payloads as order_payloads
+
+
+class Command(BaseCommand):
+    help = "Compare rows/sec of per-request order ingestion against the batched bulk path."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=2000, help="Webhook payloads per path.")
+        parser.add_argument('--batch-size', type=int, default=100, help="Payloads per bulk batch.")
+        parser.add_argument('--duplicates', type=float, default=0.1, help="Fraction of redelivered event ids.")
+
+    def handle(self, *args, **options):
+        current_timestamp = int(time.time())
+        shop = Shop.objects.create(
+            domain=f"bench-{uuid.uuid4().hex[:12]}.myshopify.com",
+            access_token='bench',
+            access_scopes='',
+            created_at=current_timestamp,
+        )
+        order_ids = iter(range(random.randint(10**12, 10**13), 10**14))
+        event_ids = []
+
+        try:
+            payloads = self.make_payloads(shop.domain, order_ids, event_ids, options)
+            started = time.perf_counter()
+            for order, shop_domain, webhook_event_id in payloads:
+                ingest.process_order_webhook(order, shop_domain, webhook_event_id)
+            self.report("per-request", len(payloads), time.perf_counter() - started)
+
+            payloads = self.make_payloads(shop.domain, order_ids, event_ids, options)
+            entries = [(i, *payload) for i, payload in enumerate(payloads)]
+            batch_size = options['batch_size']
+            started = time.perf_counter()
+            for i in range(0, len(entries), batch_size):
+                ingest.ingest_order_batch(entries[i:i + batch_size])
+            self.report(f"batched ({batch_size}/batch)", len(payloads), time.perf_counter() - started)
+
+        finally:
+            WebhookEvent.objects.filter(event_id__in=event_ids).delete()
+            shop.delete()
+            connection.close()
+
+    def make_payloads(self, shop_domain, order_ids, event_ids, options):
+        payloads = []
+        created_at = datetime.now(timezone.utc)
+
+        for _ in range(options['count']):
+            if event_ids and random.random() < options['duplicates']:
+                webhook_event_id = random.choice(event_ids)
+            else:
+                webhook_event_id = str(uuid.uuid4())
+                event_ids.append(webhook_event_id)
+
+            order = order_payloads.OrderPayload(
+                id=next(order_ids),
+                currency='USD',
+                current_subtotal_price=Decimal(random.randint(100, 99999)) / 100,
+                created_at=created_at,
+            )
+            payloads.append((order, shop_domain, webhook_event_id))
+
+        return payloads
+
+    def report(self, label, count, elapsed):
+        self.stdout.write(f"{label:>24}: {count} payloads in {elapsed:.3f}s ({count / elapsed:,.0f} rows/sec)")
@@ -0,0 +1,62 @@
+import time
+import uuid
+
+import jwt
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+
+from ...decorators import session_token_required
+from ...utils import session, shop_cache
+
+
+class Command(BaseCommand):
+    help = "Measure session_token_required overhead with the verified-token cache on and off."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000, help="Decorated calls per run.")
+
+    def handle(self, *args, **options):
+        shop_domain = f"bench-{uuid.uuid4().hex[:12]}.myshopify.com"
+        now = int(time.time())
+        token = jwt.encode(
+            {
+                'iss': f"https://{shop_domain}/admin",
+                'dest': f"https://{shop_domain}",
+                'aud': settings.SHOPIFY_API_KEY,
+                'sub': '1',
+                'exp': now + 60,
+                'nbf': now,
+                'iat': now,
+                'jti': uuid.uuid4().hex,
+                'sid': uuid.uuid4().hex,
+            },
+            settings.SHOPIFY_API_SECRET,
+            algorithm='HS256',
+        )
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        @session_token_required
+        def view(self, request, shop_domain=None):
+            return shop_domain
+
+        # Keep the shop lookup out of the measurement.
+        shop_cache.local_cache.set(shop_domain, (0, 'bench'), ttl=3600)
+
+        try:
+            for enabled in (False, True):
+                session.verified_tokens.clear()
+                with override_settings(SESSION_TOKEN_CACHE_ENABLED=enabled):
+                    assert view(None, request) == shop_domain
+
+                    iterations = options['iterations']
+                    started = time.perf_counter()
+                    for _ in range(iterations):
+                        view(None, request)
+                    elapsed = time.perf_counter() - started
+
+                label = "cache on" if enabled else "cache off"
+                self.stdout.write(f"{label:>9}: {elapsed / iterations * 1e6:.1f} us/call ({iterations / elapsed:,.0f} calls/sec)")
+        finally:
+            shop_cache.local_cache.delete(shop_domain)
+            session.verified_tokens.clear()
@@ -0,0 +1,70 @@
+import base64
+import hashlib
+import hmac
+import io
+import json
+import logging
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import override_settings
+from django.urls import reverse
+
+MIDDLEWARE_PATH = 'api.middleware.WebhookHMACMiddleware'
+
+
+def webhook_environ(url, host, body, hmac_header):
+    return {
+        'REQUEST_METHOD': 'POST', 'PATH_INFO': url, 'SCRIPT_NAME': '', 'QUERY_STRING': '',
+        'SERVER_NAME': host, 'SERVER_PORT': '443', 'HTTP_HOST': host, 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(body)),
+        'HTTP_X_SHOPIFY_HMAC_SHA256': hmac_header,
+        'wsgi.url_scheme': 'https', 'wsgi.input': io.BytesIO(body), 'wsgi.errors': sys.stderr,
+    }
+
+
+class Command(BaseCommand):
+    help = "Measure webhook request throughput for valid and invalid signatures with and without the HMAC middleware."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000, help="Requests per scenario.")
+        parser.add_argument('--body-size', type=int, default=2048, help="Approximate webhook body size in bytes.")
+
+    def handle(self, *args, **options):
+        body = json.dumps({'id': 1, 'padding': 'x' * options['body_size']}).encode('utf-8')
+        signature = base64.b64encode(hmac.new(settings.SHOPIFY_API_SECRET.encode('utf-8'), body, hashlib.sha256).digest()).decode()
+        invalid_signature = base64.b64encode(b'\0' * 32).decode()
+
+        # The compliance webhook does no database work, so only the request path is measured.
+        url = reverse('compliance_webhook')
+        host = next((host for host in settings.ALLOWED_HOSTS if host and host != '*'), 'localhost')
+        without_middleware = [name for name in settings.MIDDLEWARE if name != MIDDLEWARE_PATH]
+
+        # Every rejected request logs a warning; keep that I/O out of the numbers.
+        logging.disable(logging.WARNING)
+        try:
+            self.run(url, host, body, signature, invalid_signature, without_middleware, options['requests'])
+        finally:
+            logging.disable(logging.NOTSET)
+
+    def run(self, url, host, body, signature, invalid_signature, without_middleware, requests):
+        for label, middleware in (('view check', without_middleware), ('middleware', [MIDDLEWARE_PATH, *without_middleware])):
+            with override_settings(MIDDLEWARE=middleware):
+                # Called directly as a WSGI app so test-client overhead stays out of the numbers.
+                handler = WSGIHandler()
+
+                for kind, hmac_header in (('valid', signature), ('invalid', invalid_signature)):
+                    expected = '200 OK' if kind == 'valid' else '400 Bad Request'
+                    statuses = []
+
+                    started = time.perf_counter()
+                    for _ in range(requests):
+                        response = handler(webhook_environ(url, host, body, hmac_header), lambda status, headers: statuses.append(status))
+                        response.close()
+                    elapsed = time.perf_counter() - started
+
+                    assert set(statuses) == {expected}, set(statuses)
+                    self.stdout.write(f"{label:>10} {kind:>7}: {requests / elapsed:,.0f} req/s ({elapsed / requests * 1e6:.0f} us/request)")
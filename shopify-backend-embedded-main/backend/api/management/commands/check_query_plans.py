@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from ...utils import query_plans
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed the database inside a rolled-back transaction and assert via EXPLAIN that hot queries use indexes. "
+        "QueryPlanTests runs the same checks on a smaller seed in the test suite."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shops', type=int, default=5000, help="Shops to seed.")
+        parser.add_argument('--orders', type=int, default=200000, help="Orders to seed.")
+        parser.add_argument('--events', type=int, default=200000, help="Webhook events to seed.")
+
+    def handle(self, *args, **options):
+        failures = []
+
+        try:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    query_plans.seed(cursor, options['shops'], options['orders'], options['events'])
+
+                    for label, query, params, index_prefix in query_plans.hot_queries(options['shops'], options['events']):
+                        indexes, seq_scans = query_plans.explain(cursor, query, params)
+
+                        if not query_plans.uses_index(indexes, seq_scans, index_prefix):
+                            failures.append(label)
+                            self.stdout.write(self.style.ERROR(f"FAIL {label}: indexes={sorted(indexes)} seq_scans={sorted(seq_scans)}"))
+                        else:
+                            self.stdout.write(self.style.SUCCESS(f"ok   {label}: {', '.join(sorted(indexes))}"))
+
+                raise Rollback()
+
+        except Rollback:
+            pass
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot queries are not using their indexes: {', '.join(failures)}")
@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...models import Shop
+from ...utils import pg_copy
+
+
+class Command(BaseCommand):
+    help = "Export a shop's orders to, or load them from, a CSV/NDJSON file using COPY."
+
+    def add_arguments(self, parser):
+        parser.add_argument('direction', choices=['export', 'import'])
+        parser.add_argument('--shop', required=True, help="Shop domain.")
+        parser.add_argument('--format', choices=pg_copy.FORMATS, default=pg_copy.CSV)
+        parser.add_argument('--file', default='-', help="Path to write or read; '-' for stdout/stdin.")
+
+    def handle(self, *args, **options):
+        try:
+            shop = Shop.objects.get(domain=options['shop'])
+        except Shop.DoesNotExist:
+            raise CommandError(f"Unknown shop: {options['shop']}")
+
+        path = options['file']
+        if options['direction'] == 'export':
+            if path == '-':
+                pg_copy.copy_orders_to(shop.id, sys.stdout.buffer, options['format'])
+            else:
+                with open(path, 'wb') as fileobj:
+                    pg_copy.copy_orders_to(shop.id, fileobj, options['format'])
+            return
+
+        if path == '-':
+            stats = pg_copy.copy_orders_from(shop.id, sys.stdin.buffer, options['format'])
+        else:
+            with open(path, 'rb') as fileobj:
+                stats = pg_copy.copy_orders_from(shop.id, fileobj, options['format'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded orders for {shop.domain}: {stats['inserted']} new, {stats['updated']} updated."
+        ))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from ...utils import loadgen
+
+
+class Command(BaseCommand):
+    help = "Run a local fake Shopify Admin API (OAuth, webhooks.json, products.json, orders.json) for load tests."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--products', type=int, default=100, help="Products in the fake catalog.")
+        parser.add_argument('--orders', type=int, default=0, help="Orders the fake shop reports, for reconcile_orders.")
+        parser.add_argument('--latency-ms', type=float, default=0, help="Added to every response.")
+        parser.add_argument('--bucket-size', type=int, default=40, help="REST leaky bucket capacity per access token.")
+        parser.add_argument('--leak-rate', type=float, default=2.0, help="REST calls leaked per second.")
+
+    def handle(self, *args, **options):
+        fake = loadgen.FakeShopify(
+            host=options['host'],
+            port=options['port'],
+            products=options['products'],
+            orders=options['orders'],
+            latency=options['latency_ms'] / 1000,
+            bucket_size=options['bucket_size'],
+            leak_rate=options['leak_rate'],
+        )
+        self.stdout.write(f"Fake Shopify listening on {fake.base_url}; run the app with SHOPIFY_ADMIN_URL={fake.base_url}")
+
+        try:
+            fake.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            fake.server.server_close()
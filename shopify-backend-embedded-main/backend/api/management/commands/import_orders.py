@@ -0,0 +1,59 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...models import Shop
+from ...utils import bulk_import
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Backfill historical orders through Shopify Bulk Operations, resuming unfinished imports."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shop', action='append', default=[], help="Import this shop now; repeatable. Without it, work through scheduled imports.")
+        parser.add_argument('--batch-size', type=int, default=None, help="Orders inserted per transaction.")
+        parser.add_argument('--poll-interval', type=float, default=10.0, help="Seconds to sleep when no import is pending.")
+        parser.add_argument('--once', action='store_true', help="Exit once no import is pending.")
+
+    def handle(self, *args, **options):
+        if options['shop']:
+            for domain in options['shop']:
+                self.import_shop(domain, options['batch_size'])
+            return
+
+        while True:
+            job = bulk_import.claim_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+
+            try:
+                bulk_import.run_import(job, options['batch_size'])
+                self.report(job)
+            except Exception as e:
+                logger.error(f"Order import {job.id} failed and will resume when rescheduled: {e}")
+
+    def import_shop(self, domain, batch_size):
+        try:
+            shop = Shop.objects.get(domain=domain)
+        except Shop.DoesNotExist:
+            raise CommandError(f"Unknown shop: {domain}")
+
+        job = bulk_import.claim_job(bulk_import.schedule_import(shop).id)
+        if job is None:
+            raise CommandError(f"An import for {domain} is already running in another worker.")
+
+        try:
+            bulk_import.run_import(job, batch_size)
+        except Exception as e:
+            raise CommandError(f"Import for {domain} failed at byte {job.offset}; rerun to resume: {e}")
+
+        self.report(job)
+
+    def report(self, job):
+        self.stdout.write(self.style.SUCCESS(f"Order import {job.id} for {job.shop.domain} completed: {job.imported} new orders."))
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime, timezone
+
+import httpx
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.urls import reverse
+
+from ...models import Order, Shop
+from ...utils import ingest, loadgen
+
+SCENARIOS = ('webhooks', 'orders', 'products', 'products_refresh')
+DEFAULT_SCENARIOS = ('webhooks', 'orders', 'products')
+
+
+def percentile(latencies, fraction):
+    if not latencies:
+        return None
+    index = min(len(latencies) - 1, int(round(fraction * (len(latencies) - 1))))
+    return latencies[index]
+
+
+async def run_load(make_request, concurrency, total):
+    """
+    Send total requests with at most concurrency in flight. Returns (elapsed, latencies, status counts).
+
+    make_request(i) returns the (method, url, headers, body) of the i-th request.
+    """
+    latencies = []
+    statuses = {}
+    remaining = iter(range(total))
+
+    async with httpx.AsyncClient(timeout=60, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def worker():
+            for i in remaining:
+                method, url, headers, body = make_request(i)
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, url, headers=headers, content=body)
+                    code = str(response.status_code)
+                except httpx.HTTPError as e:
+                    code = type(e).__name__
+                latencies.append(time.perf_counter() - started)
+                statuses[code] = statuses.get(code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return elapsed, sorted(latencies), statuses
+
+
+def summarize(elapsed, latencies, statuses):
+    return {
+        'requests': len(latencies),
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'latency_ms': {
+            'mean': round(statistics.fmean(latencies) * 1000, 2) if latencies else None,
+            'p50': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+            'p95': round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+            'p99': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        },
+        'statuses': statuses,
+    }
+
+
+def seed_orders(shop, count):
+    """Top the shop up to count orders so list endpoints have pages to serve."""
+    missing = count - Order.objects.filter(shop=shop).count()
+    if missing <= 0:
+        return
+
+    now = int(time.time())
+    first_order_id = int(time.time() * 1000) * 1000
+    rows = [(first_order_id + i, shop.id, 'USD', '199.000', now - i * 60, now - i * 60, 'paid', None) for i in range(missing)]
+    with transaction.atomic():
+        ingest.upsert_orders(rows)
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive concurrent HTTP load at a running server and report throughput and latency percentiles, "
+        "either at a single URL or through the built-in scenarios: signed order webhooks (with redeliveries), "
+        "OrderList and ProductList with minted session tokens. Start the server with SHOPIFY_ADMIN_URL "
+        "pointing at a fake Shopify (see --fake-shopify-port or the fake_shopify command) so nothing reaches Shopify."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', nargs='?', default=None, help="Target URL; omit to run the scenarios instead.")
+        parser.add_argument('--method', default='GET')
+        parser.add_argument('--header', action='append', default=[], help="Extra header as 'Name: value'.")
+        parser.add_argument('--body', default=None, help="Request body.")
+        parser.add_argument('--concurrency', type=int, default=50, help="Requests in flight.")
+        parser.add_argument('--requests', type=int, default=1000, help="Total requests (per scenario).")
+        parser.add_argument('--output', default=None, help="Write the JSON summary to this file.")
+
+        parser.add_argument('--scenario', action='append', choices=SCENARIOS, default=None,
+                            help=f"Scenario to run; repeatable. Defaults to {', '.join(DEFAULT_SCENARIOS)}.")
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help="Server under test.")
+        parser.add_argument('--shop', default='loadtest.myshopify.com', help="Shop created for the run if missing.")
+        parser.add_argument('--seed-orders', type=int, default=1000, help="Orders the shop should have before OrderList runs.")
+        parser.add_argument('--duplicates', type=float, default=0.1, help="Fraction of webhook deliveries that are redeliveries.")
+        parser.add_argument('--line-items', type=int, default=3, help="Line items per webhook payload.")
+        parser.add_argument('--fake-shopify-port', type=int, default=None,
+                            help="Serve a fake Shopify Admin API on this port for the duration of the run.")
+        parser.add_argument('--label', default=None, help="Release or build label recorded in the results.")
+
+    def handle(self, *args, **options):
+        if options['url']:
+            summary = self.run_url(options)
+        else:
+            summary = self.run_scenarios(options)
+
+        output = json.dumps(summary, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        self.stdout.write(output)
+
+    def run_url(self, options):
+        try:
+            headers = dict(header.split(':', 1) for header in options['header'])
+        except ValueError:
+            raise CommandError("Headers must look like 'Name: value'.")
+        headers = {name.strip(): value.strip() for name, value in headers.items()}
+
+        body = options['body'].encode('utf-8') if options['body'] else None
+        request = (options['method'], options['url'], headers, body)
+        summary = summarize(*asyncio.run(run_load(lambda i: request, options['concurrency'], options['requests'])))
+        summary.update(url=options['url'], method=options['method'], concurrency=options['concurrency'])
+        return summary
+
+    def run_scenarios(self, options):
+        shop, _ = Shop.objects.get_or_create(
+            domain=options['shop'],
+            defaults={'access_token': 'loadtest', 'access_scopes': settings.SHOPIFY_API_SCOPES or '', 'created_at': int(time.time())},
+        )
+        seed_orders(shop, options['seed_orders'])
+
+        base_url = options['base_url'].rstrip('/')
+        total = options['requests']
+        authorization = {'Authorization': f"Bearer {loadgen.mint_session_token(shop.domain)}"}
+        deliveries = loadgen.order_webhooks(shop.domain, total, options['duplicates'], options['line_items'])
+
+        requests = {
+            'webhooks': lambda i: ('POST', base_url + reverse('webhook_orders'), deliveries[i][1], deliveries[i][0]),
+            'orders': lambda i: ('GET', base_url + reverse('order_list'), authorization, None),
+            'products': lambda i: ('GET', base_url + reverse('product_list'), authorization, None),
+            'products_refresh': lambda i: ('GET', f"{base_url}{reverse('product_list')}?refresh=1", authorization, None),
+        }
+
+        fake = None
+        if options['fake_shopify_port'] is not None:
+            fake = loadgen.FakeShopify(port=options['fake_shopify_port']).start()
+
+        started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        results = {}
+        try:
+            for scenario in options['scenario'] or DEFAULT_SCENARIOS:
+                self.stderr.write(f"Running {scenario} ({total} requests, concurrency {options['concurrency']})...")
+                results[scenario] = summarize(*asyncio.run(run_load(requests[scenario], options['concurrency'], total)))
+        finally:
+            if fake:
+                fake.stop()
+
+        if 'webhooks' in results:
+            results['webhooks']['redeliveries'] = total - len({headers['X-Shopify-Event-Id'] for _, headers in deliveries})
+
+        return {
+            'label': options['label'],
+            'started_at': started_at,
+            'base_url': base_url,
+            'shop': shop.domain,
+            'concurrency': options['concurrency'],
+            'requests': total,
+            'scenarios': results,
+        }
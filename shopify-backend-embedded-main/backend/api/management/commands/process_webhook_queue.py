@@ -0,0 +1,54 @@
+import logging
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from ...utils import queue
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Drain the queued webhook table with a pool of worker threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Number of worker threads.")
+        parser.add_argument('--batch-size', type=int, default=None, help="Webhooks claimed per transaction.")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty.")
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        workers = [
+            threading.Thread(target=self.work, args=(stop, options), name=f"webhook-worker-{i}")
+            for i in range(options['workers'])
+        ]
+
+        for worker in workers:
+            worker.start()
+
+        try:
+            for worker in workers:
+                while worker.is_alive():
+                    worker.join(timeout=1)
+        except KeyboardInterrupt:
+            stop.set()
+            for worker in workers:
+                worker.join()
+
+    def work(self, stop, options):
+        try:
+            while not stop.is_set():
+                try:
+                    claimed = queue.process_batch(options['batch_size'])
+                except Exception as e:
+                    logger.error(f"Webhook queue worker failed to process batch: {e}")
+                    claimed = 0
+
+                if not claimed:
+                    if options['once']:
+                        return
+                    stop.wait(options['poll_interval'])
+        finally:
+            connection.close()
@@ -0,0 +1,142 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+FIRST_REQUEST_MARKER = '--- first request ---'
+
+# Imported on first use; a worker that loads any of these at startup has regressed.
+DEFERRED_PACKAGES = ('shopify', 'pyactiveresource', 'yaml', 'httpx', 'boto3', 'botocore', 'cryptography')
+
+# Runs in a fresh interpreter: build the WSGI application, then serve one request
+# through it directly so no test-client imports end up in the measurement.
+PROBE = f'''
+import io, json, sys, time
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+loaded = time.perf_counter()
+sys.stderr.write({FIRST_REQUEST_MARKER!r} + "\\n")
+
+path, _, query = sys.argv[1].partition("?")
+host = sys.argv[2]
+statuses = []
+response = application({{
+    "REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": query, "SCRIPT_NAME": "",
+    "SERVER_NAME": host, "SERVER_PORT": "443", "HTTP_HOST": host, "SERVER_PROTOCOL": "HTTP/1.1",
+    "wsgi.url_scheme": "https", "wsgi.input": io.BytesIO(), "wsgi.errors": sys.stderr,
+}}, lambda status, headers, exc_info=None: statuses.append(status))
+b"".join(response)
+served = time.perf_counter()
+print(json.dumps({{
+    "setup_ms": (loaded - started) * 1000,
+    "first_request_ms": (served - loaded) * 1000,
+    "finished_at": time.time(),
+    "status": statuses[0],
+}}))
+'''
+
+
+def parse_importtime(stderr):
+    """Split `-X importtime` output into (startup, first_request) lists of (module, depth, self_us, cumulative_us)."""
+    phases = ([], [])
+    phase = 0
+
+    for line in stderr.splitlines():
+        if line == FIRST_REQUEST_MARKER:
+            phase = 1
+            continue
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+
+        self_us, cumulative_us, module = line.split(':', 1)[1].split('|')
+        # Nesting is shown as two extra spaces per level after the one-space separator.
+        depth = (len(module) - len(module.lstrip()) - 1) // 2
+        phases[phase].append((module.strip(), depth, int(self_us), int(cumulative_us)))
+
+    return phases
+
+
+class Command(BaseCommand):
+    help = "Profile worker cold start: per-package import time and time to first request, with an optional budget."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/v1/shopify/api/login', help="Path of the first request.")
+        parser.add_argument('--runs', type=int, default=3, help="Cold starts to measure; medians are reported.")
+        parser.add_argument('--top', type=int, default=15, help="Packages and modules to list.")
+        parser.add_argument(
+            '--budget-ms', type=float, default=None,
+            help="Fail if median startup import time exceeds this, or a deferred package is imported at startup.",
+        )
+        parser.add_argument('--output', default=None, help="Write the JSON report to this file.")
+
+    def handle(self, *args, **options):
+        host = next((host for host in settings.ALLOWED_HOSTS if host and host != '*'), 'localhost')
+        runs = [self.probe(options['path'], host) for _ in range(options['runs'])]
+
+        startup_imports = runs[-1]['startup_imports']
+        packages = Counter()
+        for module, _, self_us, _ in startup_imports:
+            packages[module.split('.')[0]] += self_us
+
+        report = {
+            'runs': len(runs),
+            'first_request_status': runs[-1]['status'],
+            'median_ms': {
+                key: round(statistics.median(run[key] for run in runs), 1)
+                for key in ('startup_import_ms', 'setup_ms', 'first_request_import_ms', 'first_request_ms', 'time_to_first_request_ms')
+            },
+            'deferred_imported_at_startup': sorted(set(DEFERRED_PACKAGES) & set(packages)),
+            'packages_ms': {name: round(us / 1000, 1) for name, us in packages.most_common(options['top'])},
+            'slowest_modules_ms': {
+                module: round(self_us / 1000, 1)
+                for module, _, self_us, _ in sorted(startup_imports, key=lambda entry: -entry[2])[:options['top']]
+            },
+            # Top-level entries only: their cumulative times already include nested imports.
+            'first_request_imports_ms': {
+                module: round(cumulative_us / 1000, 1)
+                for module, _, _, cumulative_us in sorted(
+                    (entry for entry in runs[-1]['first_request_imports'] if entry[1] == 0), key=lambda entry: -entry[3]
+                )[:options['top']]
+            },
+        }
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        self.stdout.write(output)
+
+        budget = options['budget_ms']
+        startup_import_ms = report['median_ms']['startup_import_ms']
+        if budget is not None and startup_import_ms > budget:
+            raise CommandError(f"Startup import time {startup_import_ms}ms exceeds the {budget}ms budget.")
+        if budget is not None and report['deferred_imported_at_startup']:
+            raise CommandError(f"Imported at startup but meant to load on first use: {', '.join(report['deferred_imported_at_startup'])}")
+
+    def probe(self, path, host):
+        started_at = time.time()
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE, path, host],
+            capture_output=True, text=True, cwd=settings.BASE_DIR, env=os.environ.copy(),
+        )
+        if process.returncode:
+            raise CommandError(f"Startup probe failed:\n{process.stderr[-2000:]}")
+
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        startup_imports, first_request_imports = parse_importtime(process.stderr)
+
+        result.update(
+            startup_imports=startup_imports,
+            first_request_imports=first_request_imports,
+            startup_import_ms=sum(entry[2] for entry in startup_imports) / 1000,
+            first_request_import_ms=sum(entry[2] for entry in first_request_imports) / 1000,
+            time_to_first_request_ms=(result['finished_at'] - started_at) * 1000,
+        )
+        return result
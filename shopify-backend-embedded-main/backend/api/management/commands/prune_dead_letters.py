@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ...utils import queue
+
+
+class Command(BaseCommand):
+    help = "Report dead-lettered queued webhooks and delete those older than the retention window in bounded batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-hours', type=int, default=settings.WEBHOOK_QUEUE_DEAD_LETTER_RETENTION_HOURS)
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows deleted per statement.")
+        parser.add_argument('--sleep', type=float, default=0.0, help="Seconds to pause between batches.")
+        parser.add_argument('--report-only', action='store_true', help="Only report dead letters; delete nothing.")
+
+    def handle(self, *args, **options):
+        for row in queue.dead_letter_summary():
+            age_hours = (int(time.time()) - row['oldest']) / 3600
+            self.stdout.write(f"{row['topic']} for {row['shop_domain']}: {row['count']} dead letters, oldest {age_hours:.0f}h old")
+
+        if options['report_only']:
+            return
+
+        deleted = 0
+        for deleted in queue.prune_dead_letters(options['retention_hours'], options['batch_size']):
+            self.stdout.write(f"Deleted {deleted} dead letters so far.")
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} dead letters older than {options['retention_hours']}h."))
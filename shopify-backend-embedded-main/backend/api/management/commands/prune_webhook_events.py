@@ -0,0 +1,24 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ...utils import dedup
+
+
+class Command(BaseCommand):
+    help = "Delete webhook dedup records older than the retention window in bounded batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-hours', type=int, default=settings.WEBHOOK_EVENT_RETENTION_HOURS)
+        parser.add_argument('--batch-size', type=int, default=10000, help="Rows deleted per statement.")
+        parser.add_argument('--sleep', type=float, default=0.0, help="Seconds to pause between batches.")
+
+    def handle(self, *args, **options):
+        deleted = 0
+        for deleted in dedup.prune_webhook_events(options['retention_hours'], options['batch_size']):
+            self.stdout.write(f"Deleted {deleted} webhook events so far.")
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} webhook events older than {options['retention_hours']}h."))
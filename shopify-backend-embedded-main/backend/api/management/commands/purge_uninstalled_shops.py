@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...models import Shop
+from ...utils import purge
+
+
+class Command(BaseCommand):
+    help = "Delete the data of uninstalled shops in bounded batches, reporting progress."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shop', action='append', default=[], help="Purge this uninstalled shop; repeatable. Defaults to all of them.")
+        parser.add_argument('--batch-size', type=int, default=None, help="Rows deleted per statement.")
+        parser.add_argument('--poll-interval', type=float, default=60.0, help="Seconds to sleep when no shop is waiting.")
+        parser.add_argument('--once', action='store_true', help="Exit once no shop is waiting.")
+
+    def handle(self, *args, **options):
+        while True:
+            shops = purge.uninstalled_shops()
+            if options['shop']:
+                shops = shops.filter(domain__in=options['shop'])
+                missing = set(options['shop']) - set(shops.values_list('domain', flat=True))
+                if missing:
+                    raise CommandError(f"Not uninstalled or unknown: {', '.join(sorted(missing))}")
+
+            purged = [self.purge(shop_id, domain, options['batch_size']) for shop_id, domain in shops.values_list('id', 'domain')]
+
+            if options['once'] or options['shop']:
+                return
+            if not any(purged):
+                time.sleep(options['poll_interval'])
+
+    def purge(self, shop_id, domain, batch_size):
+        for table, deleted in purge.purge_shop(shop_id, batch_size):
+            self.stdout.write(f"{domain}: deleted {deleted} rows from {table}")
+
+        if Shop.objects.filter(id=shop_id).exists():
+            self.stdout.write(self.style.WARNING(f"{domain} was not purged: reinstalled or locked by another worker."))
+            return False
+
+        self.stdout.write(self.style.SUCCESS(f"Purged {domain}."))
+        return True
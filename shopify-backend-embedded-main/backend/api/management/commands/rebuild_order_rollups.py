@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...models import Shop
+from ...utils import rollup
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily order rollups from api_order, one shop per transaction."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shop', action='append', default=[], help="Shop domain to rebuild; repeatable. Defaults to all shops.")
+        parser.add_argument('--chunk-size', type=int, default=50000, help="Order ids aggregated per statement.")
+
+    def handle(self, *args, **options):
+        shops = Shop.objects.order_by('id')
+        if options['shop']:
+            shops = shops.filter(domain__in=options['shop'])
+            missing = set(options['shop']) - set(shops.values_list('domain', flat=True))
+            if missing:
+                raise CommandError(f"Unknown shops: {', '.join(sorted(missing))}")
+
+        for shop_id, domain in shops.values_list('id', 'domain'):
+            for last_id in rollup.rebuild_shop(shop_id, options['chunk_size']):
+                self.stdout.write(f"{domain}: aggregated orders up to id {last_id}")
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt rollups for {domain}."))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...utils import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare each installed shop's orders with Shopify and backfill the ones whose webhooks were missed, "
+        "reconciling shops concurrently. Meant to run nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shop', action='append', default=[], help="Reconcile this shop; repeatable. Defaults to all installed shops.")
+        parser.add_argument('--workers', type=int, default=None, help="Shops reconciled at once.")
+
+    def handle(self, *args, **options):
+        shops = reconcile.installed_shops()
+        if options['shop']:
+            shops = shops.filter(domain__in=options['shop'])
+            missing = set(options['shop']) - set(shop.domain for shop in shops)
+            if missing:
+                raise CommandError(f"Not installed or unknown: {', '.join(sorted(missing))}")
+
+        failed = []
+        totals = {'inserted': 0, 'updated': 0}
+
+        for shop, stats, error in reconcile.reconcile_shops(list(shops), options['workers']):
+            if error is not None:
+                failed.append(shop.domain)
+                self.stderr.write(f"{shop.domain}: failed: {error}")
+            elif stats is None:
+                self.stdout.write(self.style.WARNING(f"{shop.domain}: skipped, being reconciled by another worker."))
+            else:
+                totals['inserted'] += stats['inserted']
+                totals['updated'] += stats['updated']
+                self.stdout.write(f"{shop.domain}: {stats['inserted']} missing orders stored, {stats['updated']} updated")
+
+        self.stdout.write(self.style.SUCCESS(f"Reconciled orders: {totals['inserted']} missing, {totals['updated']} updated."))
+        if failed:
+            raise CommandError(f"Reconciliation failed for {len(failed)} shops; they keep their checkpoints: {', '.join(sorted(failed))}")
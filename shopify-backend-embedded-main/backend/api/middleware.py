@@ -0,0 +1,158 @@
+import logging
+import time
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+from django.urls import resolve, reverse
+
+from .utils import metrics, registration, webhook
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_URL_NAMES = (
+    {url_name for _, url_name in registration.WEBHOOK_SUBSCRIPTIONS + registration.RETIRED_SUBSCRIPTIONS}
+    | {'compliance_webhook'}
+)
+
+
+class MetricsMiddleware:
+    """
+    Record per-route latency, database query count and time, and Shopify call latency.
+
+    The numbers go to the process-wide registry served at /metrics and, with
+    SERVER_TIMING_HEADER on, to a Server-Timing header on every response. Queries run
+    while a streaming response is consumed happen after the response is returned and
+    are not counted. First in MIDDLEWARE so webhook requests are measured too.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    HTTP_METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'})
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def observe(self, request, response, timings, started):
+        elapsed = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        # Route patterns keep label cardinality bounded; unmatched paths share one label.
+        route = match.route if match else 'unmatched'
+        method = request.method if request.method in self.HTTP_METHODS else 'other'
+        metrics.observe_request(route, method, response.status_code, elapsed, timings)
+
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = timings.server_timing(elapsed)
+        return response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        timings = metrics.RequestTimings()
+        token = metrics.current_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current_timings.reset(token)
+        return self.observe(request, response, timings, started)
+
+    async def __acall__(self, request):
+        timings = metrics.RequestTimings()
+        token = metrics.current_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current_timings.reset(token)
+        return self.observe(request, response, timings, started)
+
+
+class WebhookHMACMiddleware:
+    """
+    Verify Shopify webhook signatures before the rest of the middleware stack runs.
+
+    POSTs to webhook URLs with a missing or bad X-Shopify-Hmac-Sha256 are rejected without
+    touching sessions or the database. Verified ones are marked and dispatched straight to
+    their view, skipping the session, auth, CSRF and messages middleware they don't use.
+    Must come before everything in MIDDLEWARE except MetricsMiddleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self._webhook_paths = None
+
+    @property
+    def webhook_paths(self):
+        # Resolved on first use so the URLconf isn't imported while the handler loads.
+        if self._webhook_paths is None:
+            self._webhook_paths = frozenset(reverse(url_name) for url_name in WEBHOOK_URL_NAMES)
+        return self._webhook_paths
+
+    def reject(self, request):
+        """Return a 400 response unless the request carries a valid signature; mark it verified otherwise."""
+        # Keep the ALLOWED_HOSTS check that CommonMiddleware would otherwise have done.
+        request.get_host()
+
+        if webhook.validate_hmac_header(request):
+            setattr(request, webhook.VERIFIED_ATTRIBUTE, True)
+            return None
+
+        logger.warning(f"Rejected webhook with invalid signature: {request.path}")
+        return JsonResponse({"error": "Invalid webhook signature"}, status=400)
+
+    def resolve(self, request):
+        match = resolve(request.path_info)
+        request.resolver_match = match
+        return match
+
+    @staticmethod
+    def render(response):
+        if hasattr(response, 'render') and callable(response.render):
+            response = response.render()
+        return response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        if request.method != 'POST' or request.path not in self.webhook_paths:
+            return self.get_response(request)
+
+        rejection = self.reject(request)
+        if rejection:
+            return rejection
+
+        match = self.resolve(request)
+        view = async_to_sync(match.func) if iscoroutinefunction(match.func) else match.func
+        return self.render(view(request, *match.args, **match.kwargs))
+
+    async def __acall__(self, request):
+        if request.method != 'POST' or request.path not in self.webhook_paths:
+            return await self.get_response(request)
+
+        rejection = self.reject(request)
+        if rejection:
+            return rejection
+
+        match = self.resolve(request)
+        if iscoroutinefunction(match.func):
+            return await match.func(request, *match.args, **match.kwargs)
+
+        view = sync_to_async(lambda *args, **kwargs: self.render(match.func(*args, **kwargs)))
+        return await view(request, *match.args, **match.kwargs)
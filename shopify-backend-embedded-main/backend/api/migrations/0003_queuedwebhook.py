@@ -0,0 +1,28 @@
+# Generated by Django 5.1.2 on 2026-10-18 18:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_webhookevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedWebhook',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(max_length=255)),
+                ('shop_domain', models.CharField(max_length=255)),
+                ('event_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('headers', models.JSONField(default=dict)),
+                ('body', models.BinaryField()),
+                ('attempts', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.BigIntegerField()),
+                ('available_at', models.BigIntegerField()),
+            ],
+        ),
+    ]
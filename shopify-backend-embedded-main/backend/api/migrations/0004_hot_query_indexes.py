@@ -0,0 +1,32 @@
+# Generated by Django 5.1.2 on 2026-10-18 18:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_queuedwebhook'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='shop',
+            name='domain',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['shop', '-created_at', '-id'], name='api_order_shop_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='webhookevent',
+            index=models.Index(fields=['created_at'], name='api_webhookevent_created_idx'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='shop',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='api.shop'),
+        ),
+    ]
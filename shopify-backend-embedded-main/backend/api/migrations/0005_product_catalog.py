@@ -0,0 +1,34 @@
+# Generated by Django 5.1.2 on 2026-10-18 18:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shop',
+            name='products_synced_at',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.BigIntegerField(unique=True)),
+                ('title', models.CharField(max_length=255)),
+                ('data', models.JSONField()),
+                ('updated_at', models.BigIntegerField()),
+                ('synced_at', models.BigIntegerField()),
+                ('shop', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='api.shop')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['shop', 'product_id'], name='api_product_shop_product_idx')],
+            },
+        ),
+    ]
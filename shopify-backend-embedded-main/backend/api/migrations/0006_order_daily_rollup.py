@@ -0,0 +1,28 @@
+# Generated by Django 5.1.2 on 2026-10-18 19:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_product_catalog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('currency', models.CharField(max_length=3)),
+                ('order_count', models.BigIntegerField(default=0)),
+                ('subtotal_sum', models.DecimalField(decimal_places=3, default=0, max_digits=18)),
+                ('shop', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='api.shop')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('shop', 'day', 'currency'), name='api_orderdailyrollup_shop_day_currency')],
+            },
+        ),
+    ]
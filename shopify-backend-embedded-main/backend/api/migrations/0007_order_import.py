@@ -0,0 +1,29 @@
+# Generated by Django 5.1.2 on 2026-10-18 19:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_order_daily_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=16)),
+                ('bulk_operation_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('result_url', models.TextField(blank=True, null=True)),
+                ('offset', models.BigIntegerField(default=0)),
+                ('imported', models.BigIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.BigIntegerField()),
+                ('updated_at', models.BigIntegerField()),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.shop')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 19:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_order_import'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shop',
+            name='uninstalled_at',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
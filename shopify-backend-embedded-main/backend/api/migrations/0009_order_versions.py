@@ -0,0 +1,28 @@
+# Generated by Django 5.1.2 on 2026-10-18 19:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_shop_uninstalled_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='cancelled_at',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='financial_status',
+            field=models.CharField(db_default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='updated_at',
+            field=models.BigIntegerField(db_default=0),
+        ),
+    ]
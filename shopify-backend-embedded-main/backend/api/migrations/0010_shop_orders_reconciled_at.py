@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 19:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_order_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shop',
+            name='orders_reconciled_at',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
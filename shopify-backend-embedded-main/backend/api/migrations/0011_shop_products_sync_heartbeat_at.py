@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 19:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_shop_orders_reconciled_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shop',
+            name='products_sync_heartbeat_at',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
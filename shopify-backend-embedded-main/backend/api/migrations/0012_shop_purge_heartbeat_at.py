@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 20:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_shop_products_sync_heartbeat_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shop',
+            name='purge_heartbeat_at',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
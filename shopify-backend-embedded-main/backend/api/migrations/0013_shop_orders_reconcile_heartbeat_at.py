@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 20:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_shop_purge_heartbeat_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shop',
+            name='orders_reconcile_heartbeat_at',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.2 on 2026-10-18 20:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_shop_orders_reconcile_heartbeat_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RedactedOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shop_domain', models.CharField(max_length=255)),
+                ('order_id', models.BigIntegerField(unique=True)),
+                ('redacted_at', models.BigIntegerField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['shop_domain'], name='api_redactedorder_shop_idx')],
+            },
+        ),
+    ]
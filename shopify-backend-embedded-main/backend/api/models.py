@@ -1,12 +1,23 @@
 from django.db import models
 
 class Shop(models.Model):
-    domain = models.CharField(max_length=255)
+    domain = models.CharField(max_length=255, unique=True)
     access_token = models.CharField(max_length=255)
     access_scopes = models.TextField()
 
     created_at = models.BigIntegerField()
     updated_at = models.BigIntegerField(null=True, blank=True)
+    products_synced_at = models.BigIntegerField(null=True, blank=True)
+    # Lease on the catalog sync: set when one starts, bumped every page, cleared when it ends.
+    products_sync_heartbeat_at = models.BigIntegerField(null=True, blank=True)
+    # When the last order reconciliation started; the next one lists orders updated since then.
+    orders_reconciled_at = models.BigIntegerField(null=True, blank=True)
+    # Lease on order reconciliation: set when a worker starts it, bumped every page, cleared when it ends.
+    orders_reconcile_heartbeat_at = models.BigIntegerField(null=True, blank=True)
+    # Set when the app is uninstalled; the shop's data is purged in the background.
+    uninstalled_at = models.BigIntegerField(null=True, blank=True)
+    # Lease on the purge: set when a worker starts it, bumped every batch, cleared if it stops early.
+    purge_heartbeat_at = models.BigIntegerField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.domain}"
@@ -14,20 +25,128 @@ class Shop(models.Model):
 
 class Order(models.Model):
     order_id = models.BigIntegerField(unique=True)
-    shop = models.ForeignKey(Shop, on_delete=models.CASCADE)
+    # Covered by the leading column of api_order_shop_created_idx.
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, db_index=False)
     currency = models.CharField(max_length=3)
     current_subtotal_price = models.DecimalField(max_digits=10, decimal_places=3)
+    financial_status = models.CharField(max_length=32, db_default='')
 
     created_at = models.BigIntegerField()
+    # Shopify's 'updated_at' for the stored version; webhooks carrying an older one are dropped.
+    # Database defaults, so rows loaded by raw SQL without them are overwritten by any webhook.
+    updated_at = models.BigIntegerField(db_default=0)
+    cancelled_at = models.BigIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['shop', '-created_at', '-id'], name='api_order_shop_created_idx'),
+        ]
 
     def __str__(self):
         return f"order {self.order_id}"
 
 
+class RedactedOrder(models.Model):
+    # Tombstone of an order deleted by a customers/redact request; no webhook, reconciliation,
+    # import or COPY load stores it again. Kept by domain so it outlives a purge and reinstall.
+    shop_domain = models.CharField(max_length=255)
+    order_id = models.BigIntegerField(unique=True)
+
+    redacted_at = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['shop_domain'], name='api_redactedorder_shop_idx'),
+        ]
+
+    def __str__(self):
+        return f"redacted order {self.order_id}"
+
+
+class OrderDailyRollup(models.Model):
+    # Covered by the leading column of api_orderdailyrollup_shop_day_currency.
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, db_index=False)
+    day = models.DateField()
+    currency = models.CharField(max_length=3)
+    order_count = models.BigIntegerField(default=0)
+    subtotal_sum = models.DecimalField(max_digits=18, decimal_places=3, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['shop', 'day', 'currency'], name='api_orderdailyrollup_shop_day_currency'),
+        ]
+
+    def __str__(self):
+        return f"{self.shop_id} {self.day} {self.currency}"
+
+
+class Product(models.Model):
+    product_id = models.BigIntegerField(unique=True)
+    # Covered by the leading column of api_product_shop_product_idx.
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, db_index=False)
+    title = models.CharField(max_length=255)
+    data = models.JSONField()
+
+    updated_at = models.BigIntegerField()
+    synced_at = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['shop', 'product_id'], name='api_product_shop_product_idx'),
+        ]
+
+    def __str__(self):
+        return f"product {self.product_id}"
+
+
 class WebhookEvent(models.Model):
     event_id = models.CharField(unique=True)
     
     created_at = models.BigIntegerField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='api_webhookevent_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.event_id}"
+
+
+class QueuedWebhook(models.Model):
+    topic = models.CharField(max_length=255)
+    shop_domain = models.CharField(max_length=255)
+    event_id = models.CharField(max_length=255, null=True, blank=True)
+    headers = models.JSONField(default=dict)
+    body = models.BinaryField()
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+
+    created_at = models.BigIntegerField()
+    available_at = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.topic} {self.event_id}"
+
+
+class OrderImport(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (COMPLETED, 'Completed'), (FAILED, 'Failed')]
+
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    bulk_operation_id = models.CharField(max_length=255, null=True, blank=True)
+    result_url = models.TextField(null=True, blank=True)
+    # Byte offset into the result file up to which orders have been committed.
+    offset = models.BigIntegerField(default=0)
+    imported = models.BigIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+
+    created_at = models.BigIntegerField()
+    updated_at = models.BigIntegerField()
+
+    def __str__(self):
+        return f"order import {self.id} for {self.shop_id} ({self.status})"
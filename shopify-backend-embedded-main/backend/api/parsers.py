@@ -0,0 +1,14 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from .utils import fast_json
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser backed by orjson for request bodies, keeping large integers exact."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return fast_json.loads(stream.read())
+        except ValueError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
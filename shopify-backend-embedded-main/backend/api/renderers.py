@@ -0,0 +1,23 @@
+from rest_framework.renderers import JSONRenderer
+
+from .utils import fast_json
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson. Decimals, dates and other encoder types are rendered as
+    JSONRenderer renders them; the output parses to the same data but is not byte-identical,
+    e.g. floats are written in orjson's shortest form (1e20 where JSONRenderer writes 1e+20).
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        # Indented output is for humans; leave it to the stdlib path.
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = fast_json.dumps(data, encoder=self.encoder_class)
+        # Escaped for the same reason as JSONRenderer: these are not valid inside JavaScript strings.
+        return ret.replace('\u2028'.encode('utf-8'), b'\\u2028').replace('\u2029'.encode('utf-8'), b'\\u2029')
@@ -1,3 +1,837 @@
-from django.test import TestCase
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.db.models import Sum
+from django.http import JsonResponse
+from django.test import (
+    AsyncRequestFactory, Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+
+from . import middleware
+from .models import Order, OrderDailyRollup, OrderImport, Product, QueuedWebhook, Shop, WebhookEvent
+from .renderers import FastJSONRenderer
+from .utils import (
+    bulk_import, callback, catalog, db, dedup, fast_json, ingest, loadgen, metrics, payloads, pg_copy, purge,
+    query_plans, queue, rate_limit, reconcile, registration, shop_cache, shopify_client,
+)
+from .views import order, product
+
+
+def queued_webhook(attempts=0, age_hours=0, **fields):
+    created_at = int(time.time()) - age_hours * 3600
+    return QueuedWebhook.objects.create(
+        topic=fields.pop('topic', 'orders/create'), shop_domain='shop.myshopify.com', body=b'{}',
+        attempts=attempts, created_at=created_at, available_at=created_at, **fields,
+    )
+
+
+@override_settings(WEBHOOK_QUEUE_MAX_ATTEMPTS=3, WEBHOOK_QUEUE_DEAD_LETTER_RETENTION_HOURS=24)
+class DeadLetterTests(TestCase):
+    def test_prune_deletes_only_expired_dead_letters(self):
+        expired = queued_webhook(attempts=3, age_hours=48)
+        recent = queued_webhook(attempts=3, age_hours=1)
+        retrying = queued_webhook(attempts=2, age_hours=48)
+
+        *_, deleted = queue.prune_dead_letters(batch_size=1)
+
+        self.assertEqual(deleted, 1)
+        self.assertQuerySetEqual(
+            QueuedWebhook.objects.order_by('id').values_list('id', flat=True), [recent.id, retrying.id],
+        )
+        self.assertFalse(QueuedWebhook.objects.filter(id=expired.id).exists())
+
+    def test_summary_counts_dead_letters_per_topic_and_shop(self):
+        queued_webhook(attempts=3, age_hours=2)
+        queued_webhook(attempts=4, age_hours=5)
+        queued_webhook(attempts=3, topic='products/update')
+        queued_webhook(attempts=1)
+
+        summary = list(queue.dead_letter_summary())
+
+        self.assertEqual([(row['topic'], row['count']) for row in summary], [('orders/create', 2), ('products/update', 1)])
+        self.assertLessEqual(summary[0]['oldest'], int(time.time()) - 5 * 3600)
+
+    def test_command_report_only_keeps_rows(self):
+        queued_webhook(attempts=3, age_hours=48)
+
+        call_command('prune_dead_letters', '--report-only', stdout=StringIO())
+        self.assertEqual(QueuedWebhook.objects.count(), 1)
+
+        call_command('prune_dead_letters', stdout=StringIO())
+        self.assertEqual(QueuedWebhook.objects.count(), 0)
+
+
+class OrderStreamTests(TestCase):
+    QUERY = 'SELECT order_id FROM api_order WHERE shop_id = %s ORDER BY order_id'
+
+    def setUp(self):
+        self.shop = Shop.objects.create(domain='stream.myshopify.com', access_token='token', access_scopes='', created_at=1)
+        Order.objects.bulk_create([
+            Order(order_id=order_id, shop=self.shop, currency='USD', current_subtotal_price=1, created_at=1)
+            for order_id in range(1, 6)
+        ])
+
+    def test_pgbouncer_mode_fetches_from_a_declared_cursor(self):
+        with mock.patch.dict(connection.settings_dict, {'DISABLE_SERVER_SIDE_CURSORS': True}):
+            with CaptureQueriesContext(connection) as queries:
+                rows = list(db.stream_dictfetchall(self.QUERY, [self.shop.id], chunk_size=2))
+
+        self.assertEqual([row['order_id'] for row in rows], [1, 2, 3, 4, 5])
+        statements = [query['sql'].split()[0] for query in queries]
+        self.assertEqual(statements.count('DECLARE'), 1)
+        self.assertEqual(statements.count('FETCH'), 4)
+
+    def test_server_side_cursor_mode(self):
+        rows = list(db.stream_dictfetchall(self.QUERY, [self.shop.id], chunk_size=2))
+
+        self.assertEqual([row['order_id'] for row in rows], [1, 2, 3, 4, 5])
+
+
+class AsyncIterateTests(SimpleTestCase):
+    def test_yields_each_item_and_closes_the_iterator(self):
+        closed = []
+
+        def numbers():
+            try:
+                yield from range(5)
+            finally:
+                closed.append(True)
+
+        async def take(count):
+            items = []
+            stream = db.aiterate(numbers())
+            async for item in stream:
+                items.append(item)
+                if len(items) == count:
+                    break
+            await stream.aclose()
+            return items
+
+        self.assertEqual(asyncio.run(take(10)), [0, 1, 2, 3, 4])
+        self.assertEqual(asyncio.run(take(2)), [0, 1])
+        self.assertEqual(closed, [True, True])
+
+
+class QueryPlanTests(TestCase):
+    """Hot queries must keep using their indexes; fails when a migration or query change loses one."""
+
+    SHOPS, ORDERS, EVENTS = 2000, 50000, 50000
+
+    def test_hot_queries_use_indexes(self):
+        with connection.cursor() as cursor:
+            query_plans.seed(cursor, self.SHOPS, self.ORDERS, self.EVENTS)
+
+            for label, query, params, index_prefix in query_plans.hot_queries(self.SHOPS, self.EVENTS):
+                with self.subTest(label):
+                    indexes, seq_scans = query_plans.explain(cursor, query, params)
+                    self.assertTrue(
+                        query_plans.uses_index(indexes, seq_scans, index_prefix),
+                        f"expected {index_prefix}*, got indexes={sorted(indexes)} seq_scans={sorted(seq_scans)}",
+                    )
+
+
+class BloomDedupTests(TestCase):
+    def recent_events(self, refresh_interval=3600):
+        return dedup.RecentEvents(capacity=1000, error_rate=0.001, window=3600, refresh_interval=refresh_interval)
+
+    def test_seeded_from_events_recorded_before_start(self):
+        WebhookEvent.objects.create(event_id='recorded-elsewhere', created_at=int(time.time()) - 60)
+
+        with mock.patch.object(dedup, 'recent_events', self.recent_events()):
+            self.assertEqual(dedup.filter_seen(['recorded-elsewhere', 'new']), {'recorded-elsewhere'})
+
+    def test_refresh_picks_up_events_from_other_workers(self):
+        recent_events = self.recent_events(refresh_interval=0)
+
+        with mock.patch.object(dedup, 'recent_events', recent_events):
+            self.assertEqual(dedup.filter_seen(['later']), set())
+            WebhookEvent.objects.create(event_id='later', created_at=int(time.time()))
+            self.assertEqual(dedup.filter_seen(['later']), {'later'})
+
+    def test_fresh_filter_skips_the_query_for_unknown_ids(self):
+        with mock.patch.object(dedup, 'recent_events', self.recent_events()):
+            dedup.filter_seen(['warm-up'])
+            with self.assertNumQueries(0):
+                self.assertEqual(dedup.filter_seen(['never-recorded']), set())
+
+
+class FakeShopifyMixin:
+    """Runs a FakeShopify for each test and points the Admin API client at it."""
+
+    fake_options = {}
+
+    def setUp(self):
+        self.fake = loadgen.FakeShopify(**self.fake_options).start()
+        self.addCleanup(self.fake.stop)
+
+        admin_url = override_settings(SHOPIFY_ADMIN_URL=self.fake.base_url, SHOPIFY_RETRY_BACKOFF=0.01)
+        admin_url.enable()
+        self.addCleanup(admin_url.disable)
+
+        # Buckets are per shop; a fresh limiter keeps tests from sharing their state.
+        limiter = mock.patch.object(rate_limit, 'scheduler', rate_limit.RateLimiter(headroom=0.1))
+        limiter.start()
+        self.addCleanup(limiter.stop)
+
+
+class WebhookRegistrationTests(FakeShopifyMixin, SimpleTestCase):
+    shop = 'register.myshopify.com'
+
+    def registered_topics(self):
+        return sorted(webhook['topic'] for webhook in self.fake.webhooks)
+
+    def test_registers_every_subscription_once(self):
+        created = registration.register_webhooks(self.shop, 'token')
+
+        expected = sorted(topic for topic, _ in registration.WEBHOOK_SUBSCRIPTIONS)
+        self.assertEqual(sorted(created), expected)
+        self.assertEqual(self.registered_topics(), expected)
+        self.assertEqual(registration.register_webhooks(self.shop, 'token'), [])
+        self.assertEqual(len(self.fake.webhooks), len(expected))
+
+    def test_partial_failure_registers_the_rest_and_retries_later(self):
+        self.fake.failing_topics = {'orders/paid'}
+
+        created = registration.register_webhooks(self.shop, 'token')
+
+        self.assertNotIn('orders/paid', created)
+        self.assertEqual(len(created), len(registration.WEBHOOK_SUBSCRIPTIONS) - 1)
+
+        self.fake.failing_topics = set()
+        self.assertEqual(registration.register_webhooks(self.shop, 'token'), ['orders/paid'])
+
+    def test_async_registration_matches_sync(self):
+        self.fake.failing_topics = {'app/uninstalled'}
+
+        created = asyncio.run(registration.aregister_webhooks(self.shop, 'token'))
+
+        self.assertEqual(
+            sorted(created),
+            sorted(topic for topic, _ in registration.WEBHOOK_SUBSCRIPTIONS if topic != 'app/uninstalled'),
+        )
+
+    def test_reinstall_replaces_the_retired_order_create_subscription(self):
+        retired = callback.get_api_endpoint('webhook_order_create')
+        self.fake.webhooks = [{'id': 7, 'topic': 'orders/create', 'address': retired, 'format': 'json'}]
+
+        registration.register_webhooks(self.shop, 'token')
+
+        self.assertNotIn(('orders/create', retired), {(webhook['topic'], webhook['address']) for webhook in self.fake.webhooks})
+        self.assertEqual(self.registered_topics(), sorted(topic for topic, _ in registration.WEBHOOK_SUBSCRIPTIONS))
+
+    def test_retired_subscription_stays_until_its_replacement_exists(self):
+        retired = callback.get_api_endpoint('webhook_order_create')
+        self.fake.webhooks = [{'id': 7, 'topic': 'orders/create', 'address': retired, 'format': 'json'}]
+        self.fake.failing_topics = {'orders/create'}
+
+        asyncio.run(registration.aregister_webhooks(self.shop, 'token'))
+        self.assertIn(7, [webhook['id'] for webhook in self.fake.webhooks])
+
+        self.fake.failing_topics = set()
+        asyncio.run(registration.aregister_webhooks(self.shop, 'token'))
+        self.assertNotIn(7, [webhook['id'] for webhook in self.fake.webhooks])
+
+    def test_retired_webhook_url_takes_the_signature_fast_path(self):
+        rejected = JsonResponse({"error": "Invalid webhook signature"}, status=400)
+
+        with mock.patch.object(middleware.WebhookHMACMiddleware, 'reject', return_value=rejected) as reject:
+            response = Client().post(reverse('webhook_order_create'), b'{}', content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+        reject.assert_called_once()
+
+
+class ThrottlingTests(FakeShopifyMixin, SimpleTestCase):
+    shop = 'throttle.myshopify.com'
+    fake_options = {'bucket_size': 10, 'leak_rate': 5.0}
+
+    def fill_fake_bucket(self, token):
+        self.fake.buckets[token] = (float(self.fake.bucket_size), time.monotonic())
+
+    def test_throttled_call_waits_retry_after_once(self):
+        self.fill_fake_bucket('token')
+
+        started = time.monotonic()
+        response = shopify_client.request('GET', self.shop, 'token', 'orders/count.json')
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(response.status_code, 200)
+        # FakeShopify answers Retry-After: 1.0; sleeping it and then waiting out a full bucket took twice that.
+        self.assertGreaterEqual(elapsed, 1.0)
+        self.assertLess(elapsed, 1.5)
+        stats = rate_limit.scheduler.metrics()[self.shop][rate_limit.REST]
+        self.assertEqual(stats['throttled'], 1)
+        self.assertEqual(stats['requests'], 2)
+
+    def test_retry_after_holds_other_calls_for_the_shop(self):
+        rate_limit.scheduler.record_throttle(self.shop, rate_limit.REST, retry_after=0.3)
+
+        self.assertAlmostEqual(rate_limit.scheduler.reserve(self.shop), 0.3, delta=0.05)
+        self.assertEqual(rate_limit.scheduler.reserve('other.myshopify.com'), 0)
+        self.assertGreaterEqual(rate_limit.scheduler.acquire(self.shop), 0.25)
+
+    def test_rest_calls_stay_under_the_bucket(self):
+        for _ in range(25):
+            shopify_client.request('GET', self.shop, 'token', 'orders/count.json')
+
+        self.assertEqual(rate_limit.scheduler.metrics()[self.shop][rate_limit.REST]['throttled'], 0)
+
+    def test_graphql_report_never_lowers_the_level(self):
+        limiter = rate_limit.scheduler
+        status = {'maximumAvailable': 1000, 'currentlyAvailable': 900, 'restoreRate': 50}
+        limiter.update_graphql(self.shop, status)
+        limiter.reserve(self.shop, rate_limit.GRAPHQL, cost=500)
+
+        limiter.update_graphql(self.shop, dict(status, currentlyAvailable=1000))
+
+        self.assertGreater(limiter.metrics()[self.shop][rate_limit.GRAPHQL]['level'], 550)
+
+        limiter.update_graphql(self.shop, dict(status, currentlyAvailable=100))
+        self.assertGreaterEqual(limiter.metrics()[self.shop][rate_limit.GRAPHQL]['level'], 899)
+
+    def test_graphql_throttle_fills_the_bucket(self):
+        rate_limit.scheduler.record_throttle(self.shop, rate_limit.GRAPHQL)
+
+        stats = rate_limit.scheduler.metrics()[self.shop][rate_limit.GRAPHQL]
+        self.assertEqual(stats['throttled'], 1)
+        self.assertGreater(stats['utilization'], 0.99)
+
+    def test_bucket_state_is_exposed_per_shop(self):
+        rate_limit.scheduler.record_throttle(self.shop, rate_limit.GRAPHQL)
+
+        exposition = metrics.registry.expose()
+
+        self.assertIn('# TYPE shopify_rate_limit_throttled_total counter', exposition)
+        self.assertIn(f'shopify_rate_limit_throttled_total{{shop="{self.shop}",api="graphql"}} 1\n', exposition)
+        self.assertIn(f'shopify_rate_limit_utilization{{shop="{self.shop}",api="graphql"}} ', exposition)
+
+
+class BulkImportTests(FakeShopifyMixin, TestCase):
+    fake_options = {'orders': 7}
+
+    def setUp(self):
+        super().setUp()
+        self.shop = Shop.objects.create(domain='import.myshopify.com', access_token='token', access_scopes='', created_at=1)
+
+    def result_url(self):
+        job = OrderImport(shop=self.shop, bulk_operation_id=bulk_import.start_bulk_operation(self.shop))
+        return bulk_import.wait_for_bulk_operation(job)
+
+    def failing_upserts(self, fail_on_call):
+        """Patch upsert_orders to raise on its fail_on_call'th call, as a worker dying mid-import would."""
+        upsert_orders, calls = ingest.upsert_orders, []
+
+        def upsert(rows):
+            calls.append(rows)
+            if len(calls) == fail_on_call:
+                raise RuntimeError("worker stopped")
+            return upsert_orders(rows)
+
+        return mock.patch.object(ingest, 'upsert_orders', upsert)
+
+    def run_failing_import(self):
+        job = bulk_import.claim_job(bulk_import.schedule_import(self.shop).id)
+        with self.failing_upserts(2), self.assertRaises(RuntimeError):
+            bulk_import.run_import(job, batch_size=3)
+        return OrderImport.objects.get(id=job.id)
+
+    def test_result_lines_resume_from_an_offset(self):
+        url = self.result_url()
+        lines = list(bulk_import.iter_result_lines(url))
+
+        self.assertEqual([line for _, line in lines], self.fake.bulk_result().splitlines())
+        self.assertEqual(lines[-1][0], len(self.fake.bulk_result()))
+
+        self.assertEqual(list(bulk_import.iter_result_lines(url, lines[2][0])), lines[3:])
+        self.assertEqual(self.fake.result_ranges[-1], f'bytes={lines[2][0]}-')
+        self.assertEqual(list(bulk_import.iter_result_lines(url, lines[-1][0])), [])
+
+    def test_import_resumes_from_its_checkpoint(self):
+        failed = self.run_failing_import()
+
+        self.assertEqual(failed.status, OrderImport.FAILED)
+        self.assertEqual(failed.imported, 3)
+        self.assertEqual(Order.objects.filter(shop=self.shop).count(), 3)
+        first_batch_end = failed.offset
+        self.assertGreater(first_batch_end, 0)
+
+        job = bulk_import.claim_job(bulk_import.schedule_import(self.shop).id)
+        bulk_import.run_import(job, batch_size=3)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.imported, job.offset), (OrderImport.COMPLETED, 7, len(self.fake.bulk_result())))
+        self.assertEqual(Order.objects.filter(shop=self.shop).count(), 7)
+        self.assertEqual(self.fake.result_ranges[-1], f'bytes={first_batch_end}-')
+        self.assertEqual(len(self.fake.bulk_operations), 1)
+
+    def test_expired_result_restarts_the_bulk_operation(self):
+        failed = self.run_failing_import()
+        self.fake.expired_operations.add(failed.bulk_operation_id)
+
+        job = bulk_import.claim_job(bulk_import.schedule_import(self.shop).id)
+        bulk_import.run_import(job, batch_size=3)
+
+        job.refresh_from_db()
+        self.assertEqual(len(self.fake.bulk_operations), 2)
+        self.assertEqual(job.bulk_operation_id, self.fake.bulk_operations[-1])
+        self.assertEqual(job.status, OrderImport.COMPLETED)
+        self.assertEqual(Order.objects.filter(shop=self.shop).count(), 7)
+
+    def test_claim_job_locks_only_the_job(self):
+        bulk_import.schedule_import(self.shop)
+
+        with CaptureQueriesContext(connection) as queries:
+            job = bulk_import.claim_job()
+
+        self.assertEqual(job.shop, self.shop)
+        self.assertTrue(any('FOR UPDATE OF "api_orderimport" SKIP LOCKED' in query['sql'] for query in queries))
+        self.assertIsNone(bulk_import.claim_job())
+
+
+class OrderExportStreamTests(SimpleTestCase):
+    def test_producer_error_is_raised_to_the_consumer(self):
+        def fail_midway(shop_id, fileobj, fmt):
+            fileobj.write(b'order_id\n1\n')
+            fileobj.flush()
+            raise RuntimeError("connection lost")
+
+        stream = pg_copy.stream_orders(1, chunk_size=1)
+        with mock.patch.object(pg_copy, 'copy_orders_to', fail_midway):
+            self.assertEqual(next(stream), b'order_id\n1\n')
+            with self.assertRaisesMessage(RuntimeError, "connection lost"):
+                next(stream)
+
+    def test_producer_that_dies_without_finishing_fails_the_stream(self):
+        # Stands in for a producer torn down before it could end the queue.
+        thread = threading.Thread
+        silent = lambda target, name, daemon: thread(target=lambda: None, daemon=daemon)
+
+        with mock.patch.object(threading, 'Thread', silent), self.assertRaises(pg_copy.ExportFailed):
+            list(pg_copy.stream_orders(1, poll_interval=0.05))
+
+
+class StartupImportTests(SimpleTestCase):
+    def test_startup_imports_stay_within_budget(self):
+        output = StringIO()
+        call_command('profile_startup', runs=3, top=1000, budget_ms=settings.STARTUP_IMPORT_BUDGET_MS, stdout=output)
+
+        report = json.loads(output.getvalue())
+        self.assertEqual(report['deferred_imported_at_startup'], [])
+        self.assertNotIn('httpx', report['packages_ms'])
+
+
+class JSONPayloadTests(SimpleTestCase):
+    def test_decode_order_keeps_only_stored_fields(self):
+        body = json.dumps(loadgen.order_payload(820982911946154508, '2024-01-01T10:00:00-05:00')).encode()
+
+        order = payloads.decode_order(body)
+
+        self.assertEqual(order.id, 820982911946154508)
+        self.assertEqual(order.current_subtotal_price, Decimal('597.00'))
+        self.assertEqual(order.created_at.isoformat(), '2024-01-01T10:00:00-05:00')
+        self.assertIsNone(order.cancelled_at)
+        self.assertFalse(hasattr(order, 'line_items'))
+
+    def test_decode_rejects_missing_or_malformed_fields(self):
+        for body in (b'{"id": 1, "currency": "USD"}', b'{"orders": [{"id": "x"}]}', b'not json'):
+            with self.subTest(body=body), self.assertRaises(ValueError):
+                payloads.decode_orders(body) if body.startswith(b'{"orders"') else payloads.decode_order(body)
+
+    def test_decode_orders_page(self):
+        orders = [loadgen.order_payload(order_id, '2024-01-01T10:00:00Z') for order_id in (1, 2)]
+
+        decoded = payloads.decode_orders(json.dumps({'orders': orders}).encode())
+
+        self.assertEqual([order.id for order in decoded], [1, 2])
+
+    def test_loads_keeps_large_integers_exact(self):
+        self.assertEqual(fast_json.loads(b'{"id": 123456789012345678901234}'), {'id': 123456789012345678901234})
+
+    def test_renderer_matches_json_renderer_data(self):
+        data = {
+            'price': Decimal('123.450'), 'created_at': datetime(2024, 1, 1, 10, tzinfo=timezone.utc),
+            'ratio': 1e20, 'text': 'line\u2028separator',
+        }
+
+        for value in (data, dict(data, big=2 ** 70)):
+            fast, standard = FastJSONRenderer().render(value), JSONRenderer().render(value)
+            self.assertEqual(json.loads(fast), json.loads(standard))
+            self.assertIn(b'\\u2028', fast)
+
+        # Equivalent, not byte-identical: orjson writes floats in their shortest form.
+        self.assertIn(b'1e20', FastJSONRenderer().render(data))
+        self.assertIn(b'1e+20', JSONRenderer().render(data))
+
+
+class MetricsTests(SimpleTestCase):
+    def test_exposition_format(self):
+        registry = metrics.Registry()
+        histogram = registry.register(metrics.Histogram('job_seconds', "Job time.", ('queue',), buckets=(0.1, 1)))
+        histogram.observe(0.05, queue='default')
+        histogram.observe(0.5, queue='default')
+        histogram.observe(5, queue='say "hi"\n')
+
+        self.assertEqual(registry.expose(), (
+            '# HELP job_seconds Job time.\n'
+            '# TYPE job_seconds histogram\n'
+            'job_seconds_bucket{queue="default",le="0.1"} 1\n'
+            'job_seconds_bucket{queue="default",le="1"} 2\n'
+            'job_seconds_bucket{queue="default",le="+Inf"} 2\n'
+            'job_seconds_sum{queue="default"} 0.55\n'
+            'job_seconds_count{queue="default"} 2\n'
+            'job_seconds_bucket{queue="say \\"hi\\"\\n",le="0.1"} 0\n'
+            'job_seconds_bucket{queue="say \\"hi\\"\\n",le="1"} 0\n'
+            'job_seconds_bucket{queue="say \\"hi\\"\\n",le="+Inf"} 1\n'
+            'job_seconds_sum{queue="say \\"hi\\"\\n"} 5.0\n'
+            'job_seconds_count{queue="say \\"hi\\"\\n"} 1\n'
+        ))
+
+    @override_settings(SERVER_TIMING_HEADER=True)
+    def test_middleware_records_requests_by_route(self):
+        def count(exposition):
+            sample = 'http_request_duration_seconds_count{route="v1/shopify/api/products",method="GET",status="400"} '
+            return next((int(line.removeprefix(sample)) for line in exposition.splitlines() if line.startswith(sample)), 0)
+
+        before = count(metrics.registry.expose())
+        response = Client().get('/v1/shopify/api/products')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('total;dur=', response['Server-Timing'])
+        self.assertEqual(count(metrics.registry.expose()), before + 1)
+
+    @override_settings(METRICS_TOKEN='scrape-secret', DEBUG=False)
+    def test_token_is_required_when_set(self):
+        self.assertEqual(Client().get('/metrics').status_code, 401)
+        self.assertEqual(Client(HTTP_AUTHORIZATION='Bearer wrong').get('/metrics').status_code, 401)
+
+        response = Client(HTTP_AUTHORIZATION='Bearer scrape-secret').get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertIn(b'# TYPE http_request_duration_seconds histogram', response.content)
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_without_a_token_metrics_are_served_only_in_debug(self):
+        with override_settings(DEBUG=False):
+            self.assertEqual(Client().get('/metrics').status_code, 404)
+        with override_settings(DEBUG=True):
+            self.assertEqual(Client().get('/metrics').status_code, 200)
+
+
+DAY = 86400
+
+
+def store_orders(shop, count, first_order_id=1, created_at=1700000000):
+    """Store count orders for shop, one day apart, through the rollup-maintaining upsert."""
+    rows = [
+        (first_order_id + i, shop.id, 'USD', Decimal('10.000'), created_at + i * DAY, created_at, 'paid', None)
+        for i in range(count)
+    ]
+    with transaction.atomic():
+        ingest.upsert_orders(rows)
+
+
+class PurgeTests(TestCase):
+    def setUp(self):
+        self.shop = Shop.objects.create(domain='purge.myshopify.com', access_token='token', access_scopes='', created_at=1)
+        store_orders(self.shop, 5)
+        Product.objects.create(product_id=1, shop=self.shop, title='', data={}, updated_at=1, synced_at=1)
+        Shop.objects.filter(id=self.shop.id).update(products_synced_at=1)
+        purge.mark_uninstalled(self.shop.domain)
+
+    def rollup_totals(self):
+        return OrderDailyRollup.objects.filter(shop=self.shop).aggregate(orders=Sum('order_count'), subtotal=Sum('subtotal_sum'))
+
+    def test_purges_everything(self):
+        list(purge.purge_shop(self.shop.id, batch_size=2))
+
+        self.assertFalse(Shop.objects.filter(id=self.shop.id).exists())
+        self.assertFalse(Order.objects.filter(shop_id=self.shop.id).exists())
+        self.assertFalse(OrderDailyRollup.objects.filter(shop_id=self.shop.id).exists())
+
+    def test_reinstall_mid_purge_keeps_rollups_consistent(self):
+        batches = purge.purge_shop(self.shop.id, batch_size=2)
+        self.assertEqual(next(batches), ('api_order', 2))
+
+        callback.store_shop_information('new-token', '', self.shop.domain)
+        list(batches)
+
+        shop = Shop.objects.get(id=self.shop.id)
+        self.assertIsNone(shop.uninstalled_at)
+        self.assertIsNone(shop.products_synced_at)
+        self.assertIsNone(shop.purge_heartbeat_at)
+        self.assertEqual(Order.objects.filter(shop=shop).count(), 3)
+        self.assertEqual(self.rollup_totals(), {'orders': 3, 'subtotal': Decimal('30.000')})
+
+    def test_lease_keeps_a_second_worker_out(self):
+        self.assertTrue(purge.claim_purge(self.shop.id))
+
+        self.assertEqual(list(purge.purge_shop(self.shop.id)), [])
+        self.assertEqual(Order.objects.filter(shop=self.shop).count(), 5)
+
+    @override_settings(SHOP_PURGE_LEASE_SECONDS=60)
+    def test_stale_lease_is_taken_over(self):
+        Shop.objects.filter(id=self.shop.id).update(purge_heartbeat_at=int(time.time()) - 120)
+
+        list(purge.purge_shop(self.shop.id))
+
+        self.assertFalse(Shop.objects.filter(id=self.shop.id).exists())
+
+
+class PgCopyTests(TestCase):
+    def setUp(self):
+        self.shop = Shop.objects.create(domain='copy.myshopify.com', access_token='token', access_scopes='', created_at=1)
+        store_orders(self.shop, 2)
+
+    def export(self, fmt):
+        fileobj = BytesIO()
+        pg_copy.copy_orders_to(self.shop.id, fileobj, fmt)
+        return fileobj.getvalue().decode()
+
+    def rollup_totals(self):
+        return OrderDailyRollup.objects.filter(shop=self.shop).aggregate(orders=Sum('order_count'), subtotal=Sum('subtotal_sum'))
+
+    def test_export_carries_the_order_version(self):
+        Order.objects.filter(order_id=2).update(financial_status='refunded', cancelled_at=1700000500)
+
+        lines = self.export(pg_copy.CSV).splitlines()
+        self.assertEqual(lines[0], pg_copy.ORDER_COLUMNS.replace(' ', ''))
+        self.assertEqual(lines[2], '2,USD,10.000,1700086400,1700000000,refunded,1700000500')
+
+        doc = json.loads(self.export(pg_copy.NDJSON).splitlines()[1])
+        self.assertEqual((doc['updated_at'], doc['financial_status'], doc['cancelled_at']), (1700000000, 'refunded', 1700000500))
+
+    def test_import_keeps_the_newer_version(self):
+        csv = '\n'.join([
+            pg_copy.ORDER_COLUMNS.replace(' ', ''),
+            '1,USD,25.000,1700000000,1700000600,refunded,1700000600',
+            '2,USD,99.000,1700086400,1699990000,pending,',
+            '3,USD,5.000,1700172800,1700172800,paid,',
+        ])
+
+        stats = pg_copy.copy_orders_from(self.shop.id, BytesIO(csv.encode()), pg_copy.CSV)
+
+        self.assertEqual(stats, {'inserted': 1, 'updated': 1})
+        first, second = Order.objects.get(order_id=1), Order.objects.get(order_id=2)
+        self.assertEqual((first.current_subtotal_price, first.financial_status, first.cancelled_at), (Decimal('25.000'), 'refunded', 1700000600))
+        self.assertEqual((second.current_subtotal_price, second.financial_status), (Decimal('10.000'), 'paid'))
+        self.assertEqual(self.rollup_totals(), {'orders': 3, 'subtotal': Decimal('40.000')})
+
+    def test_round_trip_through_ndjson(self):
+        exported = self.export(pg_copy.NDJSON)
+        Order.objects.filter(shop=self.shop).update(updated_at=0, financial_status='')
+
+        stats = pg_copy.copy_orders_from(self.shop.id, BytesIO(exported.encode()), pg_copy.NDJSON)
+
+        self.assertEqual(stats, {'inserted': 0, 'updated': 2})
+        self.assertEqual(set(Order.objects.values_list('updated_at', 'financial_status')), {(1700000000, 'paid')})
+        self.assertEqual(self.rollup_totals(), {'orders': 2, 'subtotal': Decimal('20.000')})
+
+
+class OrderUpsertRaceTests(TransactionTestCase):
+    def waiting_on_locks(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_stat_clear_snapshot()')
+            cursor.execute(
+                "SELECT count(*) FROM pg_stat_activity WHERE datname = current_database() AND wait_event_type = 'Lock'"
+            )
+            return cursor.fetchone()[0]
+
+    def test_losing_a_first_insert_race_still_moves_the_rollups(self):
+        shop = Shop.objects.create(domain='race.myshopify.com', access_token='token', access_scopes='', created_at=1)
+        created = (1, shop.id, 'USD', Decimal('10.000'), 1700000000, 1700000000, 'pending', None)
+        paid = (1, shop.id, 'USD', Decimal('25.000'), 1700000000, 1700000100, 'paid', None)
+        stored = []
+
+        def deliver_paid():
+            try:
+                with transaction.atomic():
+                    stored.extend(ingest.upsert_orders([paid]))
+            finally:
+                connection.close()
+
+        with transaction.atomic():
+            ingest.upsert_orders([created])
+            # The second delivery's snapshot can't see this insert, so it waits on the order id.
+            racer = threading.Thread(target=deliver_paid)
+            racer.start()
+            wait_for(lambda: self.waiting_on_locks() == 1)
+        racer.join(10)
+
+        self.assertEqual(stored, [(1, False)])
+        self.assertEqual(Order.objects.get(order_id=1).current_subtotal_price, Decimal('25.000'))
+        self.assertEqual(
+            OrderDailyRollup.objects.filter(shop=shop).aggregate(orders=Sum('order_count'), subtotal=Sum('subtotal_sum')),
+            {'orders': 1, 'subtotal': Decimal('25.000')},
+        )
+
+
+class ReconcileLeaseTests(FakeShopifyMixin, TestCase):
+    fake_options = {'orders': 5}
+
+    def setUp(self):
+        super().setUp()
+        self.shop = Shop.objects.create(domain='reconcile.myshopify.com', access_token='token', access_scopes='', created_at=1)
+
+    def test_reconciles_and_releases_the_lease(self):
+        stats = reconcile.reconcile_shop(self.shop)
+
+        self.assertEqual(stats, {'inserted': 5, 'updated': 0})
+        shop = Shop.objects.get(id=self.shop.id)
+        self.assertIsNone(shop.orders_reconcile_heartbeat_at)
+        self.assertIsNotNone(shop.orders_reconciled_at)
+
+    def test_lease_keeps_a_second_worker_out(self):
+        self.assertTrue(reconcile.claim_reconcile(self.shop.id))
+
+        self.assertIsNone(reconcile.reconcile_shop(self.shop))
+        self.assertFalse(Order.objects.filter(shop=self.shop).exists())
+
+    @override_settings(ORDER_RECONCILE_LEASE_SECONDS=60)
+    def test_stale_lease_is_taken_over(self):
+        Shop.objects.filter(id=self.shop.id).update(orders_reconcile_heartbeat_at=int(time.time()) - 120)
+
+        self.assertEqual(reconcile.reconcile_shop(self.shop)['inserted'], 5)
+
+    def test_failed_run_releases_the_lease(self):
+        Shop.objects.filter(id=self.shop.id).update(access_token='')
+        self.shop.access_token = ''
+
+        with self.assertRaises(shopify_client.ShopifyAPIError):
+            reconcile.reconcile_shop(self.shop)
+        self.assertTrue(reconcile.claim_reconcile(self.shop.id))
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out waiting for condition")
+        time.sleep(0.02)
+
+
+class ProductSyncTests(FakeShopifyMixin, TransactionTestCase):
+    fake_options = {'products': 120}
+
+    def setUp(self):
+        super().setUp()
+        self.shop = Shop.objects.create(domain='catalog.myshopify.com', access_token='token', access_scopes='', created_at=1)
+        shop_cache.invalidate_shop(self.shop.domain)
+        self.client = Client(HTTP_AUTHORIZATION=f'Bearer {loadgen.mint_session_token(self.shop.domain)}')
+
+    def get_products(self, **params):
+        return self.client.get('/v1/shopify/api/products', params)
+
+    def test_cold_cache_answers_202_while_one_background_sync_runs(self):
+        with mock.patch.object(catalog, 'sync_in_background') as sync:
+            responses = [self.get_products() for _ in range(3)]
+            wait_for(lambda: sync.called)
+
+        self.assertEqual([response.status_code for response in responses], [202, 202, 202])
+        self.assertEqual(responses[0]['Retry-After'], '2')
+        self.assertEqual(sync.call_count, 1)
+
+    def test_background_sync_fills_the_catalog(self):
+        self.assertEqual(self.get_products().status_code, 202)
+        wait_for(lambda: catalog.is_synced(self.shop.id))
+
+        response = self.get_products(limit=100)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['products']), 100)
+        self.assertEqual(Product.objects.filter(shop=self.shop).count(), 120)
+        self.assertIsNone(Shop.objects.get(id=self.shop.id).products_sync_heartbeat_at)
+
+    def test_refresh_serves_the_catalog_while_syncing(self):
+        Product.objects.create(product_id=1, shop=self.shop, title='Cached', data={'id': 1}, updated_at=1, synced_at=1)
+        Shop.objects.filter(id=self.shop.id).update(products_synced_at=1)
+
+        with mock.patch.object(catalog, 'sync_in_background') as sync:
+            response = self.get_products(refresh='1')
+            wait_for(lambda: sync.called)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['products'], [{'id': 1}])
+
+    def test_failed_sync_releases_the_lease(self):
+        Shop.objects.filter(id=self.shop.id).update(access_token='')
+        catalog.sync_in_background(self.shop.id, self.shop.domain, '')
+
+        self.assertIsNone(Shop.objects.get(id=self.shop.id).products_sync_heartbeat_at)
+        self.assertTrue(catalog.claim_sync(self.shop.id))
+
+    @override_settings(PRODUCT_SYNC_LEASE_SECONDS=60)
+    def test_stale_lease_can_be_taken_over(self):
+        self.assertTrue(catalog.claim_sync(self.shop.id))
+        self.assertFalse(catalog.claim_sync(self.shop.id))
+
+        Shop.objects.filter(id=self.shop.id).update(products_sync_heartbeat_at=int(time.time()) - 120)
+        self.assertTrue(catalog.claim_sync(self.shop.id))
+
+
+class AsyncViewParityTests(TransactionTestCase):
+    """The Async* views answer exactly like their sync twins."""
+
+    def setUp(self):
+        self.shop = Shop.objects.create(domain='parity.myshopify.com', access_token='token', access_scopes='', created_at=1)
+        shop_cache.invalidate_shop(self.shop.domain)
+        self.auth = {'Authorization': f'Bearer {loadgen.mint_session_token(self.shop.domain)}'}
+        # The async ORM runs queries on asgiref's shared thread, whose connection would outlive the test database.
+        self.addCleanup(lambda: asyncio.run(sync_to_async(connections.close_all)()))
+
+    def both(self, sync_view, async_view, method, path, **kwargs):
+        sync_response = sync_view.as_view()(getattr(RequestFactory(), method)(path, **kwargs))
+        if hasattr(sync_response, 'render'):
+            sync_response.render()
+        async_response = asyncio.run(async_view.as_view()(getattr(AsyncRequestFactory(), method)(path, **kwargs)))
+        return sync_response, async_response
+
+    def assertSameResponse(self, sync_response, async_response, status_code):
+        self.assertEqual(sync_response.status_code, status_code)
+        self.assertEqual(async_response.status_code, status_code)
+        self.assertEqual(sync_response.content and json.loads(sync_response.content),
+                         async_response.content and json.loads(async_response.content))
+
+    def order_webhook(self, topic, signature):
+        return self.both(
+            order.OrderWebhook, order.AsyncOrderWebhook, 'post', '/v1/shopify/api/shopify-webhook/orders',
+            data=b'{}', content_type='application/json',
+            headers={'X-Shopify-Topic': topic, 'X-Shopify-Shop-Domain': self.shop.domain, 'X-Shopify-Hmac-Sha256': signature},
+        )
+
+    def test_order_webhook_errors(self):
+        self.assertSameResponse(*self.order_webhook('orders/create', 'bad'), 400)
+
+        signature = base64.b64encode(hmac.new(settings.SHOPIFY_API_SECRET.encode(), b'{}', hashlib.sha256).digest()).decode()
+        sync_response, async_response = self.order_webhook('orders/unknown', signature)
+        self.assertSameResponse(sync_response, async_response, 400)
+        self.assertEqual(json.loads(async_response.content), {'error': 'Unsupported topic: orders/unknown'})
+
+    def test_product_pages(self):
+        for product_id in (1, 2, 3):
+            Product.objects.create(product_id=product_id, shop=self.shop, title='', data={'id': product_id}, updated_at=1, synced_at=1)
+        Shop.objects.filter(id=self.shop.id).update(products_synced_at=1)
+
+        sync_response, async_response = self.both(
+            product.ProductList, product.AsyncProductList, 'get', '/v1/shopify/api/products', data={'page_size': 2}, headers=self.auth,
+        )
+        self.assertSameResponse(sync_response, async_response, 200)
+        self.assertEqual(json.loads(async_response.content)['products'], [{'id': 1}, {'id': 2}])
+
+        self.assertSameResponse(*self.both(
+            product.ProductList, product.AsyncProductList, 'get', '/v1/shopify/api/products', data={'cursor': 'x'}, headers=self.auth,
+        ), 400)
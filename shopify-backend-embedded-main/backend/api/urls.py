@@ -1,11 +1,27 @@
+from django.conf import settings
 from django.urls import path
 from .views import auth, order, product
 
+# Native async views for ASGI deployments (see SHOPIFY_ASYNC_VIEWS).
+if settings.SHOPIFY_ASYNC_VIEWS:
+    callback_view = auth.AsyncCallback.as_view()
+    product_list_view = product.AsyncProductList.as_view()
+    order_webhook_view = order.AsyncOrderWebhook.as_view()
+else:
+    callback_view = auth.Callback.as_view()
+    product_list_view = product.ProductList.as_view()
+    order_webhook_view = order.OrderWebhook.as_view()
+
 urlpatterns = [
     path('login', auth.Login.as_view(), name='login'),
-    path('shopify-callback', auth.Callback.as_view(), name='callback'),
+    path('shopify-callback', callback_view, name='callback'),
     path('uninstall', auth.Uninstall.as_view(), name='uninstall'),
-    path('products', product.ProductList.as_view(), name='product_list'),
-    path('shopify-webhook/order-create', order.OrderCreateWebhook.as_view(), name='webhook_order_create'),
+    path('products', product_list_view, name='product_list'),
+    path('shopify-webhook/orders', order_webhook_view, name='webhook_orders'),
+    # Where 'orders/create' was subscribed before the other order topics were; kept for installed shops.
+    path('shopify-webhook/order-create', order_webhook_view, name='webhook_order_create'),
+    path('shopify-webhook/products', product.ProductWebhook.as_view(), name='webhook_products'),
     path('orders', order.OrderList.as_view(), name='order_list'),
+    path('orders/export', order.OrderExport.as_view(), name='order_export'),
+    path('orders/analytics', order.OrderAnalytics.as_view(), name='order_analytics'),
 ]
\ No newline at end of file
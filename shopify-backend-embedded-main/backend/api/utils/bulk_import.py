@@ -0,0 +1,237 @@
+import logging
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+
+from ..models import OrderImport
+from . import fast_json, ingest, shopify_client
+
+logger = logging.getLogger(__name__)
+
+ORDERS_BULK_QUERY = '''
+{
+  orders {
+    edges {
+      node {
+        legacyResourceId
+        createdAt
+        updatedAt
+        cancelledAt
+        displayFinancialStatus
+        currencyCode
+        currentSubtotalPriceSet { shopMoney { amount } }
+      }
+    }
+  }
+}
+'''
+
+RUN_BULK_QUERY = '''
+mutation bulkOperationRunQuery($query: String!) {
+  bulkOperationRunQuery(query: $query) {
+    bulkOperation { id status }
+    userErrors { field message }
+  }
+}
+'''
+
+BULK_OPERATION_STATUS = '''
+query bulkOperation($id: ID!) {
+  node(id: $id) {
+    ... on BulkOperation { id status errorCode objectCount url }
+  }
+}
+'''
+
+BULK_OPERATION_FAILED = {'FAILED', 'CANCELED', 'CANCELING', 'EXPIRED'}
+
+# Statuses returned for a result file whose signed URL has expired.
+RESULT_EXPIRED = {403, 404, 410}
+
+
+def schedule_import(shop):
+    """Queue a historical order import for a shop. An unfinished import is reused so it resumes from its checkpoint."""
+    current_timestamp = int(time.time())
+    job = OrderImport.objects.filter(shop=shop).order_by('-id').first()
+
+    if job is not None and job.status == OrderImport.FAILED:
+        heartbeat(job, status=OrderImport.PENDING)
+    elif job is None or job.status == OrderImport.COMPLETED:
+        job = OrderImport.objects.create(shop=shop, created_at=current_timestamp, updated_at=current_timestamp)
+        logger.info(f"Scheduled order import {job.id} for shop {shop.domain}")
+
+    return job
+
+
+def claim_job(job_id=None):
+    """Lock and mark running the next pending import, or one whose worker stopped heartbeating."""
+    current_timestamp = int(time.time())
+    lease_expired_at = current_timestamp - settings.ORDER_IMPORT_LEASE_SECONDS
+
+    with transaction.atomic():
+        # Lock only the job row; a plain FOR UPDATE would also lock the joined shop row.
+        jobs = OrderImport.objects.select_for_update(skip_locked=True, of=('self',)).select_related('shop').filter(
+            Q(status=OrderImport.PENDING) | Q(status=OrderImport.RUNNING, updated_at__lt=lease_expired_at)
+        )
+        if job_id is not None:
+            jobs = jobs.filter(id=job_id)
+
+        job = jobs.order_by('id').first()
+        if job is not None:
+            job.status = OrderImport.RUNNING
+            job.updated_at = current_timestamp
+            job.save(update_fields=['status', 'updated_at'])
+
+    return job
+
+
+def heartbeat(job, **fields):
+    """Persist job fields and extend the worker's lease on it."""
+    fields['updated_at'] = int(time.time())
+    OrderImport.objects.filter(id=job.id).update(**fields)
+
+    for name, value in fields.items():
+        if not hasattr(value, 'resolve_expression'):
+            setattr(job, name, value)
+
+
+def start_bulk_operation(shop):
+    """Submit the orders bulk query and return the bulk operation id."""
+    data = shopify_client.graphql(shop.domain, shop.access_token, RUN_BULK_QUERY, {'query': ORDERS_BULK_QUERY})
+    result = data['bulkOperationRunQuery']
+
+    if result['userErrors']:
+        raise shopify_client.ShopifyAPIError(f"Bulk operation rejected for shop {shop.domain}: {result['userErrors']}")
+
+    return result['bulkOperation']['id']
+
+
+def wait_for_bulk_operation(job):
+    """Poll the job's bulk operation until it finishes. Returns the result URL, or None if there were no orders."""
+    shop = job.shop
+
+    while True:
+        data = shopify_client.graphql(shop.domain, shop.access_token, BULK_OPERATION_STATUS, {'id': job.bulk_operation_id}, cost=1)
+        operation = data.get('node') or {}
+        operation_status = operation.get('status')
+
+        if operation_status == 'COMPLETED':
+            logger.info(f"Bulk operation {job.bulk_operation_id} for shop {shop.domain} returned {operation.get('objectCount')} objects")
+            return operation.get('url')
+
+        if operation_status in BULK_OPERATION_FAILED or not operation:
+            raise shopify_client.ShopifyAPIError(
+                f"Bulk operation {job.bulk_operation_id} for shop {shop.domain} ended with {operation_status}: {operation.get('errorCode')}"
+            )
+
+        heartbeat(job)
+        time.sleep(settings.ORDER_IMPORT_POLL_INTERVAL)
+
+
+def iter_result_lines(url, offset=0):
+    """Stream a JSONL result file from a byte offset, yielding (end_offset, line) for each complete line."""
+    headers = {'Range': f'bytes={offset}-'} if offset else {}
+
+    with shopify_client.get_client().stream('GET', url, headers=headers) as response:
+        if response.status_code == 416:
+            return
+        if response.is_error:
+            response.read()
+            shopify_client.check_response('GET', url, response)
+
+        # A server that ignores Range sends the whole file; skip what was already committed.
+        position = offset if response.status_code == 206 else 0
+        buffer = b''
+
+        for chunk in response.iter_bytes():
+            lines = (buffer + chunk).split(b'\n')
+            buffer = lines.pop()
+
+            for line in lines:
+                position += len(line) + 1
+                if position > offset:
+                    yield position, line
+
+        if buffer:
+            yield position + len(buffer), buffer
+
+
+def order_row(record, shop_id):
+    """Map a bulk operation order record to an upsert_orders() row."""
+    return (
+        int(record['legacyResourceId']),
+        shop_id,
+        record['currencyCode'],
+        record['currentSubtotalPriceSet']['shopMoney']['amount'],
+        int(datetime.fromisoformat(record['createdAt']).timestamp()),
+        int(datetime.fromisoformat(record['updatedAt']).timestamp()),
+        # The Admin API's financial_status spelling, e.g. PARTIALLY_REFUNDED -> partially_refunded.
+        (record.get('displayFinancialStatus') or '').lower(),
+        int(datetime.fromisoformat(record['cancelledAt']).timestamp()) if record.get('cancelledAt') else None,
+    )
+
+
+def commit_batch(job, rows, offset):
+    """Insert a batch of rows and advance the job's committed offset in the same transaction."""
+    with transaction.atomic():
+        created = [order_id for order_id, inserted in ingest.upsert_orders(rows) if inserted]
+        heartbeat(job, offset=offset, imported=F('imported') + len(created))
+
+    job.imported += len(created)
+
+
+def load_results(job, url, batch_size):
+    """Load the result file into api_order from the job's committed offset, batch_size rows per transaction."""
+    rows = []
+    offset = job.offset
+
+    for offset, line in iter_result_lines(url, job.offset):
+        if not line.strip():
+            continue
+
+        rows.append(order_row(fast_json.loads(line), job.shop_id))
+        if len(rows) >= batch_size:
+            commit_batch(job, rows, offset)
+            rows = []
+
+    commit_batch(job, rows, offset)
+
+
+def run_import(job, batch_size=None):
+    """Drive a claimed import through bulk operation, download and load, resuming from its checkpoint."""
+    batch_size = batch_size or settings.ORDER_IMPORT_BATCH_SIZE
+    shop = job.shop
+
+    try:
+        for attempt in range(2):
+            if not job.bulk_operation_id:
+                heartbeat(job, bulk_operation_id=start_bulk_operation(shop), result_url=None, offset=0)
+
+            if not job.result_url:
+                result_url = wait_for_bulk_operation(job)
+                if result_url is None:
+                    break
+                heartbeat(job, result_url=result_url)
+
+            try:
+                load_results(job, job.result_url, batch_size)
+                break
+            except shopify_client.ShopifyAPIError as e:
+                if e.status_code not in RESULT_EXPIRED or attempt:
+                    raise
+                # Re-running the query is safe: orders already loaded are only rewritten by newer versions.
+                logger.warning(f"Result file for order import {job.id} is no longer available, starting a new bulk operation")
+                heartbeat(job, bulk_operation_id=None, result_url=None, offset=0)
+
+        heartbeat(job, status=OrderImport.COMPLETED, last_error='')
+        logger.info(f"Order import {job.id} for shop {shop.domain} completed with {job.imported} new orders")
+
+    except Exception as e:
+        logger.error(f"Order import {job.id} for shop {shop.domain} failed: {e}")
+        heartbeat(job, status=OrderImport.FAILED, last_error=str(e))
+        raise
+
+    return job
@@ -2,11 +2,11 @@ import logging
 import time
 
 from django.conf import settings
+from django.db import transaction
 from django.urls import reverse
 
-import shopify
 from ..models import Shop
-from .login import create_shopify_session
+from . import shop_cache, shopify_client
 
 logger = logging.getLogger(__name__)
 
@@ -18,18 +18,37 @@ def validate_params(request, params):
     #     raise ValueError("Anti-forgery state parameter does not match.")
 
     # Validate HMAC
+    import shopify
+
+    shopify.Session.setup(api_key=settings.SHOPIFY_API_KEY, secret=settings.SHOPIFY_API_SECRET)
     if not shopify.Session.validate_params(params):
         logger.warning("Invalid callback parameters.")
         raise ValueError("Invalid callback parameters.")
 
 
+def access_token_request(shop, code):
+    """Return the URL and JSON body for exchanging an authorization code."""
+    return f"{shopify_client.shop_base_url(shop)}/admin/oauth/access_token", {
+        'client_id': settings.SHOPIFY_API_KEY,
+        'client_secret': settings.SHOPIFY_API_SECRET,
+        'code': code,
+    }
+
+
 def exchange_code_for_access_token(request, shop):
     """Exchange the authorization code for an access token."""
-    session = create_shopify_session(shop)
-    access_token = session.request_token(request.query_params.dict())
-    access_scopes = session.access_scopes
+    url, payload = access_token_request(shop, request.query_params.get('code'))
+    token_data = shopify_client.request('POST', shop, None, url, json=payload).json()
+
+    return token_data['access_token'], token_data['scope']
+
 
-    return access_token, access_scopes
+async def aexchange_code_for_access_token(request, shop):
+    """Async variant of exchange_code_for_access_token()."""
+    url, payload = access_token_request(shop, request.GET.get('code'))
+    token_data = (await shopify_client.arequest('POST', shop, None, url, json=payload)).json()
+
+    return token_data['access_token'], token_data['scope']
 
 
 def store_shop_information(access_token, access_scopes, shop_domain):
@@ -50,15 +69,23 @@ def store_shop_information(access_token, access_scopes, shop_domain):
         shop.access_token = access_token
         shop.access_scopes = access_scopes
         shop.updated_at = current_timestamp
+        if shop.uninstalled_at is not None:
+            # A reinstall before the purge finished keeps the shop and whatever data is left.
+            # The purge may have deleted part of the catalog, so it is synced again in full.
+            shop.uninstalled_at = None
+            shop.products_synced_at = None
         shop.save()
 
+    transaction.on_commit(lambda: shop_cache.invalidate_shop(shop_domain))
+
     logger.info(f"{'Created' if created else 'Updated'} shop information for {shop_domain}.")
+    return shop
 
 
-def shopify_session(shopify_domain, access_token):
-    """Create a temporary Shopify session."""
-    api_version = settings.SHOPIFY_API_VERSION
-    return shopify.Session.temp(shopify_domain, api_version, access_token)
+def store_shop_information_atomic(access_token, access_scopes, shop_domain):
+    """Store shop information in its own transaction."""
+    with transaction.atomic():
+        return store_shop_information(access_token, access_scopes, shop_domain)
 
 
 def get_api_endpoint(namespace):
@@ -66,35 +93,3 @@ def get_api_endpoint(namespace):
     api_url = settings.SHOPIFY_API_URL
     endpoint = api_url + reverse(namespace)
     return endpoint
-
-
-def create_uninstall_webhook(shop, access_token):
-    """Create a webhook for app uninstallation."""
-    try:
-        with shopify_session(shop, access_token):
-            webhook = shopify.Webhook()
-            webhook.topic = "app/uninstalled"
-            webhook.address = get_api_endpoint('uninstall')
-            webhook.format = "json"
-            webhook.save()
-
-        logger.info(f"Uninstall webhook created for shop: {shop}.")
-    
-    except Exception as e:
-        logger.error(f"Failed to create uninstall webhook for shop {shop}: {e}")
-
-
-def create_order_create_webhook(shop, access_token):
-    """Create a webhook for new orders."""
-    try:
-        with shopify_session(shop, access_token):
-            webhook = shopify.Webhook()
-            webhook.topic = "orders/create"
-            webhook.address = get_api_endpoint('webhook_order_create')
-            webhook.format = "json"
-            webhook.save()
-
-        logger.info(f"Order creation webhook created for shop: {shop}.")
-
-    except Exception as e:
-        logger.error(f"Failed to create order creation webhook for shop {shop}: {e}")
@@ -0,0 +1,149 @@
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from psycopg2.extras import execute_values
+
+from ..models import Product, Shop
+from . import shopify_client
+
+logger = logging.getLogger(__name__)
+
+SYNC_PAGE_SIZE = 250
+
+
+def product_timestamp(product_data):
+    """Convert a product's ISO 'updated_at' into epoch seconds."""
+    updated_at = product_data.get('updated_at')
+    return int(datetime.fromisoformat(updated_at).timestamp()) if updated_at else 0
+
+
+def upsert_products(shop_id, products, synced_at):
+    """Insert or update products, never overwriting a row with an older 'updated_at'."""
+    if not products:
+        return
+
+    rows = [
+        (
+            product['id'],
+            shop_id,
+            (product.get('title') or '')[:255],
+            json.dumps(product),
+            product_timestamp(product),
+            synced_at,
+        )
+        for product in products
+    ]
+
+    with connection.cursor() as cursor:
+        execute_values(
+            cursor,
+            '''
+            INSERT INTO api_product (product_id, shop_id, title, data, updated_at, synced_at)
+            VALUES %s
+            ON CONFLICT (product_id) DO UPDATE SET
+                title = EXCLUDED.title,
+                data = EXCLUDED.data,
+                updated_at = EXCLUDED.updated_at,
+                synced_at = EXCLUDED.synced_at
+            WHERE EXCLUDED.updated_at >= api_product.updated_at
+            ''',
+            rows,
+            page_size=len(rows),
+        )
+
+
+def is_synced(shop_id):
+    """Return True once the shop's catalog has been fully synced at least once."""
+    return Shop.objects.filter(id=shop_id, products_synced_at__isnull=False).exists()
+
+
+async def ais_synced(shop_id):
+    """Async variant of is_synced()."""
+    return await Shop.objects.filter(id=shop_id, products_synced_at__isnull=False).aexists()
+
+
+def store_product_page(shop_id, products, sync_started):
+    """Upsert one page of synced products in its own transaction and extend the sync lease."""
+    with transaction.atomic():
+        upsert_products(shop_id, products, sync_started)
+        Shop.objects.filter(id=shop_id).update(products_sync_heartbeat_at=int(time.time()))
+
+
+def finish_sync(shop_id, shop_domain, sync_started, synced):
+    """Drop products not seen since sync_started, mark the catalog as synced and release the sync lease."""
+    with transaction.atomic():
+        Product.objects.filter(shop_id=shop_id, synced_at__lt=sync_started).delete()
+        Shop.objects.filter(id=shop_id).update(products_synced_at=sync_started, products_sync_heartbeat_at=None)
+
+    logger.info(f"Synced {synced} products for shop {shop_domain}.")
+
+
+def claim_sync(shop_id):
+    """Take the shop's sync lease unless a sync that is still heartbeating holds it. Returns True if taken."""
+    current_timestamp = int(time.time())
+    lease_expired_at = current_timestamp - settings.PRODUCT_SYNC_LEASE_SECONDS
+
+    return bool(
+        Shop.objects.filter(id=shop_id)
+        .filter(Q(products_sync_heartbeat_at__isnull=True) | Q(products_sync_heartbeat_at__lt=lease_expired_at))
+        .update(products_sync_heartbeat_at=current_timestamp)
+    )
+
+
+def sync_in_background(shop_id, shop_domain, access_token):
+    try:
+        sync_products(shop_id, shop_domain, access_token)
+    except Exception as e:
+        logger.error(f"Product sync for shop {shop_domain} failed: {e}")
+        Shop.objects.filter(id=shop_id).update(products_sync_heartbeat_at=None)
+    finally:
+        connection.close()
+
+
+def start_sync(shop_id, shop_domain, access_token):
+    """
+    Sync the catalog in a background thread, unless another request or worker is already syncing it.
+
+    Returns True if this call started the sync. Concurrent first loads of a shop make a
+    single paginated sync against the rate-limited API instead of one each.
+    """
+    if not claim_sync(shop_id):
+        return False
+
+    threading.Thread(
+        target=sync_in_background, args=(shop_id, shop_domain, access_token),
+        name=f'product-sync-{shop_id}', daemon=True,
+    ).start()
+    return True
+
+
+def sync_products(shop_id, shop_domain, access_token):
+    """Pull the shop's full product catalog page by page and drop products that no longer exist."""
+    sync_started = int(time.time())
+    url = f"products.json?limit={SYNC_PAGE_SIZE}"
+    synced = 0
+
+    while url:
+        response = shopify_client.request('GET', shop_domain, access_token, url)
+        products = response.json().get('products', [])
+        store_product_page(shop_id, products, sync_started)
+
+        synced += len(products)
+        url = response.links.get('next', {}).get('url')
+
+    finish_sync(shop_id, shop_domain, sync_started, synced)
+    return synced
+
+
+def apply_product_webhook(topic, shop_id, product_data):
+    """Apply a 'products/create', 'products/update' or 'products/delete' payload to the local catalog."""
+    if topic == 'products/delete':
+        Product.objects.filter(shop_id=shop_id, product_id=product_data['id']).delete()
+    else:
+        upsert_products(shop_id, [product_data], int(time.time()))
@@ -1,3 +1,7 @@
+from asgiref.sync import sync_to_async
+from django.db import connection, transaction
+
+
 def dictfetchone(cursor):
     """
     Return single row from a cursor as a dict.
@@ -12,3 +16,69 @@ def dictfetchall(cursor):
     """
     columns = [col[0] for col in cursor.description]
     return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def stream_dictfetchall(sql, params, chunk_size=2000):
+    """
+    Yield rows as dicts from a server-side cursor, keeping only one chunk in memory.
+    """
+    # With DISABLE_SERVER_SIDE_CURSORS (pgbouncer mode) chunked_cursor() is an ordinary
+    # client-side cursor that loads the whole result on execute, so the cursor is declared
+    # explicitly instead. Either way it lives inside the transaction, which keeps it on one
+    # backend connection behind a transaction-pooling pgbouncer.
+    with transaction.atomic():
+        if connection.settings_dict.get('DISABLE_SERVER_SIDE_CURSORS'):
+            yield from stream_declared_cursor(sql, params, chunk_size)
+            return
+
+        with connection.chunked_cursor() as cursor:
+            cursor.execute(sql, params)
+            columns = None
+
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+
+                if columns is None:
+                    columns = [col[0] for col in cursor.description]
+
+                for row in rows:
+                    yield dict(zip(columns, row))
+
+
+def stream_declared_cursor(sql, params, chunk_size):
+    """
+    Yield rows as dicts from a DECLAREd cursor, one FETCH of chunk_size rows at a time.
+
+    Must run inside a transaction; the cursor is dropped when it ends.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f'DECLARE stream_cursor NO SCROLL CURSOR FOR {sql}', params)
+
+        while True:
+            cursor.execute('FETCH FORWARD %s FROM stream_cursor', [chunk_size])
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            columns = [col[0] for col in cursor.description]
+            for row in rows:
+                yield dict(zip(columns, row))
+
+
+async def aiterate(iterator):
+    """
+    Iterate a sync iterator from async code, one step at a time on the request's sync thread.
+
+    Under ASGI, Django reads a sync StreamingHttpResponse iterator into memory in full
+    before sending it; an async iterator is streamed. Every step runs on the same thread,
+    so an iterator holding a database cursor keeps its connection.
+    """
+    step = sync_to_async(next, thread_sensitive=True)
+    done = object()
+    try:
+        while (item := await step(iterator, done)) is not done:
+            yield item
+    finally:
+        await sync_to_async(iterator.close, thread_sensitive=True)()
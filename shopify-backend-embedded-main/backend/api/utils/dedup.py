@@ -0,0 +1,153 @@
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from ..models import WebhookEvent
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings."""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little')
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RecentEvents:
+    """
+    Two-generation Bloom filter of recorded event ids.
+
+    The current generation is rotated out after half the retention window or when
+    it reaches capacity, so ids stay answerable for at least half the window. It is
+    seeded from api_webhookevent on first use and then topped up every
+    refresh_interval seconds, so it also knows ids recorded before a restart or by
+    other workers.
+    """
+
+    # Rows can commit a little after their created_at; each refresh re-reads this far back.
+    REFRESH_OVERLAP = 60
+
+    def __init__(self, capacity, error_rate, window, refresh_interval):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.window = window
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._current = BloomFilter(capacity, error_rate)
+        self._previous = BloomFilter(capacity, error_rate)
+        self._rotated_at = time.monotonic()
+        self._refreshed_at = None
+
+    def refresh_if_stale(self):
+        """Add the ids any worker recorded since the last refresh; the whole retention window the first time."""
+        now = int(time.time())
+        if self._refreshed_at is not None and now - self._refreshed_at < self.refresh_interval:
+            return
+
+        with self._refresh_lock:
+            if self._refreshed_at is not None and now - self._refreshed_at < self.refresh_interval:
+                return
+
+            since = now - self.window if self._refreshed_at is None else self._refreshed_at - self.REFRESH_OVERLAP
+            event_ids = WebhookEvent.objects.filter(created_at__gte=since).values_list('event_id', flat=True)
+            self.add_many(event_ids.iterator(chunk_size=10000))
+            self._refreshed_at = now
+
+    def _rotate_if_needed(self):
+        if self._current.count >= self.capacity or time.monotonic() - self._rotated_at >= self.window / 2:
+            self._previous = self._current
+            self._current = BloomFilter(self.capacity, self.error_rate)
+            self._rotated_at = time.monotonic()
+
+    def might_contain(self, event_id):
+        with self._lock:
+            return event_id in self._current or event_id in self._previous
+
+    def add_many(self, event_ids):
+        with self._lock:
+            for event_id in event_ids:
+                self._rotate_if_needed()
+                self._current.add(event_id)
+
+
+# Answers "definitely new" for ids not recorded as of the last refresh. An event
+# another worker recorded since then can still get through, for at most
+# WEBHOOK_DEDUP_BLOOM_REFRESH_SECONDS; the ON CONFLICT writes of every ingestion
+# path make reprocessing it a no-op.
+recent_events = None
+if settings.WEBHOOK_DEDUP_BLOOM_ENABLED:
+    recent_events = RecentEvents(
+        capacity=settings.WEBHOOK_DEDUP_BLOOM_CAPACITY,
+        error_rate=settings.WEBHOOK_DEDUP_BLOOM_ERROR_RATE,
+        window=settings.WEBHOOK_EVENT_RETENTION_HOURS * 3600,
+        refresh_interval=settings.WEBHOOK_DEDUP_BLOOM_REFRESH_SECONDS,
+    )
+
+
+def filter_seen(event_ids):
+    """Return the subset of event_ids already recorded, querying only ids the Bloom front cannot rule out."""
+    if recent_events is not None:
+        recent_events.refresh_if_stale()
+
+    candidates = [
+        event_id for event_id in event_ids
+        if event_id and (recent_events is None or recent_events.might_contain(event_id))
+    ]
+
+    if not candidates:
+        return set()
+
+    return set(WebhookEvent.objects.filter(event_id__in=candidates).values_list('event_id', flat=True))
+
+
+def remember(event_ids):
+    """Record committed event ids in the Bloom front."""
+    if recent_events is not None:
+        recent_events.add_many(event_id for event_id in event_ids if event_id)
+
+
+def prune_webhook_events(retention_hours=None, batch_size=10000):
+    """Delete events older than the retention window in bounded batches. Yields the running total."""
+    retention_hours = retention_hours or settings.WEBHOOK_EVENT_RETENTION_HOURS
+    cutoff = int(time.time()) - retention_hours * 3600
+    deleted = 0
+
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                '''
+                DELETE FROM api_webhookevent
+                WHERE id IN (
+                    SELECT id FROM api_webhookevent
+                    WHERE created_at < %s
+                    LIMIT %s
+                )
+                ''', [cutoff, batch_size]
+            )
+            deleted += cursor.rowcount
+
+        yield deleted
+
+        if cursor.rowcount < batch_size:
+            break
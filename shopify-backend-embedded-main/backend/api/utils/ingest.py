@@ -0,0 +1,190 @@
+import logging
+import time
+
+from django.db import connection, transaction
+from psycopg2.extras import execute_values
+
+from ..models import Shop, WebhookEvent
+from . import dedup, rollup, shop_cache
+
+logger = logging.getLogger(__name__)
+
+
+ORDER_COLUMNS = 'order_id, shop_id, currency, current_subtotal_price, created_at, updated_at, financial_status, cancelled_at'
+
+# Typed, since a column that is NULL in every row would otherwise come out of VALUES as text.
+ORDER_VALUES = '(%s::bigint, %s::bigint, %s::varchar, %s::numeric, %s::bigint, %s::bigint, %s::varchar, %s::bigint)'
+
+# Upserts the orders selected by {source}, rows of ORDER_COLUMNS with at most one per order.
+# Versions no newer than the stored one are dropped by the WHERE clause rather than a prior SELECT.
+# `previous` locks and captures the stored versions before the update replaces them, so the rollups
+# move by the difference. New orders are inserted with DO NOTHING: one that a concurrent delivery
+# inserted after this statement's snapshot was not in `previous`, so it is skipped rather than
+# overwritten without its rollup delta, and returned with inserted NULL to be upserted again.
+# Orders a customers/redact request deleted are never stored again.
+ORDER_MERGE = f'''
+    WITH supplied ({ORDER_COLUMNS}) AS (
+        {{source}}
+    ), incoming AS (
+        SELECT * FROM supplied
+        WHERE NOT EXISTS (SELECT 1 FROM api_redactedorder WHERE api_redactedorder.order_id = supplied.order_id)
+    ), previous AS (
+        SELECT order_id, shop_id, currency, current_subtotal_price, created_at, updated_at
+        FROM api_order WHERE order_id IN (SELECT order_id FROM incoming)
+        FOR UPDATE
+    ), inserted AS (
+        INSERT INTO api_order ({ORDER_COLUMNS})
+        SELECT incoming.* FROM incoming LEFT JOIN previous USING (order_id)
+        WHERE previous.order_id IS NULL
+        ORDER BY order_id
+        ON CONFLICT (order_id) DO NOTHING
+        RETURNING order_id, shop_id, currency, current_subtotal_price, created_at
+    ), updated AS (
+        UPDATE api_order SET
+            currency = incoming.currency,
+            current_subtotal_price = incoming.current_subtotal_price,
+            created_at = incoming.created_at,
+            updated_at = incoming.updated_at,
+            financial_status = incoming.financial_status,
+            cancelled_at = incoming.cancelled_at
+        FROM incoming JOIN previous USING (order_id)
+        WHERE api_order.order_id = incoming.order_id AND incoming.updated_at > previous.updated_at
+        RETURNING api_order.order_id, api_order.shop_id, api_order.currency, api_order.current_subtotal_price, api_order.created_at
+    ), changes AS (
+        SELECT shop_id, created_at, currency, 1 AS order_count, current_subtotal_price AS subtotal_sum
+        FROM inserted
+        UNION ALL
+        SELECT shop_id, created_at, currency, 1, current_subtotal_price
+        FROM updated
+        UNION ALL
+        SELECT previous.shop_id, previous.created_at, previous.currency, -1, -previous.current_subtotal_price
+        FROM previous JOIN updated USING (order_id)
+    ), rolled_up AS ({rollup.ROLLUP_APPLY.format(source='changes')})
+    SELECT order_id, true AS inserted FROM inserted
+    UNION ALL
+    SELECT order_id, false FROM updated
+    UNION ALL
+    SELECT order_id, NULL FROM incoming
+    WHERE order_id NOT IN (SELECT order_id FROM previous) AND order_id NOT IN (SELECT order_id FROM inserted)
+'''
+
+ORDER_UPSERT = ORDER_MERGE.format(source='VALUES %s')
+
+
+def process_order_webhook(order, shop_domain, webhook_event_id):
+    """Store a single decoded order webhook payload. Returns False for duplicate events."""
+    if dedup.filter_seen([webhook_event_id]):
+        logger.info(f"Ignoring duplicate webhook event: {webhook_event_id}")
+        return False
+
+    shop_id, _ = shop_cache.get_shop_credentials(shop_domain)
+    with transaction.atomic():
+        upsert_orders([order_row(order, shop_id)])
+        if webhook_event_id:
+            WebhookEvent.objects.bulk_create(
+                [WebhookEvent(event_id=webhook_event_id, created_at=int(time.time()))],
+                ignore_conflicts=True,
+            )
+
+    dedup.remember([webhook_event_id])
+    return True
+
+
+def order_row(order, shop_id):
+    """Build the api_order row for a payloads.OrderPayload; timestamps are stored as epoch seconds."""
+    updated_at = order.updated_at or order.created_at
+    return (
+        order.id,
+        shop_id,
+        order.currency,
+        order.current_subtotal_price,
+        int(order.created_at.timestamp()),
+        int(updated_at.timestamp()),
+        order.financial_status or '',
+        int(order.cancelled_at.timestamp()) if order.cancelled_at else None,
+    )
+
+
+def upsert_orders(rows):
+    """Insert or update orders in one statement, keeping whichever version has the newest 'updated_at'.
+
+    rows are (order_id, shop_id, currency, current_subtotal_price, created_at, updated_at,
+    financial_status, cancelled_at) tuples. Stored orders move the daily rollups in the same
+    statement, so callers must hold a transaction.
+    Returns (order_id, inserted) for every order that was inserted or updated.
+    """
+    if not rows:
+        return []
+
+    # ON CONFLICT can't change a row twice in one statement, so only each order's newest version is sent.
+    latest = {}
+    for row in rows:
+        if row[0] not in latest or row[5] > latest[row[0]][5]:
+            latest[row[0]] = row
+
+    rows = [latest[order_id] for order_id in sorted(latest)]
+
+    with connection.cursor() as cursor:
+        rollup.lock_shops(cursor, {row[1] for row in rows})
+
+        def upsert(retry):
+            batch = rows if retry is None else [row for row in rows if row[0] in retry]
+            return execute_values(cursor, ORDER_UPSERT, batch, template=ORDER_VALUES, page_size=len(batch), fetch=True)
+
+        return merge_orders(upsert)
+
+
+def merge_orders(upsert):
+    """
+    Run an ORDER_MERGE until no order is left behind by a concurrent first insert.
+
+    upsert(retry) runs the statement for every order when retry is None, otherwise only for
+    the order ids in retry, and returns its rows. Returns (order_id, inserted) for every
+    order that was inserted or updated.
+    """
+    stored, retry = [], None
+    while True:
+        results = upsert(retry)
+        stored += [(order_id, inserted) for order_id, inserted in results if inserted is not None]
+        retry = {order_id for order_id, inserted in results if inserted is None}
+        if not retry:
+            return stored
+
+
+def ingest_order_batch(entries):
+    """Store many order webhook payloads with a fixed number of queries.
+
+    entries is a list of (key, order, shop_domain, webhook_event_id) tuples, where order is a payloads.OrderPayload.
+    Returns (stored, failures) where stored counts new or changed orders and failures maps an entry key to an error message.
+    """
+    failures = {}
+    seen = dedup.filter_seen([entry[3] for entry in entries])
+    shops = dict(
+        Shop.objects.filter(domain__in={entry[2] for entry in entries}, uninstalled_at__isnull=True).values_list('domain', 'id')
+    )
+
+    rows = []
+    webhook_events = []
+    received_at = int(time.time())
+
+    for key, order, shop_domain, webhook_event_id in entries:
+        if webhook_event_id and webhook_event_id in seen:
+            logger.info(f"Ignoring duplicate webhook event: {webhook_event_id}")
+            continue
+
+        if shop_domain not in shops:
+            failures[key] = f"Shop not found for domain: {shop_domain}"
+            continue
+
+        rows.append(order_row(order, shops[shop_domain]))
+
+        if webhook_event_id:
+            seen.add(webhook_event_id)
+            webhook_events.append(WebhookEvent(event_id=webhook_event_id, created_at=received_at))
+
+    with transaction.atomic():
+        stored = upsert_orders(rows)
+        WebhookEvent.objects.bulk_create(webhook_events, ignore_conflicts=True)
+
+    dedup.remember(webhook_event.event_id for webhook_event in webhook_events)
+    return len(stored), failures
@@ -0,0 +1,351 @@
+import base64
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from django.conf import settings
+
+
+def order_payload(order_id, created_at, line_items=3):
+    """An order webhook payload shaped like Shopify's, with line_items line items."""
+    line_item = {
+        'id': 866550311766439020, 'variant_id': 808950810, 'title': 'IPod Nano - 8GB', 'quantity': 1,
+        'sku': 'IPOD-342-N', 'vendor': None, 'price': '199.00', 'total_discount': '0.00',
+        'price_set': {'shop_money': {'amount': '199.00', 'currency_code': 'USD'},
+                      'presentment_money': {'amount': '199.00', 'currency_code': 'USD'}},
+        'properties': [], 'tax_lines': [{'price': '3.98', 'rate': 0.06, 'title': 'State Tax'}],
+    }
+    return {
+        'id': order_id,
+        'admin_graphql_api_id': f'gid://shopify/Order/{order_id}',
+        'currency': 'USD',
+        'current_subtotal_price': f'{199 * line_items:.2f}',
+        'created_at': created_at,
+        'updated_at': created_at,
+        'financial_status': 'paid',
+        'cancelled_at': None,
+        'customer': {'id': 115310627314723954, 'email': 'john@example.com', 'tags': ''},
+        'shipping_address': {'address1': '123 Amoebobacterium St', 'city': 'Ottawa', 'zip': 'K2P0V6'},
+        'line_items': [line_item] * line_items,
+    }
+
+
+def bulk_order_record(order):
+    """The JSONL line a bulk operation over bulk_import.ORDERS_BULK_QUERY returns for an order payload."""
+    return {
+        'id': order['admin_graphql_api_id'],
+        'legacyResourceId': str(order['id']),
+        'createdAt': order['created_at'],
+        'updatedAt': order['updated_at'],
+        'cancelledAt': order['cancelled_at'],
+        'displayFinancialStatus': order['financial_status'].upper(),
+        'currencyCode': order['currency'],
+        'currentSubtotalPriceSet': {'shopMoney': {'amount': order['current_subtotal_price']}},
+    }
+
+
+def sign_webhook(body, secret=None):
+    """Return the X-Shopify-Hmac-Sha256 value Shopify would send for body."""
+    secret = secret or settings.SHOPIFY_API_SECRET
+    return base64.b64encode(hmac.new(secret.encode('utf-8'), body, hashlib.sha256).digest()).decode()
+
+
+def order_webhooks(shop_domain, count, duplicates=0.1, line_items=3, first_order_id=None, secret=None):
+    """
+    Build count signed 'orders/create' deliveries as (body, headers) pairs.
+
+    A duplicates fraction are redeliveries of an earlier event (same body, same event id),
+    as Shopify sends when it doesn't see a timely 2xx.
+    """
+    order_id = first_order_id or int(time.time() * 1000) * 1000
+    created_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    deliveries = []
+
+    for _ in range(count):
+        if deliveries and random.random() < duplicates:
+            deliveries.append(random.choice(deliveries))
+            continue
+
+        body = json.dumps(order_payload(order_id, created_at, line_items)).encode('utf-8')
+        event_id = str(uuid.uuid4())
+        deliveries.append((body, {
+            'Content-Type': 'application/json',
+            'X-Shopify-Topic': 'orders/create',
+            'X-Shopify-Shop-Domain': shop_domain,
+            'X-Shopify-Event-Id': event_id,
+            'X-Shopify-Webhook-Id': event_id,
+            'X-Shopify-API-Version': settings.SHOPIFY_API_VERSION,
+            'X-Shopify-Triggered-At': created_at,
+            'X-Shopify-Hmac-Sha256': sign_webhook(body, secret),
+        }))
+        order_id += 1
+
+    return deliveries
+
+
+def mint_session_token(shop_domain, ttl=3600, api_key=None, secret=None):
+    """Mint an App Bridge session token for shop_domain that session_token_required accepts."""
+    import jwt
+
+    now = int(time.time())
+    return jwt.encode(
+        {
+            'iss': f'https://{shop_domain}/admin',
+            'dest': f'https://{shop_domain}',
+            'aud': api_key or settings.SHOPIFY_API_KEY,
+            'sub': '1',
+            'exp': now + ttl,
+            'nbf': now,
+            'iat': now,
+            'jti': str(uuid.uuid4()),
+            'sid': uuid.uuid4().hex,
+        },
+        secret or settings.SHOPIFY_API_SECRET,
+        algorithm='HS256',
+    )
+
+
+class FakeShopify:
+    """
+    Local stand-in for the Shopify Admin API, for load tests that must not reach Shopify.
+
+    Serves the OAuth token exchange, webhooks.json and their deletion (kept in memory), a paginated
+    products.json and orders.json with the filters reconciliation uses, plus
+    orders/count.json, with an optional fixed latency. REST calls go through a leaky bucket
+    like Shopify's, answering 429 with Retry-After once it is full. graphql.json runs orders
+    bulk operations, which complete at once, and serves their JSONL result over Range
+    requests until the operation is listed in expired_operations. Point the app at it with
+    SHOPIFY_ADMIN_URL=<base_url>.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, products=100, orders=0, latency=0.0, bucket_size=40, leak_rate=2.0):
+        self.products = [
+            {
+                'id': 632910392 + i, 'title': f'Product {i}', 'handle': f'product-{i}', 'status': 'active',
+                'updated_at': '2024-01-01T00:00:00-05:00',
+                'variants': [{'id': 808950810 + i, 'price': '199.00', 'sku': f'SKU-{i}'}],
+            }
+            for i in range(products)
+        ]
+        created_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        self.orders = [order_payload(450789469 + i, created_at) for i in range(orders)]
+        self.latency = latency
+        self.bucket_size = bucket_size
+        self.leak_rate = leak_rate
+        self.webhooks = []
+        # Webhook topics whose creation is rejected with a 422, to exercise partial failures.
+        self.failing_topics = set()
+        self.bulk_operations = []
+        # Bulk operation ids whose result URL answers 403, as an expired signed URL does.
+        self.expired_operations = set()
+        # Range header of each result file download, None when the whole file was asked for.
+        self.result_ranges = []
+        self.lock = threading.Lock()
+        self.buckets = {}
+
+        handler = type('FakeShopifyHandler', (FakeShopifyHandler,), {'fake': self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name='fake-shopify', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def bulk_result(self):
+        """The JSONL result file of an orders bulk operation."""
+        return b''.join(json.dumps(bulk_order_record(order)).encode('utf-8') + b'\n' for order in self.orders)
+
+    def take_call(self, access_token):
+        """Add a call to the token's bucket. Returns the bucket level, or None when it is full."""
+        now = time.monotonic()
+        with self.lock:
+            level, updated = self.buckets.get(access_token, (0.0, now))
+            level = max(0.0, level - (now - updated) * self.leak_rate)
+            if level + 1 > self.bucket_size:
+                self.buckets[access_token] = (level, now)
+                return None
+            self.buckets[access_token] = (level + 1, now)
+            return level + 1
+
+
+class FakeShopifyHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    fake = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def handle_request(self, method):
+        if self.fake.latency:
+            time.sleep(self.fake.latency)
+
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+
+        # Result files are fetched from a signed URL, without the access token.
+        if url.path.startswith('/bulk-results/') and method == 'GET':
+            return self.send_result_file(url.path.rsplit('/', 1)[-1].removesuffix('.jsonl'))
+
+        if method == 'POST' and url.path == '/admin/oauth/access_token':
+            payload = self.read_json()
+            if not payload.get('code'):
+                return self.send_json(400, {'error': 'invalid_request'})
+            return self.send_json(200, {'access_token': f"shpat_{uuid.uuid4().hex}", 'scope': settings.SHOPIFY_API_SCOPES or ''})
+
+        access_token = self.headers.get('X-Shopify-Access-Token')
+        if not access_token:
+            return self.send_json(401, {'errors': '[API] Invalid API key or access token'})
+
+        level = self.fake.take_call(access_token)
+        if level is None:
+            return self.send_json(429, {'errors': 'Exceeded 2 calls per second for api client.'}, {'Retry-After': '1.0'})
+        headers = {'X-Shopify-Shop-Api-Call-Limit': f'{int(level)}/{self.fake.bucket_size}'}
+
+        resource = url.path.rsplit('/', 1)[-1]
+
+        if resource == 'webhooks.json' and method == 'GET':
+            return self.send_json(200, {'webhooks': list(self.fake.webhooks)}, headers)
+
+        if resource == 'webhooks.json' and method == 'POST':
+            webhook = self.read_json().get('webhook', {})
+            if webhook.get('topic') in self.fake.failing_topics:
+                return self.send_json(422, {'errors': {'topic': ['is invalid']}}, headers)
+            with self.fake.lock:
+                webhook['id'] = max((existing['id'] for existing in self.fake.webhooks), default=0) + 1
+                self.fake.webhooks.append(webhook)
+            return self.send_json(201, {'webhook': webhook}, headers)
+
+        if url.path.endswith(f'/webhooks/{resource}') and method == 'DELETE':
+            webhook_id = int(resource.removesuffix('.json'))
+            with self.fake.lock:
+                self.fake.webhooks = [webhook for webhook in self.fake.webhooks if webhook['id'] != webhook_id]
+            return self.send_json(200, {}, headers)
+
+        if resource == 'graphql.json' and method == 'POST':
+            return self.send_json(200, self.graphql(self.read_json()), headers)
+
+        if resource == 'products.json' and method == 'GET':
+            return self.send_json(200, {'products': self.paginate(self.fake.products, url.path, query, headers)}, headers)
+
+        if url.path.endswith('/orders/count.json') and method == 'GET':
+            return self.send_json(200, {'count': len(self.fake.orders)}, headers)
+
+        if resource == 'orders.json' and method == 'GET':
+            orders = self.paginate(self.filter_orders(query), url.path, query, headers)
+            if 'fields' in query:
+                fields = query['fields'][0].split(',')
+                orders = [{field: order.get(field) for field in fields} for order in orders]
+            return self.send_json(200, {'orders': orders}, headers)
+
+        return self.send_json(404, {'errors': 'Not Found'}, headers)
+
+    def graphql(self, payload):
+        """Answer the bulk operation mutation and status query bulk_import sends."""
+        query, variables = payload.get('query', ''), payload.get('variables') or {}
+        throttle_status = {'maximumAvailable': 2000.0, 'currentlyAvailable': 1990, 'restoreRate': 100.0}
+        extensions = {'cost': {'requestedQueryCost': 10, 'throttleStatus': throttle_status}}
+
+        if 'bulkOperationRunQuery' in query:
+            with self.fake.lock:
+                operation_id = f'gid://shopify/BulkOperation/{len(self.fake.bulk_operations) + 1}'
+                self.fake.bulk_operations.append(operation_id)
+            operation = {'id': operation_id, 'status': 'CREATED'}
+            return {'data': {'bulkOperationRunQuery': {'bulkOperation': operation, 'userErrors': []}}, 'extensions': extensions}
+
+        operation_id = variables.get('id')
+        if operation_id not in self.fake.bulk_operations:
+            return {'data': {'node': None}, 'extensions': extensions}
+
+        number = operation_id.rsplit('/', 1)[-1]
+        node = {
+            'id': operation_id, 'status': 'COMPLETED', 'errorCode': None, 'objectCount': str(len(self.fake.orders)),
+            'url': f'{self.fake.base_url}/bulk-results/{number}.jsonl' if self.fake.orders else None,
+        }
+        return {'data': {'node': node}, 'extensions': extensions}
+
+    def send_result_file(self, number):
+        if f'gid://shopify/BulkOperation/{number}' in self.fake.expired_operations:
+            return self.send_json(403, {'error': 'Request has expired'})
+
+        content = self.fake.bulk_result()
+        range_header = self.headers.get('Range')
+        self.fake.result_ranges.append(range_header)
+
+        status, start = 200, 0
+        if range_header:
+            start = int(range_header.removeprefix('bytes=').rstrip('-'))
+            if start >= len(content):
+                return self.send_json(416, {'error': 'Requested range not satisfiable'})
+            status = 206
+
+        body = content[start:]
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/jsonl')
+        self.send_header('Content-Length', str(len(body)))
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{len(content) - 1}/{len(content)}')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def paginate(self, items, path, query, headers):
+        """Return one page of items, adding a Link header for the next one; page_info is a plain offset here."""
+        limit = min(int(query.get('limit', ['50'])[0]), 250)
+        start = int(query.get('page_info', ['0'])[0])
+        if start + limit < len(items):
+            params = {name: values[0] for name, values in query.items()}
+            next_url = f"{self.fake.base_url}{path}?{urlencode({**params, 'page_info': start + limit})}"
+            headers['Link'] = f'<{next_url}>; rel="next"'
+        return items[start:start + limit]
+
+    def filter_orders(self, query):
+        orders = sorted(self.fake.orders, key=lambda order: order['id'])
+        if 'ids' in query:
+            ids = {int(order_id) for order_id in query['ids'][0].split(',')}
+            orders = [order for order in orders if order['id'] in ids]
+        if 'since_id' in query:
+            orders = [order for order in orders if order['id'] > int(query['since_id'][0])]
+        if 'updated_at_min' in query:
+            updated_at_min = datetime.fromisoformat(query['updated_at_min'][0])
+            orders = [order for order in orders if datetime.fromisoformat(order['updated_at']) >= updated_at_min]
+        return orders
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def do_DELETE(self):
+        self.handle_request('DELETE')
@@ -7,9 +7,6 @@ from django.urls import reverse
 from rest_framework.response import Response
 from rest_framework import status
 
-import shopify
-from shopify.utils import shop_url
-
 from ..models import Shop
 
 logger = logging.getLogger(__name__)
@@ -41,6 +38,8 @@ def authenticate(request):
 
 def get_sanitized_shop_domain(request):
     """Retrieve and sanitize the shop domain from the request."""
+    from shopify.utils import shop_url
+
     shop = request.query_params.get('shop')
     sanitized_shop_domain = shop_url.sanitize_shop_domain(shop)
 
@@ -65,6 +64,8 @@ def create_auth_params():
 
 def create_shopify_session(shop_domain_url):
     """Create a new Shopify session for the specified shop URI."""
+    import shopify
+
     shopify_api_version = settings.SHOPIFY_API_VERSION
     shopify_api_key = settings.SHOPIFY_API_KEY
     shopify_api_secret = settings.SHOPIFY_API_SECRET
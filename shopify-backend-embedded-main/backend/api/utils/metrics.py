@@ -0,0 +1,195 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Seconds; Prometheus' default latency buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250)
+
+DB = 'db'
+SHOPIFY = 'shopify'
+AUTH = 'auth'
+
+
+def format_labels(labels):
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}' if labels else ''
+
+
+class Histogram:
+    """Bucketed distribution keyed by label values, exposed with cumulative buckets, _sum and _count."""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # Per label key: [per-bucket counts (last one is +Inf), sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+
+        for key, (counts, total) in values:
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                yield f'{self.name}_bucket', (*labels, ('le', bound)), cumulative
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, cumulative
+
+
+class CollectedMetric:
+    """Gauge or counter whose values are read at scrape time from collect(), an iterable of (label values, value)."""
+
+    def __init__(self, name, documentation, labelnames, collect, type='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.collect = collect
+        self.type = type
+
+    def samples(self):
+        for key, value in sorted(self.collect()):
+            yield self.name, tuple(zip(self.labelnames, key)), value
+
+
+class Registry:
+    """The metrics of this process, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def expose(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_DURATION = registry.register(Histogram(
+    'http_request_duration_seconds', "Time to produce a response, by route.", ('route', 'method', 'status'),
+))
+REQUEST_DB_QUERIES = registry.register(Histogram(
+    'http_request_db_queries', "Database queries per request, by route.", ('route',), buckets=QUERY_COUNT_BUCKETS,
+))
+REQUEST_DB_DURATION = registry.register(Histogram(
+    'http_request_db_duration_seconds', "Time spent in database queries per request, by route.", ('route',),
+))
+SHOPIFY_REQUEST_DURATION = registry.register(Histogram(
+    'shopify_request_duration_seconds', "Latency of outbound Shopify Admin API calls.", ('api', 'status'),
+))
+SESSION_TOKEN_DURATION = registry.register(Histogram(
+    'session_token_verify_duration_seconds', "Time to verify a session token and load its shop.",
+))
+
+
+class RequestTimings:
+    """Time and call counts per component (db, shopify, auth) while serving one request."""
+
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.counts = defaultdict(int)
+
+    def add(self, component, seconds):
+        self.durations[component] += seconds
+        self.counts[component] += 1
+
+    def server_timing(self, total):
+        """Render a Server-Timing header value, durations in milliseconds."""
+        entries = [
+            f'{component};dur={seconds * 1000:.1f};desc="{self.counts[component]} calls"'
+            for component, seconds in self.durations.items()
+        ]
+        entries.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(entries)
+
+
+# Follows the request into sync_to_async threads, so async views are covered too.
+current_timings = ContextVar('request_timings', default=None)
+
+
+def record(component, seconds):
+    """Add time spent in a component to the current request, if any."""
+    timings = current_timings.get()
+    if timings is not None:
+        timings.add(component, seconds)
+
+
+@contextmanager
+def timed(component, histogram=None):
+    """Time the block as a component of the current request, and into histogram if given."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        record(component, seconds)
+        if histogram is not None:
+            histogram.observe(seconds)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper that times queries run on behalf of a request."""
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add(DB, time.perf_counter() - started)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """connection_created receiver: time every query on the connection.
+
+    Registered per connection rather than around each request so the queries async
+    views run in sync_to_async threads, on those threads' connections, are counted too.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def observe_shopify(api, status, seconds):
+    """Record one outbound Shopify call; status is the HTTP status code, or 'error' if none was received."""
+    SHOPIFY_REQUEST_DURATION.observe(seconds, api=api, status=str(status))
+    record(SHOPIFY, seconds)
+
+
+def observe_request(route, method, status, seconds, timings):
+    REQUEST_DURATION.observe(seconds, route=route, method=method, status=str(status))
+    REQUEST_DB_QUERIES.observe(timings.counts.get(DB, 0), route=route)
+    REQUEST_DB_DURATION.observe(timings.durations.get(DB, 0.0), route=route)
@@ -0,0 +1,42 @@
+import base64
+import json
+
+from django.conf import settings
+
+
+def encode_cursor(*values):
+    """Encode keyset values into an opaque, URL-safe cursor."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('utf-8').rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """Decode a cursor produced by encode_cursor, raising ValueError if it is malformed."""
+    if not cursor:
+        return None
+
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor.")
+
+    if not isinstance(values, list) or len(values) != size or not all(isinstance(value, int) for value in values):
+        raise ValueError("Invalid cursor.")
+
+    return values
+
+
+def get_page_size(query_params):
+    """Read the page_size query parameter, clamped to settings.MAX_PAGE_SIZE."""
+    page_size = query_params.get('page_size')
+    if page_size is None:
+        return settings.DEFAULT_PAGE_SIZE
+
+    try:
+        page_size = int(page_size)
+    except ValueError:
+        raise ValueError("page_size must be an integer.")
+
+    if page_size < 1:
+        raise ValueError("page_size must be positive.")
+
+    return min(page_size, settings.MAX_PAGE_SIZE)
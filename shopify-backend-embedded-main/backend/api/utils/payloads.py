@@ -0,0 +1,42 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+
+import msgspec
+
+
+class OrderPayload(msgspec.Struct):
+    """The order webhook fields we store; everything else in the payload is skipped while decoding."""
+    id: int
+    currency: str
+    current_subtotal_price: Decimal
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    financial_status: Optional[str] = None
+    cancelled_at: Optional[datetime] = None
+
+
+_order_decoder = msgspec.json.Decoder(OrderPayload)
+
+
+class OrderPage(msgspec.Struct):
+    orders: list[OrderPayload]
+
+
+_order_page_decoder = msgspec.json.Decoder(OrderPage)
+
+
+def decode_order(body):
+    """Decode an order webhook body into an OrderPayload. Raises ValueError if a field is missing or malformed."""
+    try:
+        return _order_decoder.decode(body)
+    except msgspec.DecodeError as e:
+        raise ValueError(f"Invalid order payload: {e}") from e
+
+
+def decode_orders(body):
+    """Decode an Admin API orders.json page into a list of OrderPayloads. Raises ValueError like decode_order()."""
+    try:
+        return _order_page_decoder.decode(body).orders
+    except msgspec.DecodeError as e:
+        raise ValueError(f"Invalid orders page: {e}") from e
@@ -0,0 +1,222 @@
+import logging
+import queue
+import threading
+
+from django.db import connection, transaction
+
+from . import ingest, rollup
+
+logger = logging.getLogger(__name__)
+
+CSV = 'csv'
+NDJSON = 'ndjson'
+FORMATS = (CSV, NDJSON)
+
+CONTENT_TYPES = {CSV: 'text/csv', NDJSON: 'application/x-ndjson'}
+
+ORDER_COLUMNS = 'order_id, currency, current_subtotal_price, created_at, updated_at, financial_status, cancelled_at'
+
+# Control characters never occur in json output, so CSV with these as quote and
+# delimiter passes each JSON document through COPY untouched, one per line.
+RAW_LINES = "FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02'"
+
+EXPORT_QUERIES = {
+    CSV: f'''
+        COPY (SELECT {ORDER_COLUMNS} FROM api_order WHERE shop_id = %s ORDER BY id)
+        TO STDOUT WITH (FORMAT csv, HEADER)
+    ''',
+    NDJSON: f'''
+        COPY (
+            SELECT json_build_object(
+                'order_id', order_id, 'currency', currency,
+                'current_subtotal_price', current_subtotal_price, 'created_at', created_at,
+                'updated_at', updated_at, 'financial_status', financial_status, 'cancelled_at', cancelled_at
+            )
+            FROM api_order WHERE shop_id = %s ORDER BY id
+        ) TO STDOUT WITH ({RAW_LINES})
+    ''',
+}
+
+STAGING_TABLES = {
+    CSV: '''
+        CREATE TEMPORARY TABLE order_copy_staging (
+            order_id bigint, currency varchar(3), current_subtotal_price numeric(10, 3), created_at bigint,
+            updated_at bigint, financial_status varchar(32), cancelled_at bigint
+        ) ON COMMIT DROP
+    ''',
+    NDJSON: 'CREATE TEMPORARY TABLE order_copy_staging (doc jsonb) ON COMMIT DROP',
+}
+
+STAGING_COPIES = {
+    CSV: f'COPY order_copy_staging ({ORDER_COLUMNS}) FROM STDIN WITH (FORMAT csv, HEADER)',
+    NDJSON: f'COPY order_copy_staging (doc) FROM STDIN WITH ({RAW_LINES})',
+}
+
+# A missing updated_at loads as 0, like the column default, so any webhook replaces the row.
+STAGING_ROWS = {
+    CSV: '''
+        SELECT order_id, currency, current_subtotal_price, created_at,
+               coalesce(updated_at, 0) AS updated_at, coalesce(financial_status, '') AS financial_status, cancelled_at
+        FROM order_copy_staging
+    ''',
+    NDJSON: '''
+        SELECT (doc->>'order_id')::bigint AS order_id, doc->>'currency' AS currency,
+               (doc->>'current_subtotal_price')::numeric(10, 3) AS current_subtotal_price,
+               (doc->>'created_at')::bigint AS created_at,
+               coalesce((doc->>'updated_at')::bigint, 0) AS updated_at,
+               coalesce(doc->>'financial_status', '') AS financial_status,
+               (doc->>'cancelled_at')::bigint AS cancelled_at
+        FROM order_copy_staging
+    ''',
+}
+
+# One row per order in ingest.ORDER_COLUMNS order, for ingest.ORDER_MERGE; of duplicate order
+# ids within one file, the latest version is kept.
+STAGED_ORDERS = '''
+    SELECT DISTINCT ON (order_id) order_id, %s::bigint, currency, current_subtotal_price,
+           created_at, updated_at, financial_status, cancelled_at
+    FROM ({rows}) AS staged
+    ORDER BY order_id, updated_at DESC
+'''
+
+
+class ExportCancelled(Exception):
+    """Raised inside the COPY writer once the consumer of a streamed export has gone away."""
+
+
+class ExportFailed(Exception):
+    """Raised to the consumer of a streamed export whose producer stopped before finishing it."""
+
+
+class QueueWriter:
+    """File-like target for COPY TO that hands fixed-size chunks to a bounded queue."""
+
+    def __init__(self, chunks, cancelled, chunk_size):
+        self.chunks = chunks
+        self.cancelled = cancelled
+        self.chunk_size = chunk_size
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer += data.encode() if isinstance(data, str) else data
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if self.buffer:
+            self.put(bytes(self.buffer))
+            self.buffer.clear()
+
+    def put(self, item):
+        while not self.cancelled.is_set():
+            try:
+                self.chunks.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+        raise ExportCancelled()
+
+
+def check_format(fmt):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format '{fmt}', expected one of: {', '.join(FORMATS)}")
+
+
+def copy_orders_to(shop_id, fileobj, fmt=CSV):
+    """Write a shop's orders to a file-like object with COPY ... TO STDOUT."""
+    check_format(fmt)
+
+    with connection.cursor() as cursor:
+        sql = cursor.mogrify(EXPORT_QUERIES[fmt], [shop_id]).decode()
+        cursor.copy_expert(sql, fileobj)
+
+
+def stream_orders(shop_id, fmt=CSV, chunk_size=65536, poll_interval=1.0):
+    """
+    Yield a shop's orders as CSV or NDJSON byte chunks for a streaming response.
+
+    COPY runs on its own connection in a background thread; the bounded queue keeps
+    at most a few chunks in memory and stalls the export while the client is slow.
+    If the export fails, the error is raised to the consumer, so a truncated export
+    aborts the response instead of passing for a complete one.
+    """
+    check_format(fmt)
+    chunks = queue.Queue(maxsize=8)
+    cancelled = threading.Event()
+
+    def produce():
+        # The queue ends with None, or with the exception that stopped the export.
+        end = None
+        try:
+            writer = QueueWriter(chunks, cancelled, chunk_size)
+            copy_orders_to(shop_id, writer, fmt)
+            writer.flush()
+        except ExportCancelled:
+            return
+        except BaseException as e:
+            logger.error(f"Order export for shop {shop_id} failed: {e}")
+            end = e
+        finally:
+            connection.close()
+
+        try:
+            QueueWriter(chunks, cancelled, chunk_size).put(end)
+        except ExportCancelled:
+            pass
+
+    producer = threading.Thread(target=produce, name=f"order-export-{shop_id}", daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            try:
+                chunk = chunks.get(timeout=poll_interval)
+            except queue.Empty:
+                # A producer that died without ending the queue will never put anything again.
+                if not producer.is_alive() and chunks.empty():
+                    raise ExportFailed(f"Order export for shop {shop_id} stopped before it finished")
+                continue
+
+            if chunk is None:
+                break
+            if isinstance(chunk, BaseException):
+                raise chunk
+            yield chunk
+    finally:
+        cancelled.set()
+
+
+def copy_orders_from(shop_id, fileobj, fmt=CSV):
+    """
+    Load orders for a shop from a file-like CSV (with header) or NDJSON stream.
+
+    Rows are COPYed into a temporary staging table and merged into api_order in one
+    statement by the same upsert as webhooks, so newer versions replace older stored
+    ones. Returns counts of inserted and updated orders.
+    """
+    check_format(fmt)
+    staged = STAGED_ORDERS.format(rows=STAGING_ROWS[fmt])
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(STAGING_TABLES[fmt])
+            cursor.copy_expert(STAGING_COPIES[fmt], fileobj)
+
+            rollup.lock_shops(cursor, [shop_id])
+
+            def upsert(retry):
+                if retry is None:
+                    cursor.execute(ingest.ORDER_MERGE.format(source=staged), [shop_id])
+                else:
+                    source = f'SELECT * FROM ({staged}) AS retried WHERE order_id = ANY(%s)'
+                    cursor.execute(ingest.ORDER_MERGE.format(source=source), [shop_id, list(retry)])
+                return cursor.fetchall()
+
+            stored = ingest.merge_orders(upsert)
+
+    inserted = sum(1 for _, is_new in stored if is_new)
+    updated = len(stored) - inserted
+
+    logger.info(f"Loaded orders for shop {shop_id}: {inserted} new, {updated} updated")
+    return {'inserted': inserted, 'updated': updated}
@@ -0,0 +1,133 @@
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from ..models import Shop
+from . import rollup, shop_cache
+
+logger = logging.getLogger(__name__)
+
+# Tables holding per-shop rows, in deletion order; api_shop itself goes last. Orders go
+# first and take themselves out of the rollups, so a shop reinstalled mid-purge keeps
+# rollups that match the orders it has left.
+PURGE_TABLES = ('api_order', 'api_product', 'api_orderimport', 'api_orderdailyrollup')
+
+# Stops deleting, batch by batch, as soon as the shop is reinstalled.
+PURGE_BATCH = '''
+    DELETE FROM {table} WHERE id IN (
+        SELECT id FROM {table}
+        WHERE shop_id = %s
+          AND EXISTS (SELECT 1 FROM api_shop WHERE id = %s AND uninstalled_at IS NOT NULL)
+        LIMIT %s
+    )
+'''
+
+PURGE_ORDER_BATCH = f'''
+    WITH purged AS (
+        {PURGE_BATCH.format(table='api_order')}
+        RETURNING shop_id, currency, current_subtotal_price, created_at
+    ), retracted AS ({rollup.ROLLUP_RETRACT.format(source='purged')})
+    SELECT count(*) FROM purged
+'''
+
+
+def mark_uninstalled(shop_domain):
+    """
+    Deactivate a shop right away: clear its access token and stamp uninstalled_at.
+
+    Its data stays until purge_shop() removes it in the background. Returns False if
+    the shop is unknown or already uninstalled.
+    """
+    current_timestamp = int(time.time())
+
+    with transaction.atomic():
+        updated = Shop.objects.filter(domain=shop_domain, uninstalled_at__isnull=True).update(
+            access_token='',
+            uninstalled_at=current_timestamp,
+            updated_at=current_timestamp,
+        )
+        transaction.on_commit(lambda: shop_cache.invalidate_shop(shop_domain))
+
+    return bool(updated)
+
+
+def claim_purge(shop_id):
+    """Take an uninstalled shop's purge lease unless a purge that is still heartbeating holds it. Returns True if taken."""
+    current_timestamp = int(time.time())
+    lease_expired_at = current_timestamp - settings.SHOP_PURGE_LEASE_SECONDS
+
+    return bool(
+        Shop.objects.filter(id=shop_id, uninstalled_at__isnull=False)
+        .filter(Q(purge_heartbeat_at__isnull=True) | Q(purge_heartbeat_at__lt=lease_expired_at))
+        .update(purge_heartbeat_at=current_timestamp)
+    )
+
+
+def delete_batch(cursor, table, shop_id, batch_size):
+    """Delete one batch of the shop's rows from table and extend the purge lease. Returns the rows deleted."""
+    with transaction.atomic():
+        if table == 'api_order':
+            rollup.lock_shops(cursor, [shop_id])
+            cursor.execute(PURGE_ORDER_BATCH, [shop_id, shop_id, batch_size])
+            deleted = cursor.fetchone()[0]
+        else:
+            cursor.execute(PURGE_BATCH.format(table=table), [shop_id, shop_id, batch_size])
+            deleted = cursor.rowcount
+
+        Shop.objects.filter(id=shop_id).update(purge_heartbeat_at=int(time.time()))
+
+    return deleted
+
+
+def purge_shop(shop_id, batch_size=None):
+    """
+    Delete an uninstalled shop's data batch_size rows per statement, then the shop itself.
+
+    Each batch commits on its own, so no transaction outlives a single batch; a lease on
+    the shop row keeps other workers off it, which unlike a session advisory lock holds
+    behind a transaction-pooling pgbouncer. Yields (table, rows deleted from it so far)
+    after every batch. Stops early, keeping the shop, if it is reinstalled meanwhile.
+    """
+    batch_size = batch_size or settings.SHOP_PURGE_BATCH_SIZE
+
+    if not claim_purge(shop_id):
+        logger.info(f"Shop {shop_id} is already being purged by another worker, or was reinstalled.")
+        return
+
+    with connection.cursor() as cursor:
+        try:
+            for table in PURGE_TABLES:
+                deleted = 0
+                while True:
+                    batch = delete_batch(cursor, table, shop_id, batch_size)
+                    deleted += batch
+                    yield table, deleted
+                    if batch < batch_size:
+                        break
+
+                logger.info(f"Purged {deleted} rows from {table} for shop {shop_id}")
+
+            with transaction.atomic():
+                shop = Shop.objects.select_for_update().filter(id=shop_id, uninstalled_at__isnull=False).first()
+                if shop is None:
+                    logger.info(f"Shop {shop_id} was reinstalled; purge stopped.")
+                    return
+
+                # Webhooks still queued for the shop would only fail against a missing shop.
+                cursor.execute('DELETE FROM api_queuedwebhook WHERE shop_domain = %s', [shop.domain])
+                # Whatever arrived after the batches is small enough for the cascade.
+                shop.delete()
+                transaction.on_commit(lambda: shop_cache.invalidate_shop(shop.domain))
+
+            logger.info(f"Purged shop {shop.domain}")
+        finally:
+            # A no-op once the shop is gone; otherwise lets the next run resume at once.
+            Shop.objects.filter(id=shop_id).update(purge_heartbeat_at=None)
+
+
+def uninstalled_shops():
+    """Return the shops waiting to be purged, oldest uninstall first."""
+    return Shop.objects.filter(uninstalled_at__isnull=False).order_by('uninstalled_at')
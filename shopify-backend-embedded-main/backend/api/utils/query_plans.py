@@ -0,0 +1,95 @@
+import json
+import time
+
+from ..views.order import OrderList
+
+SEED_SHOPS = '''
+    INSERT INTO api_shop (domain, access_token, access_scopes, created_at)
+    SELECT 'plan-check-' || n || '.myshopify.com', 'token', '', %s
+    FROM generate_series(1, %s) AS n
+'''
+
+SEED_ORDERS = '''
+    INSERT INTO api_order (order_id, shop_id, currency, current_subtotal_price, created_at)
+    SELECT 9000000000000 + n, s.id, 'USD', 10, %s - n
+    FROM generate_series(1, %s) AS n
+    JOIN api_shop s ON s.domain = 'plan-check-' || (n %% %s + 1) || '.myshopify.com'
+'''
+
+SEED_EVENTS = '''
+    INSERT INTO api_webhookevent (event_id, created_at)
+    SELECT 'plan-check-' || n, %s - n
+    FROM generate_series(1, %s) AS n
+'''
+
+
+def seed(cursor, shops, orders, events):
+    """Insert plan-check shops, orders and webhook events and analyze them; run it inside a transaction that is rolled back."""
+    current_timestamp = int(time.time())
+
+    cursor.execute(SEED_SHOPS, [current_timestamp, shops])
+    cursor.execute(SEED_ORDERS, [current_timestamp, orders, shops])
+    cursor.execute(SEED_EVENTS, [current_timestamp, events])
+    cursor.execute('ANALYZE api_shop, api_order, api_webhookevent')
+
+
+def hot_queries(shops, events):
+    """Return (label, query, params, expected index name prefix) for each hot query, against seed() data."""
+    domain = f"plan-check-{shops // 2}.myshopify.com"
+    current_timestamp = int(time.time())
+
+    return [
+        (
+            "shop lookup by domain",
+            'SELECT id, access_token FROM api_shop WHERE domain = %s',
+            [domain],
+            'api_shop_domain',
+        ),
+        (
+            "order list first page",
+            OrderList.ORDERS_QUERY.format(after='') + 'LIMIT %s',
+            [domain, 101],
+            'api_order_shop_created_idx',
+        ),
+        (
+            "order list keyset page",
+            OrderList.ORDERS_QUERY.format(after=OrderList.AFTER_CURSOR) + 'LIMIT %s',
+            [domain, current_timestamp, 2**62, 101],
+            'api_order_shop_created_idx',
+        ),
+        (
+            "webhook event dedup",
+            'SELECT event_id FROM api_webhookevent WHERE event_id IN (%s, %s, %s)',
+            ['plan-check-1', 'plan-check-2', 'plan-check-3'],
+            'api_webhookevent_event_id',
+        ),
+        (
+            "webhook event pruning",
+            'SELECT id FROM api_webhookevent WHERE created_at < %s LIMIT 1000',
+            [current_timestamp - events + events // 100],
+            'api_webhookevent_created_idx',
+        ),
+    ]
+
+
+def walk(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from walk(child)
+
+
+def explain(cursor, query, params):
+    """EXPLAIN a query. Returns (index names used, relations read by sequential scan)."""
+    cursor.execute('EXPLAIN (FORMAT JSON) ' + query, params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    nodes = list(walk(plan[0]['Plan']))
+    indexes = {node['Index Name'] for node in nodes if 'Index Name' in node}
+    seq_scans = {node['Relation Name'] for node in nodes if node['Node Type'] == 'Seq Scan'}
+    return indexes, seq_scans
+
+
+def uses_index(indexes, seq_scans, index_prefix):
+    return not seq_scans and any(index.startswith(index_prefix) for index in indexes)
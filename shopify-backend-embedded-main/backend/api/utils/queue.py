@@ -0,0 +1,191 @@
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Min
+
+from ..models import QueuedWebhook
+from . import catalog, fast_json, ingest, payloads, shop_cache
+
+logger = logging.getLogger(__name__)
+
+SHOPIFY_HEADER_PREFIX = 'HTTP_X_SHOPIFY_'
+
+
+def handle_order_change(batch):
+    """Apply queued 'orders/*' webhooks in one bulk write. Returns failures by queue id."""
+    entries = []
+    failures = {}
+
+    for queued in batch:
+        try:
+            entries.append((queued.id, payloads.decode_order(bytes(queued.body)), queued.shop_domain, queued.event_id))
+        except ValueError as e:
+            failures[queued.id] = f"Invalid webhook payload: {e}"
+
+    stored, ingest_failures = ingest.ingest_order_batch(entries)
+    failures.update(ingest_failures)
+    logger.info(f"Stored {stored} new or changed orders from {len(batch)} queued webhooks.")
+
+    return failures
+
+
+def handle_product_change(batch):
+    """Apply queued 'products/*' webhooks in delivery order. Returns failures by queue id."""
+    failures = {}
+
+    for queued in batch:
+        try:
+            shop_id, _ = shop_cache.get_shop_credentials(queued.shop_domain)
+            with transaction.atomic():
+                catalog.apply_product_webhook(queued.topic, shop_id, fast_json.loads(bytes(queued.body)))
+        except Exception as e:
+            failures[queued.id] = str(e)
+
+    return failures
+
+
+WEBHOOK_HANDLERS = {
+    'orders/create': handle_order_change,
+    'orders/updated': handle_order_change,
+    'orders/paid': handle_order_change,
+    'orders/cancelled': handle_order_change,
+    'products/create': handle_product_change,
+    'products/update': handle_product_change,
+    'products/delete': handle_product_change,
+}
+
+
+def enqueue_webhook(request, topic):
+    """Append a verified webhook's raw body and Shopify headers to the durable queue."""
+    current_timestamp = int(time.time())
+    headers = {key: value for key, value in request.META.items() if key.startswith(SHOPIFY_HEADER_PREFIX)}
+
+    return QueuedWebhook.objects.create(
+        topic=topic,
+        shop_domain=request.META.get('HTTP_X_SHOPIFY_SHOP_DOMAIN', ''),
+        event_id=request.META.get('HTTP_X_SHOPIFY_EVENT_ID'),
+        headers=headers,
+        body=request.body,
+        created_at=current_timestamp,
+        available_at=current_timestamp,
+    )
+
+
+def process_batch(batch_size=None):
+    """Claim up to batch_size queued webhooks and apply them. Returns the number claimed."""
+    batch_size = batch_size or settings.WEBHOOK_QUEUE_BATCH_SIZE
+    current_timestamp = int(time.time())
+
+    with transaction.atomic():
+        batch = list(
+            QueuedWebhook.objects
+            .select_for_update(skip_locked=True)
+            .filter(attempts__lt=settings.WEBHOOK_QUEUE_MAX_ATTEMPTS, available_at__lte=current_timestamp)
+            .order_by('id')[:batch_size]
+        )
+
+        by_topic = {}
+        for queued in batch:
+            by_topic.setdefault(queued.topic, []).append(queued)
+
+        failures = {}
+        for topic, queued_items in by_topic.items():
+            try:
+                with transaction.atomic():
+                    failures.update(WEBHOOK_HANDLERS[topic](queued_items))
+
+            except Exception as e:
+                logger.error(f"Error processing {len(queued_items)} queued '{topic}' webhooks: {e}")
+                failures.update({queued.id: str(e) for queued in queued_items})
+
+        for queued in batch:
+            if queued.id in failures:
+                queued.attempts += 1
+                queued.last_error = failures[queued.id]
+                queued.available_at = current_timestamp + settings.WEBHOOK_QUEUE_RETRY_DELAY * queued.attempts
+                queued.save(update_fields=['attempts', 'last_error', 'available_at'])
+
+        QueuedWebhook.objects.filter(id__in=[queued.id for queued in batch if queued.id not in failures]).delete()
+
+    return len(batch)
+
+
+def dead_letters():
+    """Queued webhooks that used up WEBHOOK_QUEUE_MAX_ATTEMPTS and are no longer retried."""
+    return QueuedWebhook.objects.filter(attempts__gte=settings.WEBHOOK_QUEUE_MAX_ATTEMPTS)
+
+
+def dead_letter_summary():
+    """Count dead-lettered webhooks per topic and shop, with the oldest one's created_at."""
+    return (
+        dead_letters().values('topic', 'shop_domain')
+        .annotate(count=Count('id'), oldest=Min('created_at'))
+        .order_by('-count', 'topic', 'shop_domain')
+    )
+
+
+def prune_dead_letters(retention_hours=None, batch_size=1000):
+    """Delete dead-lettered webhooks older than the retention window in bounded batches. Yields the running total.
+
+    Their bodies are full Shopify payloads, customer details included, so they aren't kept for good.
+    """
+    retention_hours = retention_hours or settings.WEBHOOK_QUEUE_DEAD_LETTER_RETENTION_HOURS
+    cutoff = int(time.time()) - retention_hours * 3600
+    deleted = 0
+
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                '''
+                DELETE FROM api_queuedwebhook
+                WHERE id IN (
+                    SELECT id FROM api_queuedwebhook
+                    WHERE attempts >= %s AND created_at < %s
+                    LIMIT %s
+                )
+                ''', [settings.WEBHOOK_QUEUE_MAX_ATTEMPTS, cutoff, batch_size]
+            )
+            deleted += cursor.rowcount
+
+        yield deleted
+
+        if cursor.rowcount < batch_size:
+            break
+
+
+def names_customer(body, order_ids, customer_id):
+    """Whether a queued order webhook body is about one of order_ids or the customer."""
+    try:
+        payload = fast_json.loads(body)
+    except ValueError:
+        return False
+    if not isinstance(payload, dict):
+        return False
+
+    customer = payload.get('customer') or {}
+    return payload.get('id') in order_ids or (customer_id is not None and customer.get('id') == customer_id)
+
+
+def delete_customer_webhooks(shop_domain, order_ids, customer_id=None, batch_size=1000):
+    """Delete the shop's queued order webhooks, dead letters included, about the given orders or customer.
+
+    Their bodies carry the customer's details, and one processed after a redaction would
+    store the redacted order again. Returns how many were deleted.
+    """
+    order_ids = set(order_ids)
+    last_id = deleted = 0
+
+    while True:
+        batch = list(
+            QueuedWebhook.objects.filter(shop_domain=shop_domain, topic__startswith='orders/', id__gt=last_id)
+            .order_by('id').values_list('id', 'body')[:batch_size]
+        )
+        if not batch:
+            return deleted
+
+        last_id = batch[-1][0]
+        matching = [queue_id for queue_id, body in batch if names_customer(bytes(body), order_ids, customer_id)]
+        if matching:
+            deleted += QueuedWebhook.objects.filter(id__in=matching).delete()[0]
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+REST = 'rest'
+GRAPHQL = 'graphql'
+
+
+class LeakyBucket:
+    """Local model of one Shopify leaky bucket, corrected by the fill level Shopify reports."""
+
+    def __init__(self, capacity, leak_rate):
+        self.capacity = capacity
+        self.leak_rate = leak_rate
+        self.level = 0.0
+        self.updated = time.monotonic()
+        self.requests = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+        # Monotonic time a throttled shop may retry at, from Shopify's Retry-After; 0 when not throttled.
+        self.retry_at = 0.0
+
+    def leak(self, now):
+        self.level = max(0.0, self.level - (now - self.updated) * self.leak_rate)
+        self.updated = now
+
+    def utilization(self):
+        return self.level / self.capacity if self.capacity else 0.0
+
+
+class RateLimiter:
+    """
+    Per-shop token buckets shared by every thread in the process.
+
+    acquire() blocks until a call fits under the bucket (minus a safety headroom),
+    so calls are delayed locally instead of being throttled by Shopify. It is also the
+    only place a throttled call waits: after a 429 the bucket holds calls until the
+    server's Retry-After and then lets the retry through.
+    """
+
+    def __init__(self, headroom):
+        self.headroom = headroom
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, shop_domain, api):
+        key = (shop_domain, api)
+        bucket = self._buckets.get(key)
+
+        if bucket is None:
+            if api == GRAPHQL:
+                bucket = LeakyBucket(settings.SHOPIFY_GRAPHQL_BUCKET_SIZE, settings.SHOPIFY_GRAPHQL_RESTORE_RATE)
+            else:
+                bucket = LeakyBucket(settings.SHOPIFY_REST_BUCKET_SIZE, settings.SHOPIFY_REST_LEAK_RATE)
+            self._buckets[key] = bucket
+
+        return bucket
+
+    def reserve(self, shop_domain, api=REST, cost=1, waited=0.0):
+        """Try to reserve capacity for a call. Returns 0 on success, else the seconds to wait before retrying."""
+        with self._lock:
+            bucket = self._bucket(shop_domain, api)
+            now = time.monotonic()
+            bucket.leak(now)
+            limit = bucket.capacity * (1 - self.headroom)
+
+            if bucket.retry_at:
+                if now < bucket.retry_at:
+                    return bucket.retry_at - now
+                # The wait Shopify asked for is over; this is the retry it expects.
+                bucket.retry_at = 0.0
+                bucket.level += cost
+                bucket.requests += 1
+                bucket.wait_seconds += waited
+                return 0
+
+            if bucket.level + cost <= limit or bucket.level == 0:
+                bucket.level += cost
+                bucket.requests += 1
+                bucket.wait_seconds += waited
+                return 0
+
+            return (bucket.level + cost - limit) / bucket.leak_rate
+
+    def acquire(self, shop_domain, api=REST, cost=1):
+        """Reserve capacity for a call, sleeping until it is available. Returns the seconds waited."""
+        waited = 0.0
+
+        while True:
+            delay = self.reserve(shop_domain, api, cost, waited)
+            if not delay:
+                return waited
+
+            time.sleep(delay)
+            waited += delay
+
+    async def aacquire(self, shop_domain, api=REST, cost=1):
+        """Async variant of acquire() that yields to the event loop while waiting."""
+        waited = 0.0
+
+        while True:
+            delay = self.reserve(shop_domain, api, cost, waited)
+            if not delay:
+                return waited
+
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def update_rest(self, shop_domain, call_limit_header):
+        """Sync the REST bucket with an 'X-Shopify-Shop-Api-Call-Limit: used/capacity' header."""
+        try:
+            used, capacity = (int(part) for part in call_limit_header.split('/'))
+        except (AttributeError, ValueError):
+            return
+
+        with self._lock:
+            bucket = self._bucket(shop_domain, REST)
+            bucket.leak(time.monotonic())
+            # Calls still in flight are not in Shopify's count yet, so never lower the local level.
+            bucket.level = max(bucket.level, float(used))
+            bucket.capacity = capacity
+
+    def update_graphql(self, shop_domain, throttle_status):
+        """Sync the GraphQL bucket with a response's extensions.cost.throttleStatus."""
+        try:
+            capacity = float(throttle_status['maximumAvailable'])
+            available = float(throttle_status['currentlyAvailable'])
+            restore_rate = float(throttle_status['restoreRate'])
+        except (KeyError, TypeError, ValueError):
+            return
+
+        with self._lock:
+            bucket = self._bucket(shop_domain, GRAPHQL)
+            bucket.leak(time.monotonic())
+            # As for REST: costs of queries still in flight are not in the report yet.
+            bucket.level = max(bucket.level, capacity - available)
+            bucket.capacity = capacity
+            bucket.leak_rate = restore_rate
+
+    def record_throttle(self, shop_domain, api=REST, retry_after=None):
+        """
+        Count a throttled response. With retry_after, hold the shop's calls for that many
+        seconds and then admit one; without it the bucket is treated as full and calls wait
+        for it to leak.
+        """
+        with self._lock:
+            bucket = self._bucket(shop_domain, api)
+            now = time.monotonic()
+            bucket.leak(now)
+            bucket.throttled += 1
+
+            if retry_after is not None:
+                bucket.retry_at = max(bucket.retry_at, now + retry_after)
+            else:
+                bucket.level = max(bucket.level, bucket.capacity)
+
+    def metrics(self):
+        """Return per-shop bucket utilization and counters."""
+        now = time.monotonic()
+        snapshot = {}
+
+        with self._lock:
+            for (shop_domain, api), bucket in self._buckets.items():
+                bucket.leak(now)
+                snapshot.setdefault(shop_domain, {})[api] = {
+                    'capacity': bucket.capacity,
+                    'level': round(bucket.level, 2),
+                    'utilization': round(bucket.utilization(), 4),
+                    'requests': bucket.requests,
+                    'throttled': bucket.throttled,
+                    'wait_seconds': round(bucket.wait_seconds, 3),
+                }
+
+        return snapshot
+
+
+    def collect(self, field):
+        """Yield ((shop, api), value) for one field of metrics(), for the /metrics exposition."""
+        for shop_domain, apis in self.metrics().items():
+            for api, stats in apis.items():
+                yield (shop_domain, api), stats[field]
+
+
+scheduler = RateLimiter(headroom=settings.SHOPIFY_RATE_LIMIT_HEADROOM)
+
+for name, field, documentation, kind in (
+    ('shopify_rate_limit_level', 'level', "Estimated fill of each shop's Shopify API bucket.", 'gauge'),
+    ('shopify_rate_limit_utilization', 'utilization', "Bucket fill as a fraction of its capacity.", 'gauge'),
+    ('shopify_rate_limit_throttled_total', 'throttled', "Throttled responses from Shopify.", 'counter'),
+):
+    metrics.registry.register(metrics.CollectedMetric(
+        name, documentation, ('shop', 'api'), lambda field=field: scheduler.collect(field), type=kind,
+    ))
@@ -0,0 +1,175 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Q
+
+from ..models import Order, RedactedOrder, Shop
+from . import fast_json, ingest, payloads, shopify_client
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 250
+ORDER_FIELDS = 'id,currency,current_subtotal_price,created_at,updated_at,financial_status,cancelled_at'
+
+
+def shopify_time(timestamp):
+    """Format epoch seconds as the ISO 8601 time the Admin API filters take."""
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat()
+
+
+def list_pages(shop, params):
+    """Yield each orders.json response for params, across all statuses, following Link pagination."""
+    url = 'orders.json'
+    params = {'status': 'any', 'limit': PAGE_SIZE, **params}
+
+    while url:
+        response = shopify_client.request('GET', shop.domain, shop.access_token, url, params=params)
+        yield response
+        # The next link carries the whole query in its page_info.
+        url, params = response.links.get('next', {}).get('url'), None
+
+
+def store_orders(shop_id, orders, stats):
+    """Upsert one page of orders in its own transaction, skipping redacted ones. Returns how many were new."""
+    with transaction.atomic():
+        stored = ingest.upsert_orders([ingest.order_row(order, shop_id) for order in orders])
+        Shop.objects.filter(id=shop_id).update(orders_reconcile_heartbeat_at=int(time.time()))
+
+    inserted = sum(1 for _, is_new in stored if is_new)
+    stats['inserted'] += inserted
+    stats['updated'] += len(stored) - inserted
+    return inserted
+
+
+def fill_gaps(shop, missing, last_order_id, stats):
+    """
+    Find orders older than the newest stored one that were never stored.
+
+    Walks the shop's order ids a page at a time, fetching in full only the ids with no local
+    row or tombstone, and stops as soon as missing orders have been found or last_order_id is passed.
+    """
+    for response in list_pages(shop, {'since_id': 0, 'fields': 'id'}):
+        order_ids = [order['id'] for order in fast_json.loads(response.content)['orders']]
+        if not order_ids:
+            break
+
+        stored_ids = set(Order.objects.filter(order_id__in=order_ids).values_list('order_id', flat=True))
+        stored_ids.update(RedactedOrder.objects.filter(order_id__in=order_ids).values_list('order_id', flat=True))
+        absent = [order_id for order_id in order_ids if order_id not in stored_ids]
+        if absent:
+            fetched = shopify_client.request(
+                'GET', shop.domain, shop.access_token, 'orders.json',
+                params={'ids': ','.join(map(str, absent)), 'status': 'any', 'limit': PAGE_SIZE, 'fields': ORDER_FIELDS},
+            )
+            missing -= store_orders(shop.id, payloads.decode_orders(fetched.content), stats)
+
+        if missing <= 0 or order_ids[-1] >= last_order_id:
+            break
+
+
+def catch_up(shop):
+    """
+    Bring a shop's orders in line with Shopify and advance its checkpoint.
+
+    Orders updated since the checkpoint are re-listed and upserted, which covers missed
+    create, update, paid and cancelled webhooks alike. If Shopify's order count is still
+    ahead of ours, orders past our highest id are listed next, then older ids are searched
+    for gaps. Returns counts of inserted and updated orders.
+    """
+    started = int(time.time())
+    if shop.orders_reconciled_at:
+        updated_at_min = shop.orders_reconciled_at - settings.ORDER_RECONCILE_OVERLAP_SECONDS
+    else:
+        updated_at_min = started - settings.ORDER_RECONCILE_LOOKBACK_HOURS * 3600
+    stats = {'inserted': 0, 'updated': 0}
+
+    for response in list_pages(shop, {'updated_at_min': shopify_time(updated_at_min), 'fields': ORDER_FIELDS}):
+        store_orders(shop.id, payloads.decode_orders(response.content), stats)
+
+    remote_count = shopify_client.request(
+        'GET', shop.domain, shop.access_token, 'orders/count.json', params={'status': 'any'},
+    ).json()['count']
+    local = Order.objects.filter(shop_id=shop.id).aggregate(count=Count('id'), last_order_id=Max('order_id'))
+    # Redacted orders are still counted by Shopify but must not be fetched again.
+    missing = remote_count - local['count'] - RedactedOrder.objects.filter(shop_domain=shop.domain).count()
+
+    if missing > 0:
+        last_order_id = local['last_order_id'] or 0
+        for response in list_pages(shop, {'since_id': last_order_id, 'fields': ORDER_FIELDS}):
+            missing -= store_orders(shop.id, payloads.decode_orders(response.content), stats)
+
+        if missing > 0 and last_order_id:
+            fill_gaps(shop, missing, last_order_id, stats)
+
+    Shop.objects.filter(id=shop.id).update(orders_reconciled_at=started)
+    logger.info(f"Reconciled orders for shop {shop.domain}: {stats['inserted']} missing, {stats['updated']} changed")
+    return stats
+
+
+def claim_reconcile(shop_id):
+    """Take the shop's reconcile lease unless a run that is still heartbeating holds it. Returns True if taken."""
+    current_timestamp = int(time.time())
+    lease_expired_at = current_timestamp - settings.ORDER_RECONCILE_LEASE_SECONDS
+
+    return bool(
+        Shop.objects.filter(id=shop_id)
+        .filter(Q(orders_reconcile_heartbeat_at__isnull=True) | Q(orders_reconcile_heartbeat_at__lt=lease_expired_at))
+        .update(orders_reconcile_heartbeat_at=current_timestamp)
+    )
+
+
+def reconcile_shop(shop):
+    """
+    Reconcile one shop under its lease. Returns None if another worker holds it.
+
+    The lease is a row update rather than a session advisory lock, which would leak
+    behind a transaction-pooling pgbouncer.
+    """
+    if not claim_reconcile(shop.id):
+        logger.info(f"Shop {shop.domain} is already being reconciled by another worker.")
+        return None
+
+    try:
+        return catch_up(shop)
+    finally:
+        Shop.objects.filter(id=shop.id).update(orders_reconcile_heartbeat_at=None)
+
+
+def reconcile_in_thread(shop):
+    try:
+        return reconcile_shop(shop)
+    finally:
+        # Pool threads each open their own connection; don't leave it behind.
+        connection.close()
+
+
+def installed_shops():
+    """Return the shops to reconcile, least recently reconciled first."""
+    return (
+        Shop.objects.filter(uninstalled_at__isnull=True).exclude(access_token='')
+        .order_by(F('orders_reconciled_at').asc(nulls_first=True), 'id')
+    )
+
+
+def reconcile_shops(shops, workers=None):
+    """
+    Reconcile shops concurrently on a bounded thread pool.
+
+    Each shop's Shopify calls go through its own rate limiter bucket, so shops don't slow
+    each other down. Yields (shop, stats, error) as each shop finishes; a failed shop keeps
+    its checkpoint and is retried on the next run.
+    """
+    with ThreadPoolExecutor(max_workers=workers or settings.ORDER_RECONCILE_WORKERS) as pool:
+        futures = {pool.submit(reconcile_in_thread, shop): shop for shop in shops}
+
+        for future in as_completed(futures):
+            shop = futures[future]
+            try:
+                yield shop, future.result(), None
+            except Exception as e:
+                logger.error(f"Failed to reconcile orders for shop {shop.domain}: {e}")
+                yield shop, None, e
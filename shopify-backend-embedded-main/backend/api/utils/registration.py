@@ -0,0 +1,161 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+
+from . import shopify_client
+from .callback import get_api_endpoint
+
+logger = logging.getLogger(__name__)
+
+# Webhook topics registered for every shop at install time, as (topic, url name).
+WEBHOOK_SUBSCRIPTIONS = [
+    ('app/uninstalled', 'uninstall'),
+    ('orders/create', 'webhook_orders'),
+    ('orders/updated', 'webhook_orders'),
+    ('orders/paid', 'webhook_orders'),
+    ('orders/cancelled', 'webhook_orders'),
+    ('products/create', 'webhook_products'),
+    ('products/update', 'webhook_products'),
+    ('products/delete', 'webhook_products'),
+]
+
+# Subscriptions once registered at an address that has since moved, as (topic, url name). The
+# URLs stay routed for shops installed before the move; registration replaces the subscriptions.
+RETIRED_SUBSCRIPTIONS = [
+    ('orders/create', 'webhook_order_create'),
+]
+
+
+def list_webhooks(shop_domain, access_token):
+    """Return the shop's existing webhook subscriptions as a dict of (topic, address) to subscription id."""
+    response = shopify_client.request('GET', shop_domain, access_token, 'webhooks.json', params={'limit': 250})
+    return webhook_ids(response)
+
+
+def webhook_ids(response):
+    return {(webhook['topic'], webhook['address']): webhook['id'] for webhook in response.json().get('webhooks', [])}
+
+
+def create_webhook(shop_domain, access_token, topic, address):
+    """Create a single webhook subscription."""
+    shopify_client.request(
+        'POST', shop_domain, access_token, 'webhooks.json',
+        json={'webhook': {'topic': topic, 'address': address, 'format': 'json'}},
+    )
+
+
+def delete_webhook(shop_domain, access_token, webhook_id):
+    """Delete a single webhook subscription."""
+    shopify_client.request('DELETE', shop_domain, access_token, f'webhooks/{webhook_id}.json')
+
+
+def retired_webhooks(existing, subscriptions, created):
+    """
+    Return (topic, id) of the existing subscriptions at a retired address whose topic is now
+    subscribed at its current one, so the shop doesn't receive each of those webhooks twice.
+    """
+    retired = {(topic, get_api_endpoint(url_name)) for topic, url_name in RETIRED_SUBSCRIPTIONS}
+    subscribed = {topic for topic, address in subscriptions if (topic, address) in existing} | set(created)
+    return [
+        (topic, webhook_id) for (topic, address), webhook_id in existing.items()
+        if (topic, address) in retired and topic in subscribed
+    ]
+
+
+def register_webhooks(shop_domain, access_token, subscriptions=None):
+    """
+    Create any missing webhook subscriptions concurrently, then delete the ones they replace
+    at retired addresses. Returns the topics that were created.
+    """
+    subscriptions = [
+        (topic, get_api_endpoint(url_name))
+        for topic, url_name in (subscriptions or WEBHOOK_SUBSCRIPTIONS)
+    ]
+
+    try:
+        existing = list_webhooks(shop_domain, access_token)
+    except shopify_client.ShopifyAPIError as e:
+        logger.error(f"Failed to list webhooks for shop {shop_domain}: {e}")
+        existing = {}
+
+    missing = [subscription for subscription in subscriptions if subscription not in existing]
+    created = []
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(len(missing), settings.SHOPIFY_WEBHOOK_REGISTRATION_WORKERS)) as pool:
+            futures = {
+                pool.submit(create_webhook, shop_domain, access_token, topic, address): topic
+                for topic, address in missing
+            }
+
+            for future in as_completed(futures):
+                topic = futures[future]
+                try:
+                    future.result()
+                    created.append(topic)
+                    logger.info(f"Webhook '{topic}' created for shop: {shop_domain}.")
+                except Exception as e:
+                    logger.error(f"Failed to create webhook '{topic}' for shop {shop_domain}: {e}")
+
+    for topic, webhook_id in retired_webhooks(existing, subscriptions, created):
+        try:
+            delete_webhook(shop_domain, access_token, webhook_id)
+            logger.info(f"Retired webhook '{topic}' deleted for shop: {shop_domain}.")
+        except Exception as e:
+            logger.error(f"Failed to delete retired webhook '{topic}' for shop {shop_domain}: {e}")
+
+    return created
+
+
+async def aregister_webhooks(shop_domain, access_token, subscriptions=None):
+    """Async variant of register_webhooks() that creates missing subscriptions with asyncio.gather."""
+    subscriptions = [
+        (topic, get_api_endpoint(url_name))
+        for topic, url_name in (subscriptions or WEBHOOK_SUBSCRIPTIONS)
+    ]
+
+    try:
+        response = await shopify_client.arequest('GET', shop_domain, access_token, 'webhooks.json', params={'limit': 250})
+        existing = webhook_ids(response)
+    except shopify_client.ShopifyAPIError as e:
+        logger.error(f"Failed to list webhooks for shop {shop_domain}: {e}")
+        existing = {}
+
+    missing = [subscription for subscription in subscriptions if subscription not in existing]
+    results = await asyncio.gather(
+        *(
+            shopify_client.arequest(
+                'POST', shop_domain, access_token, 'webhooks.json',
+                json={'webhook': {'topic': topic, 'address': address, 'format': 'json'}},
+            )
+            for topic, address in missing
+        ),
+        return_exceptions=True,
+    )
+
+    created = []
+    for (topic, _), result in zip(missing, results):
+        if isinstance(result, Exception):
+            logger.error(f"Failed to create webhook '{topic}' for shop {shop_domain}: {result}")
+        else:
+            created.append(topic)
+            logger.info(f"Webhook '{topic}' created for shop: {shop_domain}.")
+
+    retired = retired_webhooks(existing, subscriptions, created)
+    results = await asyncio.gather(
+        *(
+            shopify_client.arequest('DELETE', shop_domain, access_token, f'webhooks/{webhook_id}.json')
+            for _, webhook_id in retired
+        ),
+        return_exceptions=True,
+    )
+
+    for (topic, _), result in zip(retired, results):
+        if isinstance(result, Exception):
+            logger.error(f"Failed to delete retired webhook '{topic}' for shop {shop_domain}: {result}")
+        else:
+            logger.info(f"Retired webhook '{topic}' deleted for shop: {shop_domain}.")
+
+    return created
@@ -0,0 +1,83 @@
+import logging
+
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# First key of the two-part advisory lock taken per shop; the second is the shop id.
+ROLLUP_LOCK_NAMESPACE = 0x5244
+
+# Adds the per-day totals of the order rows in {source}; days are UTC.
+ROLLUP_AGGREGATE = '''
+    INSERT INTO api_orderdailyrollup (shop_id, day, currency, order_count, subtotal_sum)
+    SELECT shop_id, (to_timestamp(created_at) AT TIME ZONE 'UTC')::date, currency,
+           count(*), sum(current_subtotal_price)
+    FROM {source}
+    GROUP BY 1, 2, 3
+    ORDER BY 1, 2, 3
+    ON CONFLICT (shop_id, day, currency) DO UPDATE SET
+        order_count = api_orderdailyrollup.order_count + EXCLUDED.order_count,
+        subtotal_sum = api_orderdailyrollup.subtotal_sum + EXCLUDED.subtotal_sum
+'''
+
+# Takes the per-day totals of the order rows in {source} back out again, for orders that were deleted.
+ROLLUP_RETRACT = '''
+    UPDATE api_orderdailyrollup AS rollup SET
+        order_count = rollup.order_count - retracted.order_count,
+        subtotal_sum = rollup.subtotal_sum - retracted.subtotal_sum
+    FROM (
+        SELECT shop_id, (to_timestamp(created_at) AT TIME ZONE 'UTC')::date AS day, currency,
+               count(*) AS order_count, sum(current_subtotal_price) AS subtotal_sum
+        FROM {source}
+        GROUP BY 1, 2, 3
+    ) AS retracted
+    WHERE rollup.shop_id = retracted.shop_id AND rollup.day = retracted.day AND rollup.currency = retracted.currency
+'''
+
+# Adds signed per-order changes in {source} (shop_id, created_at, currency, order_count, subtotal_sum)
+# to the rollups, so an updated order moves its day by the difference from its previous version.
+ROLLUP_APPLY = '''
+    INSERT INTO api_orderdailyrollup (shop_id, day, currency, order_count, subtotal_sum)
+    SELECT shop_id, (to_timestamp(created_at) AT TIME ZONE 'UTC')::date, currency,
+           sum(order_count), sum(subtotal_sum)
+    FROM {source}
+    GROUP BY 1, 2, 3
+    HAVING sum(order_count) <> 0 OR sum(subtotal_sum) <> 0
+    ORDER BY 1, 2, 3
+    ON CONFLICT (shop_id, day, currency) DO UPDATE SET
+        order_count = api_orderdailyrollup.order_count + EXCLUDED.order_count,
+        subtotal_sum = api_orderdailyrollup.subtotal_sum + EXCLUDED.subtotal_sum
+'''
+
+ROLLUP_CHUNK = ROLLUP_AGGREGATE.format(source='api_order WHERE shop_id = %s AND id > %s AND id <= %s')
+
+
+def lock_shops(cursor, shop_ids, shared=True):
+    """Take transaction-scoped advisory locks so rebuilds and incremental updates never interleave."""
+    function = 'pg_advisory_xact_lock_shared' if shared else 'pg_advisory_xact_lock'
+    for shop_id in sorted(shop_ids):
+        cursor.execute(f'SELECT {function}(%s, %s)', [ROLLUP_LOCK_NAMESPACE, shop_id])
+
+
+def rebuild_shop(shop_id, chunk_size=50000):
+    """Recompute one shop's rollups from api_order, aggregating chunk_size order ids per statement.
+
+    Yields the highest order id processed after each chunk.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # Blocks incremental updates for this shop until the rebuild commits; orders inserted
+            # meanwhile are either seen by the scan below or added on top once the lock is released.
+            lock_shops(cursor, [shop_id], shared=False)
+            cursor.execute('DELETE FROM api_orderdailyrollup WHERE shop_id = %s', [shop_id])
+            cursor.execute('SELECT coalesce(max(id), 0) FROM api_order WHERE shop_id = %s', [shop_id])
+            max_id = cursor.fetchone()[0]
+
+            last_id = 0
+            while last_id < max_id:
+                upper = min(last_id + chunk_size, max_id)
+                cursor.execute(ROLLUP_CHUNK, [shop_id, last_id, upper])
+                last_id = upper
+                yield last_id
+
+    logger.info(f"Rebuilt order rollups for shop {shop_id} up to order id {max_id}")
@@ -0,0 +1,48 @@
+import hashlib
+import time
+
+from django.conf import settings
+
+from .cache import TTLCache
+
+# Verified session-token payloads keyed by a digest of the raw header. Entries
+# expire at the token's own `exp`, so a cached token is never accepted for
+# longer than Shopify's signature check would have accepted it.
+verified_tokens = TTLCache(max_size=settings.SESSION_TOKEN_CACHE_MAX_SIZE, ttl=0)
+
+
+class InvalidSessionToken(Exception):
+    """Raised when a session token fails Shopify's verification."""
+
+
+def verify_session_token(authorization_header):
+    """Verify a session token with the Shopify library, imported on first use to keep worker startup fast."""
+    from shopify import session_token
+
+    try:
+        return session_token.decode_from_header(
+            authorization_header=authorization_header,
+            api_key=settings.SHOPIFY_API_KEY,
+            secret=settings.SHOPIFY_API_SECRET,
+        )
+    except session_token.SessionTokenError as e:
+        raise InvalidSessionToken(str(e)) from e
+
+
+def decode_session_token(authorization_header):
+    """Decode and verify a session token from the Authorization header, reusing earlier verifications."""
+    if not settings.SESSION_TOKEN_CACHE_ENABLED:
+        return verify_session_token(authorization_header)
+
+    token_digest = hashlib.sha256(authorization_header.encode('utf-8')).digest()
+    decoded_session_token = verified_tokens.get(token_digest)
+    if decoded_session_token is not None:
+        return dict(decoded_session_token)
+
+    decoded_session_token = verify_session_token(authorization_header)
+
+    remaining = decoded_session_token.get('exp', 0) - time.time()
+    if remaining > 0:
+        verified_tokens.set(token_digest, dict(decoded_session_token), ttl=remaining)
+
+    return decoded_session_token
@@ -0,0 +1,88 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+
+from ..models import Shop
+from .cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+SHARED_CACHE_KEY_PREFIX = 'shop-credentials:'
+
+# Per-process cache. Invalidation only reaches the local process and the shared
+# backend, so other processes may serve a stale token for up to SHOP_CACHE_TTL.
+local_cache = TTLCache(max_size=settings.SHOP_CACHE_MAX_SIZE, ttl=settings.SHOP_CACHE_TTL)
+
+
+def shared_cache():
+    """Return the shared Django cache backend, if one is configured."""
+    if settings.SHOP_CACHE_ALIAS:
+        return caches[settings.SHOP_CACHE_ALIAS]
+    return None
+
+
+def get_shop_credentials(shop_domain):
+    """Return (shop_id, access_token) for a shop domain, raising Shop.DoesNotExist if it is not installed or was uninstalled."""
+    credentials = local_cache.get(shop_domain)
+    if credentials is not None:
+        return credentials
+
+    backend = shared_cache()
+    if backend is not None:
+        try:
+            credentials = backend.get(SHARED_CACHE_KEY_PREFIX + shop_domain)
+        except Exception as e:
+            logger.error(f"Shared credentials cache lookup failed for shop {shop_domain}: {e}")
+
+    if credentials is None:
+        credentials = Shop.objects.filter(uninstalled_at__isnull=True).values_list('id', 'access_token').get(domain=shop_domain)
+
+        if backend is not None:
+            try:
+                backend.set(SHARED_CACHE_KEY_PREFIX + shop_domain, tuple(credentials), settings.SHOP_CACHE_TTL)
+            except Exception as e:
+                logger.error(f"Failed to populate shared credentials cache for shop {shop_domain}: {e}")
+
+    credentials = tuple(credentials)
+    local_cache.set(shop_domain, credentials)
+    return credentials
+
+
+async def aget_shop_credentials(shop_domain):
+    """Async variant of get_shop_credentials() using the async cache and ORM APIs."""
+    credentials = local_cache.get(shop_domain)
+    if credentials is not None:
+        return credentials
+
+    backend = shared_cache()
+    if backend is not None:
+        try:
+            credentials = await backend.aget(SHARED_CACHE_KEY_PREFIX + shop_domain)
+        except Exception as e:
+            logger.error(f"Shared credentials cache lookup failed for shop {shop_domain}: {e}")
+
+    if credentials is None:
+        credentials = await Shop.objects.filter(uninstalled_at__isnull=True).values_list('id', 'access_token').aget(domain=shop_domain)
+
+        if backend is not None:
+            try:
+                await backend.aset(SHARED_CACHE_KEY_PREFIX + shop_domain, tuple(credentials), settings.SHOP_CACHE_TTL)
+            except Exception as e:
+                logger.error(f"Failed to populate shared credentials cache for shop {shop_domain}: {e}")
+
+    credentials = tuple(credentials)
+    local_cache.set(shop_domain, credentials)
+    return credentials
+
+
+def invalidate_shop(shop_domain):
+    """Drop cached credentials after a shop's token changes or the shop is removed."""
+    local_cache.delete(shop_domain)
+
+    backend = shared_cache()
+    if backend is not None:
+        try:
+            backend.delete(SHARED_CACHE_KEY_PREFIX + shop_domain)
+        except Exception as e:
+            logger.error(f"Failed to invalidate shared credentials cache for shop {shop_domain}: {e}")
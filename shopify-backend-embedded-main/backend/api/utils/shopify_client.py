@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import threading
+import time
+import weakref
+
+from django.conf import settings
+
+from . import metrics, rate_limit
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_client_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+
+class ShopifyAPIError(Exception):
+    """Raised when the Shopify Admin API returns an error response or cannot be reached."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def httpx_module():
+    """Import httpx on first use; most workers start serving webhooks without it."""
+    import httpx
+
+    return httpx
+
+
+def client_limits():
+    return httpx_module().Limits(
+        max_connections=settings.SHOPIFY_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.SHOPIFY_HTTP_MAX_CONNECTIONS,
+    )
+
+
+def get_client():
+    """Return the process-wide pooled keep-alive HTTP client for Shopify."""
+    global _client
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx_module().Client(timeout=settings.SHOPIFY_HTTP_TIMEOUT, limits=client_limits())
+
+    return _client
+
+
+def get_async_client():
+    """Return the pooled keep-alive async HTTP client bound to the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+
+    if client is None:
+        client = _async_clients[loop] = httpx_module().AsyncClient(timeout=settings.SHOPIFY_HTTP_TIMEOUT, limits=client_limits())
+
+    return client
+
+
+def shop_base_url(shop_domain):
+    """Return the base URL for a shop, e.g. 'https://example.myshopify.com'."""
+    return settings.SHOPIFY_ADMIN_URL.format(shop=shop_domain)
+
+
+def admin_url(shop_domain, path):
+    """Construct a versioned Admin REST API URL for the given shop and resource path."""
+    return f"{shop_base_url(shop_domain)}/admin/api/{settings.SHOPIFY_API_VERSION}/{path}"
+
+
+def retry_delay(response, attempt):
+    """Seconds until a throttled call may be retried: Retry-After if given, else exponential backoff."""
+    try:
+        return float(response.headers['Retry-After'])
+    except (KeyError, ValueError):
+        return settings.SHOPIFY_RETRY_BACKOFF * 2 ** attempt
+
+
+def prepare_request(shop_domain, access_token, path, headers):
+    """Resolve the request URL and add the access token header."""
+    if access_token:
+        headers = {'X-Shopify-Access-Token': access_token, **headers}
+    url = path if path.startswith('http') else admin_url(shop_domain, path)
+    return url, headers
+
+
+def throttled(shop_domain, api, response, attempt):
+    """
+    Record the response with the rate limiter. Returns True if the call was throttled and should be retried.
+
+    The wait before the retry happens in the rate limiter's acquire(), which holds the shop's
+    calls until the Retry-After has passed, so there is no separate sleep here.
+    """
+    rate_limit.scheduler.update_rest(shop_domain, response.headers.get('X-Shopify-Shop-Api-Call-Limit'))
+
+    if response.status_code != 429 or attempt == settings.SHOPIFY_MAX_RETRIES:
+        return False
+
+    delay = retry_delay(response, attempt)
+    rate_limit.scheduler.record_throttle(shop_domain, api, retry_after=delay)
+    logger.warning(f"Throttled by Shopify for shop {shop_domain}, retrying in {delay:.1f}s.")
+    return True
+
+
+def transport_error(method, url, api, started, error):
+    """Record a call that got no response. Returns the ShopifyAPIError to raise."""
+    metrics.observe_shopify(api, 'error', time.perf_counter() - started)
+    return ShopifyAPIError(f"{method} {url} failed: {error}")
+
+
+def retry_response(shop_domain, api, response, attempt, started):
+    """Record a response's timing and rate limit state. Returns True if the call should be retried."""
+    metrics.observe_shopify(api, response.status_code, time.perf_counter() - started)
+    return throttled(shop_domain, api, response, attempt)
+
+
+def check_response(method, url, response):
+    """Raise ShopifyAPIError for an error response, otherwise return it."""
+    if response.is_error:
+        raise ShopifyAPIError(f"{method} {url} returned {response.status_code}: {response.text[:200]}", response.status_code)
+    return response
+
+
+def request(method, shop_domain, access_token, path, api=rate_limit.REST, cost=1, **kwargs):
+    """
+    Send an Admin API request through the shop's rate limiter and return the response.
+
+    Throttled (429) responses are retried after the rate limiter has waited out their
+    Retry-After; other failures raise ShopifyAPIError.
+    """
+    url, headers = prepare_request(shop_domain, access_token, path, kwargs.pop('headers', {}))
+
+    for attempt in range(settings.SHOPIFY_MAX_RETRIES + 1):
+        rate_limit.scheduler.acquire(shop_domain, api, cost)
+
+        started = time.perf_counter()
+        try:
+            response = get_client().request(method, url, headers=headers, **kwargs)
+        except httpx_module().HTTPError as e:
+            raise transport_error(method, url, api, started, e)
+
+        if not retry_response(shop_domain, api, response, attempt, started):
+            break
+
+    return check_response(method, url, response)
+
+
+async def arequest(method, shop_domain, access_token, path, api=rate_limit.REST, cost=1, **kwargs):
+    """Async variant of request() over the event loop's pooled httpx.AsyncClient."""
+    url, headers = prepare_request(shop_domain, access_token, path, kwargs.pop('headers', {}))
+
+    for attempt in range(settings.SHOPIFY_MAX_RETRIES + 1):
+        await rate_limit.scheduler.aacquire(shop_domain, api, cost)
+
+        started = time.perf_counter()
+        try:
+            response = await get_async_client().request(method, url, headers=headers, **kwargs)
+        except httpx_module().HTTPError as e:
+            raise transport_error(method, url, api, started, e)
+
+        if not retry_response(shop_domain, api, response, attempt, started):
+            break
+
+    return check_response(method, url, response)
+
+
+def graphql(shop_domain, access_token, query, variables=None, cost=10):
+    """Run an Admin GraphQL query, retrying THROTTLED errors, and return its 'data'."""
+    for attempt in range(settings.SHOPIFY_MAX_RETRIES + 1):
+        response = request(
+            'POST', shop_domain, access_token, 'graphql.json',
+            api=rate_limit.GRAPHQL, cost=cost,
+            json={'query': query, 'variables': variables or {}},
+        )
+        payload = response.json()
+        throttle_status = payload.get('extensions', {}).get('cost', {}).get('throttleStatus')
+        if throttle_status:
+            rate_limit.scheduler.update_graphql(shop_domain, throttle_status)
+
+        errors = payload.get('errors') or []
+        throttled = any(error.get('extensions', {}).get('code') == 'THROTTLED' for error in errors)
+
+        if throttled and attempt < settings.SHOPIFY_MAX_RETRIES:
+            # The reported throttleStatus already fills the bucket; the retry waits in acquire() for it to restore.
+            rate_limit.scheduler.record_throttle(shop_domain, rate_limit.GRAPHQL)
+            continue
+
+        if errors:
+            raise ShopifyAPIError(f"GraphQL query failed for shop {shop_domain}: {errors}")
+
+        return payload.get('data', {})
@@ -1,5 +1,6 @@
 import hashlib
 import base64
+import binascii
 import hmac
 import logging
 
@@ -7,15 +8,34 @@ from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+# Set on requests whose signature WebhookHMACMiddleware has already checked.
+VERIFIED_ATTRIBUTE = 'shopify_webhook_verified'
+
+
 def validate_hmac(body, secret, hmac_to_verify):
-    """Validate the HMAC of the request body against the expected HMAC."""
+    """Validate the HMAC of the request body against the expected HMAC in constant time."""
+    try:
+        expected = base64.b64decode(hmac_to_verify, validate=True)
+    except (binascii.Error, ValueError):
+        return False
+
     hashed = hmac.new(secret.encode('utf-8'), body, hashlib.sha256)
-    hmac_calculated = base64.b64encode(hashed.digest()).decode('utf-8')
-    return hmac_calculated == hmac_to_verify
+    return hmac.compare_digest(hashed.digest(), expected)
+
+
+def validate_hmac_header(request):
+    """Check the raw request body against its X-Shopify-Hmac-Sha256 header."""
+    webhook_hmac = request.META.get('HTTP_X_SHOPIFY_HMAC_SHA256')
+    if not webhook_hmac:
+        return False
+    return validate_hmac(request.body, settings.SHOPIFY_API_SECRET, webhook_hmac)
 
 
 def validate_webhook(request):
     """Validate the Shopify webhook by checking its HMAC signature."""
+    if getattr(request, VERIFIED_ATTRIBUTE, False):
+        return True
+
     try:
         webhook_hmac = request.META.get('HTTP_X_SHOPIFY_HMAC_SHA256')
         webhook_data = request.body
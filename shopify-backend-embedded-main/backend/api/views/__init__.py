@@ -0,0 +1,8 @@
+from django.http import HttpResponse, JsonResponse
+
+
+def plain_response(body, status, headers=None):
+    """Build the Django response an async view returns where its DRF twin returns Response(body, status)."""
+    if body is None:
+        return HttpResponse(status=status, headers=headers)
+    return JsonResponse(body, status=status, headers=headers)
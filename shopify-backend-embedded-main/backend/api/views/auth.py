@@ -1,17 +1,18 @@
 import logging
+
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.db import transaction
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.core.exceptions import ValidationError
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, JsonResponse
+from django.views import View
 
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
 
-from ..models import Shop
-from ..utils import login, callback
+from ..utils import login, callback, registration, purge, bulk_import
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +38,23 @@ class Login(APIView):
             return Response({"error": "Authentication failed"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def app_redirect(shop):
+    """Send the merchant back to the embedded app once installation is done."""
+    return HttpResponseRedirect(f"{settings.SHOPIFY_APP_URL}?shop={shop}")
+
+
+def callback_error(shop, error):
+    """Log a failed OAuth callback and return the error response (body, status)."""
+    if isinstance(error, ValidationError):
+        logger.warning(f"Validation error for shop {shop}: {error}")
+        return {"error": str(error)}, status.HTTP_400_BAD_REQUEST
+    if isinstance(error, ValueError):
+        logger.warning(f"Invalid data for shop {shop}: {error}")
+        return {"error": "Invalid request data"}, status.HTTP_400_BAD_REQUEST
+    logger.error(f"Callback processing failed for shop {shop}: {error}")
+    return {"error": "Callback processing failed"}, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+
 class Callback(APIView):
     """Handle Shopify OAuth callback and data storage."""
 
@@ -48,31 +66,48 @@ class Callback(APIView):
             return Response({"error": "Shop domain is required"}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            with transaction.atomic():
-                callback.validate_params(request, params)
-                access_token, access_scopes = callback.exchange_code_for_access_token(request, shop)
-                callback.store_shop_information(access_token, access_scopes, shop)
-                callback.create_uninstall_webhook(shop, access_token)
-                callback.create_order_create_webhook(shop, access_token)
-
-            redirect_uri = f"{settings.SHOPIFY_APP_URL}?shop={shop}"
-            # return Response({
-            #     "success": True,
-            #     "redirect_uri": redirect_uri,
-            #     "accessToken": access_token,
-            #     "shop": shop
-            # }, status=status.HTTP_200_OK)
-            return HttpResponseRedirect(redirect_uri)
-
-        except ValidationError as ve:
-            logger.warning(f"Validation error for shop {shop}: {ve}")
-            return Response({"error": str(ve)}, status=status.HTTP_400_BAD_REQUEST)
-        except ValueError as ve:
-            logger.warning(f"Invalid data for shop {shop}: {ve}")
-            return Response({"error": "Invalid request data"}, status=status.HTTP_400_BAD_REQUEST)
+            callback.validate_params(request, params)
+            access_token, access_scopes = callback.exchange_code_for_access_token(request, shop)
+
+            shop_record = callback.store_shop_information_atomic(access_token, access_scopes, shop)
+
+            registration.register_webhooks(shop, access_token)
+
+            if settings.SHOPIFY_IMPORT_ORDERS_ON_INSTALL:
+                bulk_import.schedule_import(shop_record)
+
+            return app_redirect(shop)
+
+        except Exception as e:
+            body, code = callback_error(shop, e)
+            return Response(body, status=code)
+
+
+class AsyncCallback(View):
+    """Async variant of Callback; Shopify calls share the event loop's connection pool."""
+
+    async def get(self, request):
+        params = request.GET
+        shop = params.get("shop")
+
+        if not shop:
+            return JsonResponse({"error": "Shop domain is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            callback.validate_params(request, params)
+            access_token, access_scopes = await callback.aexchange_code_for_access_token(request, shop)
+
+            shop_record = await sync_to_async(callback.store_shop_information_atomic)(access_token, access_scopes, shop)
+            await registration.aregister_webhooks(shop, access_token)
+
+            if settings.SHOPIFY_IMPORT_ORDERS_ON_INSTALL:
+                await sync_to_async(bulk_import.schedule_import)(shop_record)
+
+            return app_redirect(shop)
+
         except Exception as e:
-            logger.error(f"Callback processing failed for shop {shop}: {e}")
-            return Response({"error": "Callback processing failed"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            body, code = callback_error(shop, e)
+            return JsonResponse(body, status=code)
 
 
 class Uninstall(APIView):
@@ -87,8 +122,10 @@ class Uninstall(APIView):
             return Response({"error": "Domain is required"}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            Shop.objects.filter(domain=shop_domain).delete()
-            logger.info(f"Shop with domain {shop_domain} uninstalled successfully.")
+            # Deleting a large shop's orders here would outlast the webhook timeout;
+            # `manage.py purge_uninstalled_shops` removes them in batches instead.
+            if purge.mark_uninstalled(shop_domain):
+                logger.info(f"Shop with domain {shop_domain} uninstalled; data will be purged in the background.")
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Exception as e:
             logger.error(f"Failed to uninstall shop {shop_domain}: {e}")
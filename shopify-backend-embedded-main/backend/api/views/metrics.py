@@ -0,0 +1,31 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.views import View
+
+from rest_framework import status
+
+from ..utils import metrics
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Metrics(View):
+    """
+    Expose this process's request, database, Shopify call and rate limiter metrics for Prometheus.
+
+    Scrapers authenticate with METRICS_TOKEN; without one the endpoint is served only when DEBUG is on.
+    """
+
+    def get(self, request):
+        if not settings.METRICS_TOKEN:
+            # Route names and traffic are not for the public; only a DEBUG server exposes them without a token.
+            if not settings.DEBUG:
+                return JsonResponse({"error": "Metrics are disabled; set METRICS_TOKEN"}, status=status.HTTP_404_NOT_FOUND)
+        else:
+            expected = f"Bearer {settings.METRICS_TOKEN}".encode('utf-8')
+            if not hmac.compare_digest(request.META.get('HTTP_AUTHORIZATION', '').encode('utf-8'), expected):
+                return JsonResponse({"error": "Invalid metrics token"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        return HttpResponse(metrics.registry.expose(), content_type=CONTENT_TYPE)
@@ -1,33 +1,147 @@
 import logging
+
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.http import JsonResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from django.utils.decorators import method_decorator
 
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
 
-import shopify
+from ..models import Product, Shop
+from ..decorators import async_session_token_required, session_token_required
+from ..utils import catalog, fast_json, pagination, queue, shop_cache, webhook
 
-from ..decorators import session_token_required
+logger = logging.getLogger(__name__)
 
-shopify.Session.setup(api_key=settings.SHOPIFY_API_KEY, secret=settings.SHOPIFY_API_SECRET)
+PRODUCT_TOPICS = ('products/create', 'products/update', 'products/delete')
+
+# Body and Retry-After (seconds) of the 202 served while a shop's first catalog sync runs.
+SYNCING = {'products': [], 'next_cursor': None, 'syncing': True}
+SYNC_RETRY_AFTER = '2'
+
+
+def page_params(params):
+    """Read page_size and the keyset cursor, raising ValueError if either is invalid."""
+    return pagination.get_page_size(params), pagination.decode_cursor(params.get('cursor'), 1)
+
+
+def wants_refresh(params):
+    return params.get('refresh') in ('1', 'true')
+
+
+def products_page(shop_id, after, page_size):
+    """Return the queryset of (product_id, data) rows for one page, plus one row to detect a next page."""
+    products = Product.objects.filter(shop_id=shop_id).order_by('product_id')
+    if after:
+        products = products.filter(product_id__gt=after[0])
+    return products.values_list('product_id', 'data')[:page_size + 1]
+
+
+def products_body(page, page_size):
+    """Build the ProductList response body from the fetched rows."""
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_cursor = pagination.encode_cursor(page[-1][0])
+
+    return {'products': [data for _, data in page], 'next_cursor': next_cursor}
 
-logger = logging.getLogger(__name__)
 
 class ProductList(APIView):
-    """Fetch list of products for a specific shop."""
+    """
+    Serve a shop's products from the local catalog.
+
+    A cold cache or ?refresh=1 starts a background sync; until a shop's first sync has
+    finished the response is a 202 with no products, which the client polls.
+    """
 
     @session_token_required
     def get(self, request, shop_domain=None):
         try:
-            products = shopify.Product.find()
-            products_data = [product.to_dict() for product in products]
+            page_size, after = page_params(request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            shop_id, access_token = shop_cache.get_shop_credentials(shop_domain)
+            synced = catalog.is_synced(shop_id)
 
-            return Response({'products': products_data}, status=status.HTTP_200_OK)
+            if wants_refresh(request.query_params) or not synced:
+                catalog.start_sync(shop_id, shop_domain, access_token)
+
+            if not synced:
+                return Response(SYNCING, status=status.HTTP_202_ACCEPTED, headers={'Retry-After': SYNC_RETRY_AFTER})
+
+            page = list(products_page(shop_id, after, page_size))
+            return Response(products_body(page, page_size), status=status.HTTP_200_OK)
 
-        except shopify.ShopifyException as e:
-            logger.error(f"Shopify API error: {e}")
-            return Response({"error": "Shopify API request failed"}, status=status.HTTP_502_BAD_GATEWAY)
-        
         except Exception as e:
             logger.error(f"Error fetching products for shop {shop_domain}: {e}")
             return Response({"error": "Internal server error"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ProductWebhook(APIView):
+    """Handle Shopify 'products/*' webhooks to keep the local catalog fresh."""
+
+    @method_decorator(csrf_exempt)
+    def post(self, request):
+        if not webhook.validate_webhook(request):
+            logger.warning("Invalid webhook signature.")
+            return Response({"error": "Invalid webhook signature"}, status=status.HTTP_400_BAD_REQUEST)
+
+        topic = request.META.get('HTTP_X_SHOPIFY_TOPIC')
+        shop_domain = request.META.get('HTTP_X_SHOPIFY_SHOP_DOMAIN')
+
+        if topic not in PRODUCT_TOPICS:
+            return Response({"error": f"Unsupported topic: {topic}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            if settings.SHOPIFY_WEBHOOK_ASYNC:
+                queue.enqueue_webhook(request, topic)
+                return Response(status=status.HTTP_200_OK)
+
+            shop_id, _ = shop_cache.get_shop_credentials(shop_domain)
+            catalog.apply_product_webhook(topic, shop_id, fast_json.loads(request.body))
+            return Response(status=status.HTTP_200_OK)
+
+        except Shop.DoesNotExist:
+            logger.error(f"Shop not found for domain: {shop_domain}")
+            return Response({"error": "Shop not found"}, status=status.HTTP_404_NOT_FOUND)
+        except (KeyError, ValueError) as e:
+            logger.error(f"Invalid product webhook payload: {e}")
+            return Response({"error": f"Invalid payload: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Error processing product webhook: {e}")
+            return Response({"error": "Internal server error"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class AsyncProductList(View):
+    """Async variant of ProductList for ASGI deployments."""
+
+    @async_session_token_required
+    async def get(self, request, shop_domain=None):
+        try:
+            page_size, after = page_params(request.GET)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            shop_id, access_token = await shop_cache.aget_shop_credentials(shop_domain)
+            synced = await catalog.ais_synced(shop_id)
+
+            if wants_refresh(request.GET) or not synced:
+                await sync_to_async(catalog.start_sync)(shop_id, shop_domain, access_token)
+
+            if not synced:
+                return JsonResponse(SYNCING, status=status.HTTP_202_ACCEPTED, headers={'Retry-After': SYNC_RETRY_AFTER})
+
+            page = [row async for row in products_page(shop_id, after, page_size)]
+            return JsonResponse(products_body(page, page_size), status=status.HTTP_200_OK)
+
+        except Exception as e:
+            logger.error(f"Error fetching products for shop {shop_domain}: {e}")
+            return JsonResponse({"error": "Internal server error"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
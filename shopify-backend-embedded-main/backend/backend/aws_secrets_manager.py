@@ -1,27 +1,258 @@
-import boto3
-from botocore.exceptions import ClientError
-from dotenv import load_dotenv
 import json
+import logging
+import os
+import threading
+import time
 from os import environ
 
+from dotenv import load_dotenv
+
 load_dotenv()
 
-def get_secret():
-    secret_name = environ.get('DB_SECRET_NAME')
-    region_name = environ.get('DB_REGION')
+logger = logging.getLogger(__name__)
 
-    session = boto3.session.Session()
-    client = session.client(
-        service_name='secretsmanager',
-        region_name=region_name
-    )
 
-    try:
-        get_secret_value_response = client.get_secret_value(
-            SecretId=secret_name
+class SecretUnavailable(Exception):
+    """Raised when a secret can't be fetched and no cached copy exists."""
+
+
+class AWSSecretsManagerBackend:
+    """Fetch a JSON secret from AWS Secrets Manager over one reusable client."""
+
+    def __init__(self, secret_name, region_name, timeout=3):
+        self.secret_name = secret_name
+        self.region_name = region_name
+        self.timeout = timeout
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+            from botocore.config import Config
+
+            self._client = boto3.session.Session().client(
+                service_name='secretsmanager',
+                region_name=self.region_name,
+                config=Config(connect_timeout=self.timeout, read_timeout=self.timeout, retries={'max_attempts': 2}),
+            )
+        return self._client
+
+    def fetch(self):
+        response = self.client.get_secret_value(SecretId=self.secret_name)
+        return json.loads(response['SecretString'])
+
+
+class FileBackend:
+    """Read a JSON secret from a local file, re-read on every refresh."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def fetch(self):
+        with open(self.path) as f:
+            return json.load(f)
+
+
+class EnvBackend:
+    """Read a JSON secret from an environment variable."""
+
+    def __init__(self, variable):
+        self.variable = variable
+
+    def fetch(self):
+        try:
+            return json.loads(environ[self.variable])
+        except KeyError:
+            raise SecretUnavailable(f"Environment variable {self.variable} is not set")
+
+
+class EncryptedFileCache:
+    """Fernet-encrypted on-disk copy of a secret, so a cold start can skip the network call."""
+
+    def __init__(self, path, key):
+        from cryptography.fernet import Fernet
+
+        self.path = path
+        self.fernet = Fernet(key)
+
+    def load(self):
+        """Return (secret, fetched_at), or None if there is no readable cache."""
+        try:
+            with open(self.path, 'rb') as f:
+                payload = json.loads(self.fernet.decrypt(f.read()))
+            return payload['secret'], payload['fetched_at']
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable secret cache {self.path}: {e}")
+            return None
+
+    def store(self, secret, fetched_at):
+        token = self.fernet.encrypt(json.dumps({'secret': secret, 'fetched_at': fetched_at}).encode())
+        temporary_path = f"{self.path}.tmp"
+        fd = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(token)
+        os.replace(temporary_path, self.path)
+
+
+class SecretProvider:
+    """
+    Serve a secret from memory for ttl seconds, falling back to the last known value when the backend fails.
+
+    Listeners registered with on_change() are called with the new secret whenever a refresh returns
+    a different value, e.g. after the database password was rotated.
+    """
+
+    def __init__(self, backend, ttl=3600, disk_cache=None):
+        self.backend = backend
+        self.ttl = ttl
+        self.disk_cache = disk_cache
+        self.listeners = []
+        self._secret = None
+        self._fetched_at = 0
+        self._lock = threading.Lock()
+        self._refresher = None
+
+    def get(self):
+        if self._secret is not None and time.time() - self._fetched_at < self.ttl:
+            return self._secret
+
+        with self._lock:
+            if self._secret is None and self.disk_cache:
+                cached = self.disk_cache.load()
+                if cached and time.time() - cached[1] < self.ttl:
+                    self._secret, self._fetched_at = cached
+                    return self._secret
+
+            if self._secret is None or time.time() - self._fetched_at >= self.ttl:
+                self._refresh_locked()
+
+            return self._secret
+
+    def refresh(self):
+        """Fetch the secret now. Returns True if it changed."""
+        with self._lock:
+            return self._refresh_locked()
+
+    def _refresh_locked(self):
+        previous = self._secret
+
+        try:
+            secret = self.backend.fetch()
+        except Exception as e:
+            if previous is None and self.disk_cache:
+                cached = self.disk_cache.load()
+                if cached:
+                    logger.warning(f"Secret backend failed, using the on-disk copy: {e}")
+                    self._secret, self._fetched_at = cached
+                    return False
+            if previous is None:
+                raise SecretUnavailable(f"Could not fetch secret: {e}") from e
+            logger.warning(f"Secret backend failed, serving the cached value: {e}")
+            return False
+
+        self._secret, self._fetched_at = secret, time.time()
+        if self.disk_cache:
+            try:
+                self.disk_cache.store(secret, self._fetched_at)
+            except OSError as e:
+                logger.warning(f"Could not write the secret cache: {e}")
+
+        changed = previous is not None and secret != previous
+        if changed:
+            for listener in self.listeners:
+                try:
+                    listener(secret)
+                except Exception as e:
+                    logger.error(f"Secret change listener {listener} failed: {e}")
+        return changed
+
+    def on_change(self, listener):
+        self.listeners.append(listener)
+
+    def start_refresh(self, interval):
+        """Refresh the secret every interval seconds from a daemon thread."""
+        if self._refresher is not None:
+            return
+
+        def refresh_forever():
+            while True:
+                time.sleep(interval)
+                try:
+                    if self.refresh():
+                        logger.info("Secret rotated; notified listeners.")
+                except Exception as e:
+                    logger.error(f"Background secret refresh failed: {e}")
+
+        self._refresher = threading.Thread(target=refresh_forever, name='secret-refresh', daemon=True)
+        self._refresher.start()
+
+
+def build_backend():
+    """Select the secret backend from SECRET_BACKEND: 'aws' (default), 'file' or 'env'."""
+    backend = environ.get('SECRET_BACKEND', 'aws')
+
+    if backend == 'aws':
+        return AWSSecretsManagerBackend(
+            environ.get('DB_SECRET_NAME'),
+            environ.get('DB_REGION'),
+            timeout=float(environ.get('SECRET_TIMEOUT', 3)),
         )
-    except ClientError as e:
-        raise e
+    if backend == 'file':
+        return FileBackend(environ.get('SECRET_FILE'))
+    if backend == 'env':
+        return EnvBackend(environ.get('SECRET_ENV_VAR', 'DB_SECRET'))
+
+    raise ValueError(f"Unknown SECRET_BACKEND '{backend}', expected 'aws', 'file' or 'env'")
+
+
+def build_disk_cache():
+    """Return the encrypted disk cache when SECRET_CACHE_PATH and SECRET_CACHE_KEY are set and cryptography is installed."""
+    path = environ.get('SECRET_CACHE_PATH')
+    key = environ.get('SECRET_CACHE_KEY')
+    if not path or not key:
+        return None
+
+    try:
+        return EncryptedFileCache(path, key)
+    except ImportError:
+        logger.warning("SECRET_CACHE_PATH is set but the 'cryptography' package is not installed; disk cache disabled.")
+        return None
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    """Return the process-wide provider for the database credentials secret."""
+    global _provider
+
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = SecretProvider(
+                    build_backend(),
+                    ttl=int(environ.get('SECRET_TTL', 3600)),
+                    disk_cache=build_disk_cache(),
+                )
+
+    return _provider
+
+
+def get_secret():
+    return get_provider().get()
+
+
+def update_database_credentials(secret, aliases=('default',)):
+    """Point new connections for the given databases at rotated credentials; open connections keep their session."""
+    from django.db import connections
 
-    secret = json.loads(get_secret_value_response['SecretString'])
-    return secret
+    for alias in aliases:
+        # Shared by every thread's connection object, so the next connect anywhere picks it up.
+        settings_dict = connections.settings[alias]
+        settings_dict['USER'] = secret['username']
+        settings_dict['PASSWORD'] = secret['password']
+        logger.info(f"Updated the credentials for database '{alias}'.")
@@ -0,0 +1,44 @@
+from importlib.util import find_spec
+
+from django.core.exceptions import ImproperlyConfigured
+
+PERSISTENT = 'persistent'
+POOL = 'pool'
+PGBOUNCER = 'pgbouncer'
+CONNECTION_MODES = (PERSISTENT, POOL, PGBOUNCER)
+
+
+def connection_options(mode, conn_max_age=60, pool_min_size=2, pool_max_size=10, pool_timeout=10, sslmode=None):
+    """
+    Return the DATABASES entry keys that control how connections are reused.
+
+    persistent: each worker thread keeps its connection for conn_max_age seconds and
+        pings it before reuse, so a request doesn't pay for connect + TLS setup.
+    pool: Django's native connection pool; only available on the psycopg 3 driver.
+    pgbouncer: for a transaction-pooling pgbouncer. Connections to pgbouncer itself are
+        kept, and ORM server-side cursors (which outlive a transaction) are disabled.
+    """
+    options = {'sslmode': sslmode} if sslmode else {}
+
+    if mode == PERSISTENT:
+        return {'CONN_MAX_AGE': conn_max_age, 'CONN_HEALTH_CHECKS': True, 'OPTIONS': options}
+
+    if mode == POOL:
+        if find_spec('psycopg') is None or find_spec('psycopg_pool') is None:
+            raise ImproperlyConfigured(
+                "DB_CONNECTION_MODE=pool requires the psycopg 3 driver and psycopg_pool; "
+                "this project pins psycopg2, so use 'persistent' or 'pgbouncer' instead."
+            )
+        options['pool'] = {'min_size': pool_min_size, 'max_size': pool_max_size, 'timeout': pool_timeout}
+        # Pooled connections are returned after every request; Django rejects CONN_MAX_AGE here.
+        return {'CONN_MAX_AGE': 0, 'OPTIONS': options}
+
+    if mode == PGBOUNCER:
+        return {
+            'CONN_MAX_AGE': conn_max_age,
+            'CONN_HEALTH_CHECKS': True,
+            'DISABLE_SERVER_SIDE_CURSORS': True,
+            'OPTIONS': options,
+        }
+
+    raise ImproperlyConfigured(f"Unknown DB_CONNECTION_MODE '{mode}', expected one of: {', '.join(CONNECTION_MODES)}")
@@ -14,6 +14,8 @@ from dotenv import load_dotenv
 from os import environ, path
 from pathlib import Path
 
+from .db_connections import connection_options
+
 # Loading environment variables
 load_dotenv()
 
@@ -70,6 +72,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Wraps everything else so the numbers cover the whole request.
+    'api.middleware.MetricsMiddleware',
+    # Next, so webhook floods are verified and dispatched before the stack below.
+    'api.middleware.WebhookHMACMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     "corsheaders.middleware.CorsMiddleware",
@@ -105,7 +111,13 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
 
-USE_AWS_SECRET_MANAGER = False
+# Database credentials from a secret provider (backend/aws_secrets_manager.py).
+# SECRET_BACKEND selects 'aws', or 'file'/'env' to run offline; the secret is
+# cached in memory for SECRET_TTL seconds and optionally in an encrypted file
+# (SECRET_CACHE_PATH + SECRET_CACHE_KEY). Every SECRET_REFRESH_INTERVAL seconds
+# it is re-fetched so new connections pick up a rotated password; 0 disables.
+USE_AWS_SECRET_MANAGER = environ.get('USE_AWS_SECRET_MANAGER', 'False') == 'True'
+SECRET_REFRESH_INTERVAL = int(environ.get('SECRET_REFRESH_INTERVAL', 300))
 
 if USE_AWS_SECRET_MANAGER:
     from .aws_secrets_manager import get_secret
@@ -134,6 +146,45 @@ else:
         }
     }
 
+# Connection reuse per environment: 'persistent' (default), 'pool' (psycopg 3
+# only) or 'pgbouncer' for a transaction-pooling pgbouncer. See
+# backend/db_connections.py. Under ASGI set DB_CONN_MAX_AGE=0 or use pgbouncer.
+DB_CONNECTION_MODE = environ.get('DB_CONNECTION_MODE', 'persistent')
+DATABASES['default'].update(connection_options(
+    DB_CONNECTION_MODE,
+    conn_max_age=int(environ.get('DB_CONN_MAX_AGE', 60)),
+    pool_min_size=int(environ.get('DB_POOL_MIN_SIZE', 2)),
+    pool_max_size=int(environ.get('DB_POOL_MAX_SIZE', 10)),
+    pool_timeout=float(environ.get('DB_POOL_TIMEOUT', 10)),
+    sslmode=environ.get('DB_SSLMODE'),
+))
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+if environ.get('REDIS_URL'):
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': environ.get('REDIS_URL'),
+    }
+
+# Shop access tokens are cached per process; set SHOP_CACHE_ALIAS (e.g. 'shared')
+# to also share them between workers through a Django cache backend.
+SHOP_CACHE_TTL = int(environ.get('SHOP_CACHE_TTL', 60))
+SHOP_CACHE_MAX_SIZE = int(environ.get('SHOP_CACHE_MAX_SIZE', 10000))
+SHOP_CACHE_ALIAS = environ.get('SHOP_CACHE_ALIAS')
+
+# Verified session tokens are cached per process until their `exp` claim.
+SESSION_TOKEN_CACHE_ENABLED = environ.get('SESSION_TOKEN_CACHE_ENABLED', 'True') == 'True'
+SESSION_TOKEN_CACHE_MAX_SIZE = int(environ.get('SESSION_TOKEN_CACHE_MAX_SIZE', 10000))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -177,12 +228,22 @@ STATIC_ROOT = path.join(BASE_DIR, 'static')
 
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
-    )
+        'api.renderers.FastJSONRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Keyset pagination for list endpoints
+DEFAULT_PAGE_SIZE = int(environ.get('DEFAULT_PAGE_SIZE', 100))
+MAX_PAGE_SIZE = int(environ.get('MAX_PAGE_SIZE', 1000))
+ORDER_STREAM_CHUNK_SIZE = int(environ.get('ORDER_STREAM_CHUNK_SIZE', 2000))
+
 APPEND_SLASH = False
 
 SHOPIFY_API_KEY = environ.get('SHOPIFY_API_KEY')
@@ -190,6 +251,98 @@ SHOPIFY_API_SECRET = environ.get('SHOPIFY_API_SECRET')
 SHOPIFY_API_SCOPES = environ.get('SHOPIFY_API_SCOPES')
 SHOPIFY_API_VERSION = environ.get('SHOPIFY_API_VERSION', 'unstable')
 
+# Serve the Shopify-bound endpoints and the order webhook from native async
+# views. Enable only when running under ASGI (backend.asgi:application).
+SHOPIFY_ASYNC_VIEWS = environ.get('SHOPIFY_ASYNC_VIEWS', 'False') == 'True'
+
+# Outbound Admin API client. SHOPIFY_ADMIN_URL can point at a local fake server.
+SHOPIFY_ADMIN_URL = environ.get('SHOPIFY_ADMIN_URL', 'https://{shop}')
+SHOPIFY_HTTP_TIMEOUT = float(environ.get('SHOPIFY_HTTP_TIMEOUT', 10))
+SHOPIFY_HTTP_MAX_CONNECTIONS = int(environ.get('SHOPIFY_HTTP_MAX_CONNECTIONS', 50))
+SHOPIFY_WEBHOOK_REGISTRATION_WORKERS = int(environ.get('SHOPIFY_WEBHOOK_REGISTRATION_WORKERS', 8))
+
+# Per-shop leaky buckets mirroring Shopify's limits. Calls wait locally once a
+# bucket is within SHOPIFY_RATE_LIMIT_HEADROOM of full; 429s are retried.
+SHOPIFY_REST_BUCKET_SIZE = int(environ.get('SHOPIFY_REST_BUCKET_SIZE', 40))
+SHOPIFY_REST_LEAK_RATE = float(environ.get('SHOPIFY_REST_LEAK_RATE', 2))
+SHOPIFY_GRAPHQL_BUCKET_SIZE = int(environ.get('SHOPIFY_GRAPHQL_BUCKET_SIZE', 1000))
+SHOPIFY_GRAPHQL_RESTORE_RATE = float(environ.get('SHOPIFY_GRAPHQL_RESTORE_RATE', 50))
+SHOPIFY_RATE_LIMIT_HEADROOM = float(environ.get('SHOPIFY_RATE_LIMIT_HEADROOM', 0.1))
+SHOPIFY_MAX_RETRIES = int(environ.get('SHOPIFY_MAX_RETRIES', 3))
+SHOPIFY_RETRY_BACKOFF = float(environ.get('SHOPIFY_RETRY_BACKOFF', 1.0))
+
+# Product catalog syncs run in a background thread under a per-shop lease that
+# expires if the syncing worker stops heartbeating for this long.
+PRODUCT_SYNC_LEASE_SECONDS = int(environ.get('PRODUCT_SYNC_LEASE_SECONDS', 300))
+
+# Accept-then-process webhook ingestion: verified webhooks are queued in the
+# database and applied by `manage.py process_webhook_queue`.
+SHOPIFY_WEBHOOK_ASYNC = environ.get('SHOPIFY_WEBHOOK_ASYNC', 'False') == 'True'
+WEBHOOK_QUEUE_BATCH_SIZE = int(environ.get('WEBHOOK_QUEUE_BATCH_SIZE', 100))
+WEBHOOK_QUEUE_MAX_ATTEMPTS = int(environ.get('WEBHOOK_QUEUE_MAX_ATTEMPTS', 5))
+WEBHOOK_QUEUE_RETRY_DELAY = int(environ.get('WEBHOOK_QUEUE_RETRY_DELAY', 30))
+# Webhooks that fail WEBHOOK_QUEUE_MAX_ATTEMPTS times stay as dead letters for
+# inspection, then `manage.py prune_dead_letters` deletes them after this long.
+WEBHOOK_QUEUE_DEAD_LETTER_RETENTION_HOURS = int(environ.get('WEBHOOK_QUEUE_DEAD_LETTER_RETENTION_HOURS', 168))
+
+# Historical order backfill through Shopify Bulk Operations, run by
+# `manage.py import_orders`. Needs the read_orders scope (read_all_orders for
+# orders older than 60 days). Progress is checkpointed every batch.
+SHOPIFY_IMPORT_ORDERS_ON_INSTALL = environ.get('SHOPIFY_IMPORT_ORDERS_ON_INSTALL', 'False') == 'True'
+ORDER_IMPORT_BATCH_SIZE = int(environ.get('ORDER_IMPORT_BATCH_SIZE', 5000))
+ORDER_IMPORT_POLL_INTERVAL = float(environ.get('ORDER_IMPORT_POLL_INTERVAL', 5))
+ORDER_IMPORT_LEASE_SECONDS = int(environ.get('ORDER_IMPORT_LEASE_SECONDS', 600))
+
+# Webhook event ids are kept for deduplication for longer than Shopify's ~48h
+# retry window, then removed by `manage.py prune_webhook_events`. The optional
+# Bloom filter skips the dedup query for ids that were not recorded by any worker
+# as of its last refresh from the database, every WEBHOOK_DEDUP_BLOOM_REFRESH_SECONDS.
+WEBHOOK_EVENT_RETENTION_HOURS = int(environ.get('WEBHOOK_EVENT_RETENTION_HOURS', 72))
+WEBHOOK_DEDUP_BLOOM_ENABLED = environ.get('WEBHOOK_DEDUP_BLOOM_ENABLED', 'False') == 'True'
+WEBHOOK_DEDUP_BLOOM_CAPACITY = int(environ.get('WEBHOOK_DEDUP_BLOOM_CAPACITY', 1000000))
+WEBHOOK_DEDUP_BLOOM_ERROR_RATE = float(environ.get('WEBHOOK_DEDUP_BLOOM_ERROR_RATE', 0.001))
+WEBHOOK_DEDUP_BLOOM_REFRESH_SECONDS = int(environ.get('WEBHOOK_DEDUP_BLOOM_REFRESH_SECONDS', 5))
+
+# Median worker startup import time, in ms, that the test suite holds
+# `manage.py profile_startup --budget-ms` to.
+STARTUP_IMPORT_BUDGET_MS = float(environ.get('STARTUP_IMPORT_BUDGET_MS', 1000))
+
+# Per-process request metrics, served in the Prometheus text format at /metrics.
+# Set METRICS_TOKEN to require `Authorization: Bearer <token>` from the scraper;
+# without it /metrics answers 404 unless DEBUG is on.
+# SERVER_TIMING_HEADER adds db/shopify/auth timings to every response.
+METRICS_ENABLED = environ.get('METRICS_ENABLED', 'True') == 'True'
+METRICS_TOKEN = environ.get('METRICS_TOKEN')
+SERVER_TIMING_HEADER = environ.get('SERVER_TIMING_HEADER', 'False') == 'True'
+
+# Uninstalled shops are deactivated immediately and their data deleted in
+# batches by `manage.py purge_uninstalled_shops`, under a per-shop lease that
+# expires if the purging worker stops heartbeating for this long.
+SHOP_PURGE_BATCH_SIZE = int(environ.get('SHOP_PURGE_BATCH_SIZE', 5000))
+SHOP_PURGE_LEASE_SECONDS = int(environ.get('SHOP_PURGE_LEASE_SECONDS', 300))
+
+# GDPR webhooks are recorded as compliance jobs and run by
+# `manage.py process_compliance_jobs`. Data request exports are written as
+# gzipped NDJSON under COMPLIANCE_EXPORT_DIR and deleted by
+# `manage.py prune_compliance_exports` once COMPLIANCE_EXPORT_RETENTION_HOURS
+# have passed since the job finished.
+COMPLIANCE_EXPORT_DIR = environ.get('COMPLIANCE_EXPORT_DIR', path.join(BASE_DIR, 'compliance_exports'))
+COMPLIANCE_BATCH_SIZE = int(environ.get('COMPLIANCE_BATCH_SIZE', 5000))
+COMPLIANCE_LEASE_SECONDS = int(environ.get('COMPLIANCE_LEASE_SECONDS', 600))
+COMPLIANCE_MAX_ATTEMPTS = int(environ.get('COMPLIANCE_MAX_ATTEMPTS', 5))
+COMPLIANCE_RETRY_DELAY = int(environ.get('COMPLIANCE_RETRY_DELAY', 60))
+COMPLIANCE_EXPORT_RETENTION_HOURS = int(environ.get('COMPLIANCE_EXPORT_RETENTION_HOURS', 720))
+
+# Order reconciliation against the Admin API, run nightly by `manage.py reconcile_orders`,
+# backfills orders whose webhooks never arrived. Shops run concurrently on
+# ORDER_RECONCILE_WORKERS threads; each re-lists orders updated since its last run
+# (with some overlap), or over the lookback window the first time. A per-shop
+# lease keeps concurrent runs apart and expires if a worker stops heartbeating.
+ORDER_RECONCILE_WORKERS = int(environ.get('ORDER_RECONCILE_WORKERS', 16))
+ORDER_RECONCILE_LOOKBACK_HOURS = int(environ.get('ORDER_RECONCILE_LOOKBACK_HOURS', 72))
+ORDER_RECONCILE_OVERLAP_SECONDS = int(environ.get('ORDER_RECONCILE_OVERLAP_SECONDS', 300))
+ORDER_RECONCILE_LEASE_SECONDS = int(environ.get('ORDER_RECONCILE_LEASE_SECONDS', 600))
+
 
 LOGGING = {
     'version': 1,
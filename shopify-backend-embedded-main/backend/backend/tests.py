@@ -0,0 +1,169 @@
+import json
+import os
+import stat
+import tempfile
+import time
+from unittest import mock, skipUnless
+
+from django.db import connections
+from django.test import SimpleTestCase
+
+from . import aws_secrets_manager as secrets
+
+try:
+    from cryptography.fernet import Fernet
+except ImportError:
+    Fernet = None
+
+SECRET = {'username': 'app', 'password': 'first'}
+ROTATED = {'username': 'app', 'password': 'second'}
+
+
+class StubBackend:
+    """Returns the queued secrets in turn; an Exception in the queue is raised instead."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def fetch(self):
+        self.calls += 1
+        result = self.results.pop(0) if len(self.results) > 1 else self.results[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class BackendTests(SimpleTestCase):
+    def test_file_backend_rereads_the_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'secret.json')
+            backend = secrets.FileBackend(path)
+
+            with open(path, 'w') as f:
+                json.dump(SECRET, f)
+            self.assertEqual(backend.fetch(), SECRET)
+
+            with open(path, 'w') as f:
+                json.dump(ROTATED, f)
+            self.assertEqual(backend.fetch(), ROTATED)
+
+    def test_env_backend(self):
+        backend = secrets.EnvBackend('TEST_DB_SECRET')
+
+        with mock.patch.dict(os.environ, {'TEST_DB_SECRET': json.dumps(SECRET)}):
+            self.assertEqual(backend.fetch(), SECRET)
+
+        with mock.patch.dict(os.environ, clear=True), self.assertRaises(secrets.SecretUnavailable):
+            backend.fetch()
+
+    def test_aws_backend_reuses_one_client(self):
+        client = mock.Mock()
+        client.get_secret_value.return_value = {'SecretString': json.dumps(SECRET)}
+
+        with mock.patch('boto3.session.Session') as session:
+            session.return_value.client.return_value = client
+            backend = secrets.AWSSecretsManagerBackend('db-secret', 'eu-west-1', timeout=2)
+
+            self.assertEqual(backend.fetch(), SECRET)
+            self.assertEqual(backend.fetch(), SECRET)
+
+        self.assertEqual(session.return_value.client.call_count, 1)
+        client.get_secret_value.assert_called_with(SecretId='db-secret')
+
+    def test_build_backend_follows_secret_backend(self):
+        with mock.patch.dict(os.environ, {'SECRET_BACKEND': 'file', 'SECRET_FILE': '/run/secrets/db'}):
+            backend = secrets.build_backend()
+        self.assertIsInstance(backend, secrets.FileBackend)
+        self.assertEqual(backend.path, '/run/secrets/db')
+
+        with mock.patch.dict(os.environ, {'SECRET_BACKEND': 'env'}):
+            self.assertIsInstance(secrets.build_backend(), secrets.EnvBackend)
+
+        with mock.patch.dict(os.environ, {'SECRET_BACKEND': 'vault'}), self.assertRaises(ValueError):
+            secrets.build_backend()
+
+
+@skipUnless(Fernet, "cryptography is not installed")
+class EncryptedFileCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'secret.cache')
+        self.key = Fernet.generate_key()
+
+    def test_round_trip(self):
+        secrets.EncryptedFileCache(self.path, self.key).store(SECRET, 1700000000)
+
+        self.assertEqual(secrets.EncryptedFileCache(self.path, self.key).load(), (SECRET, 1700000000))
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+        with open(self.path, 'rb') as f:
+            self.assertNotIn(b'first', f.read())
+
+    def test_missing_or_unreadable_cache_is_ignored(self):
+        cache = secrets.EncryptedFileCache(self.path, self.key)
+        self.assertIsNone(cache.load())
+
+        cache.store(SECRET, 1700000000)
+        self.assertIsNone(secrets.EncryptedFileCache(self.path, Fernet.generate_key()).load())
+
+    def test_cold_start_uses_the_disk_copy_when_the_backend_fails(self):
+        secrets.EncryptedFileCache(self.path, self.key).store(SECRET, 1700000000)
+        provider = secrets.SecretProvider(
+            StubBackend(RuntimeError("unreachable")), disk_cache=secrets.EncryptedFileCache(self.path, self.key),
+        )
+
+        self.assertEqual(provider.get(), SECRET)
+
+    def test_fresh_disk_copy_skips_the_backend(self):
+        secrets.EncryptedFileCache(self.path, self.key).store(SECRET, time.time())
+        backend = StubBackend(ROTATED)
+        provider = secrets.SecretProvider(backend, disk_cache=secrets.EncryptedFileCache(self.path, self.key))
+
+        self.assertEqual(provider.get(), SECRET)
+        self.assertEqual(backend.calls, 0)
+
+
+class SecretProviderTests(SimpleTestCase):
+    def test_serves_from_memory_within_the_ttl(self):
+        backend = StubBackend(SECRET)
+        provider = secrets.SecretProvider(backend, ttl=3600)
+
+        self.assertEqual(provider.get(), SECRET)
+        self.assertEqual(provider.get(), SECRET)
+        self.assertEqual(backend.calls, 1)
+
+    def test_backend_failure_keeps_the_last_value(self):
+        provider = secrets.SecretProvider(StubBackend(SECRET, RuntimeError("throttled")))
+        provider.get()
+
+        self.assertFalse(provider.refresh())
+        self.assertEqual(provider.get(), SECRET)
+
+    def test_first_fetch_failure_raises(self):
+        provider = secrets.SecretProvider(StubBackend(RuntimeError("unreachable")))
+
+        with self.assertRaises(secrets.SecretUnavailable):
+            provider.get()
+
+    def test_rotation_updates_the_database_credentials(self):
+        provider = secrets.SecretProvider(StubBackend(SECRET, ROTATED))
+        provider.on_change(secrets.update_database_credentials)
+        provider.get()
+
+        with mock.patch.dict(connections.settings['default']):
+            self.assertTrue(provider.refresh())
+            self.assertEqual(connections.settings['default']['USER'], 'app')
+            self.assertEqual(connections.settings['default']['PASSWORD'], 'second')
+
+        self.assertFalse(provider.refresh())
+
+    def test_failing_listener_does_not_stop_the_others(self):
+        provider = secrets.SecretProvider(StubBackend(SECRET, ROTATED))
+        seen = []
+        provider.on_change(mock.Mock(side_effect=RuntimeError("boom")))
+        provider.on_change(seen.append)
+        provider.get()
+
+        self.assertTrue(provider.refresh())
+        self.assertEqual(seen, [ROTATED])
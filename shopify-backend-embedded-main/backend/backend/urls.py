@@ -17,7 +17,10 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from api.views.metrics import Metrics
+
 urlpatterns = [
+    path('metrics', Metrics.as_view(), name='metrics'),
     path('v1/shopify/api/', include('api.urls')),
     path('v1/shopify/compliance', include('compliance.urls')),
 ]
@@ -1,3 +1,10 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import ComplianceJob
+
+
+@admin.register(ComplianceJob)
+class ComplianceJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'topic', 'shop_domain', 'status', 'processed', 'attempts', 'updated_at')
+    list_filter = ('topic', 'status')
+    search_fields = ('shop_domain',)
@@ -0,0 +1,241 @@
+import gzip
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from api.models import RedactedOrder, Shop
+from api.utils import db, fast_json, purge, queue, rollup
+
+from .models import ComplianceJob
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH = '''
+    SELECT id, order_id, currency, current_subtotal_price, financial_status, created_at, updated_at, cancelled_at
+    FROM api_order
+    WHERE shop_id = %s AND order_id = ANY(%s) AND id > %s
+    ORDER BY id
+    LIMIT %s
+'''
+
+# Deletes one batch of the customer's orders and takes them back out of the rollups.
+REDACT_BATCH = f'''
+    WITH redacted AS (
+        DELETE FROM api_order WHERE id IN (
+            SELECT id FROM api_order WHERE shop_id = %s AND order_id = ANY(%s) LIMIT %s
+        )
+        RETURNING shop_id, currency, current_subtotal_price, created_at
+    ), retracted AS ({rollup.ROLLUP_RETRACT.format(source='redacted')})
+    SELECT count(*) FROM redacted
+'''
+
+
+def enqueue(topic, payload, event_id=None, shop_domain=None):
+    """Record a compliance webhook as a pending job. Redelivered events are stored once."""
+    current_timestamp = int(time.time())
+    customer = payload.get('customer') or {}
+    data_request = payload.get('data_request') or {}
+    order_ids = payload.get('orders_requested') or payload.get('orders_to_redact') or []
+
+    ComplianceJob.objects.bulk_create(
+        [ComplianceJob(
+            topic=topic,
+            shop_domain=payload.get('shop_domain') or shop_domain,
+            event_id=event_id,
+            data_request_id=data_request.get('id'),
+            customer_id=customer.get('id'),
+            order_ids=[int(order_id) for order_id in order_ids],
+            created_at=current_timestamp,
+            updated_at=current_timestamp,
+            available_at=current_timestamp,
+        )],
+        ignore_conflicts=True,
+    )
+
+
+def claim_job(job_id=None):
+    """Lock and mark running the next pending job, or one whose worker stopped heartbeating."""
+    current_timestamp = int(time.time())
+    lease_expired_at = current_timestamp - settings.COMPLIANCE_LEASE_SECONDS
+
+    with transaction.atomic():
+        jobs = ComplianceJob.objects.select_for_update(skip_locked=True).filter(
+            Q(status=ComplianceJob.PENDING, available_at__lte=current_timestamp)
+            | Q(status=ComplianceJob.RUNNING, updated_at__lt=lease_expired_at)
+        )
+        if job_id is not None:
+            jobs = jobs.filter(id=job_id)
+
+        job = jobs.order_by('id').first()
+        if job is not None:
+            job.status = ComplianceJob.RUNNING
+            job.attempts += 1
+            job.updated_at = current_timestamp
+            job.save(update_fields=['status', 'attempts', 'updated_at'])
+
+    return job
+
+
+def heartbeat(job, **fields):
+    """Persist job fields and extend the worker's lease on it."""
+    fields['updated_at'] = int(time.time())
+    ComplianceJob.objects.filter(id=job.id).update(**fields)
+
+    for name, value in fields.items():
+        setattr(job, name, value)
+
+
+def export_path(job):
+    name = f"{job.shop_domain}-{job.data_request_id or 'request'}-{job.id}.ndjson.gz"
+    return os.path.join(settings.COMPLIANCE_EXPORT_DIR, name)
+
+
+def append_member(f, rows):
+    """Append rows as one gzip member and sync it; readers see concatenated members as one stream."""
+    with gzip.GzipFile(fileobj=f, mode='wb') as member:
+        for row in rows:
+            member.write(fast_json.dumps(row) + b'\n')
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def export_customer_data(job, shop_id, batch_size):
+    """
+    Write the requested orders to a gzipped NDJSON file, batch_size rows at a time.
+
+    Every batch is fetched by keyset, appended as its own gzip member and checkpointed, so
+    memory stays bounded and a resumed job truncates the file back to its last checkpoint.
+    """
+    path = job.export_path or export_path(job)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    heartbeat(job, export_path=path)
+
+    with open(path, 'ab') as f:
+        f.truncate(job.export_size)
+
+        while True:
+            with connection.cursor() as cursor:
+                cursor.execute(EXPORT_BATCH, [shop_id, job.order_ids, job.cursor, batch_size])
+                rows = db.dictfetchall(cursor)
+            if not rows:
+                break
+
+            append_member(f, [{key: value for key, value in row.items() if key != 'id'} for row in rows])
+            heartbeat(job, cursor=rows[-1]['id'], processed=job.processed + len(rows), export_size=f.tell())
+
+    logger.info(f"Exported {job.processed} orders for compliance job {job.id} to {path}")
+
+
+def record_redacted(job, shop_id):
+    """Tombstone the job's orders, so no webhook, reconciliation or import stores them again."""
+    current_timestamp = int(time.time())
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # Exclusive, so upserts already under way finish first and later ones see the tombstones.
+            rollup.lock_shops(cursor, [shop_id], shared=False)
+        RedactedOrder.objects.bulk_create(
+            [
+                RedactedOrder(shop_domain=job.shop_domain, order_id=order_id, redacted_at=current_timestamp)
+                for order_id in job.order_ids
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def redact_customer(job, shop_id, batch_size):
+    """Delete the customer's orders batch_size at a time, one transaction per batch, and their queued webhooks."""
+    record_redacted(job, shop_id)
+
+    # Queued order webhooks carry the customer's details too.
+    queued = queue.delete_customer_webhooks(job.shop_domain, job.order_ids, job.customer_id, batch_size)
+    if queued:
+        logger.info(f"Deleted {queued} queued webhooks for compliance job {job.id}")
+
+    while True:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                rollup.lock_shops(cursor, [shop_id])
+                cursor.execute(REDACT_BATCH, [shop_id, job.order_ids, batch_size])
+                deleted = cursor.fetchone()[0]
+            heartbeat(job, processed=job.processed + deleted)
+
+        if deleted < batch_size:
+            break
+
+    logger.info(f"Redacted {job.processed} orders for compliance job {job.id}")
+
+
+def redact_shop(job, shop_id, batch_size):
+    """Remove everything stored for the shop through the uninstall purge."""
+    purge.mark_uninstalled(job.shop_domain)
+
+    already_processed = job.processed
+    deleted_by_table = {}
+    for table, deleted in purge.purge_shop(shop_id, batch_size):
+        deleted_by_table[table] = deleted
+        heartbeat(job, processed=already_processed + sum(deleted_by_table.values()))
+
+    if Shop.objects.filter(id=shop_id).exists():
+        raise RuntimeError(f"Shop {job.shop_domain} is being purged by another worker")
+
+
+def expired_exports(retention_hours=None):
+    """Data request jobs whose export file has outlived the retention window, counted from when they finished."""
+    retention_hours = retention_hours or settings.COMPLIANCE_EXPORT_RETENTION_HOURS
+    cutoff = int(time.time()) - retention_hours * 3600
+
+    return ComplianceJob.objects.filter(topic=ComplianceJob.CUSTOMERS_DATA_REQUEST, export_path__isnull=False).filter(
+        Q(status=ComplianceJob.COMPLETED, completed_at__lt=cutoff) | Q(status=ComplianceJob.FAILED, updated_at__lt=cutoff)
+    )
+
+
+def prune_exports(retention_hours=None):
+    """Delete expired export files and forget their paths. Yields each job whose export was removed."""
+    for job in expired_exports(retention_hours).order_by('id').iterator():
+        try:
+            os.remove(job.export_path)
+        except FileNotFoundError:
+            pass
+
+        ComplianceJob.objects.filter(id=job.id).update(export_path=None, export_size=0)
+        logger.info(f"Deleted export {job.export_path} of compliance job {job.id}")
+        yield job
+
+
+HANDLERS = {
+    ComplianceJob.CUSTOMERS_DATA_REQUEST: export_customer_data,
+    ComplianceJob.CUSTOMERS_REDACT: redact_customer,
+    ComplianceJob.SHOP_REDACT: redact_shop,
+}
+
+
+def run_job(job, batch_size=None):
+    """Run a claimed job to completion from its checkpoint. Failures are retried until COMPLIANCE_MAX_ATTEMPTS."""
+    batch_size = batch_size or settings.COMPLIANCE_BATCH_SIZE
+
+    try:
+        shop_id = Shop.objects.filter(domain=job.shop_domain).values_list('id', flat=True).first()
+        # Nothing is stored for a shop that was never installed or is already purged.
+        if shop_id is not None:
+            HANDLERS[job.topic](job, shop_id, batch_size)
+
+        heartbeat(job, status=ComplianceJob.COMPLETED, completed_at=int(time.time()), last_error='')
+        logger.info(f"Compliance job {job.id} ({job.topic}) for shop {job.shop_domain} completed")
+
+    except Exception as e:
+        retry = job.attempts < settings.COMPLIANCE_MAX_ATTEMPTS
+        logger.error(f"Compliance job {job.id} ({job.topic}) for shop {job.shop_domain} failed{', will retry' if retry else ''}: {e}")
+        heartbeat(
+            job,
+            status=ComplianceJob.PENDING if retry else ComplianceJob.FAILED,
+            available_at=int(time.time()) + settings.COMPLIANCE_RETRY_DELAY * job.attempts,
+            last_error=str(e),
+        )
+        raise
+
+    return job
@@ -0,0 +1,51 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ... import jobs
+from ...models import ComplianceJob
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Run queued GDPR compliance jobs (data request exports, customer and shop redaction), resuming unfinished ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--job', type=int, default=None, help="Run only this job.")
+        parser.add_argument('--batch-size', type=int, default=None, help="Rows exported or deleted per batch.")
+        parser.add_argument('--poll-interval', type=float, default=10.0, help="Seconds to sleep when no job is pending.")
+        parser.add_argument('--once', action='store_true', help="Exit once no job is pending.")
+
+    def handle(self, *args, **options):
+        if options['job'] is not None:
+            job = jobs.claim_job(options['job'])
+            if job is None:
+                raise CommandError(f"Compliance job {options['job']} is not pending or is running in another worker.")
+            try:
+                jobs.run_job(job, options['batch_size'])
+            except Exception as e:
+                raise CommandError(f"Compliance job {job.id} failed after {job.processed} rows: {e}")
+            self.report(job)
+            return
+
+        while True:
+            job = jobs.claim_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+
+            try:
+                jobs.run_job(job, options['batch_size'])
+                self.report(job)
+            except Exception as e:
+                logger.error(f"Compliance job {job.id} stopped at {job.processed} rows: {e}")
+
+    def report(self, job):
+        message = f"Compliance job {job.id} ({job.topic}) for {job.shop_domain} completed: {job.processed} rows"
+        if job.topic == ComplianceJob.CUSTOMERS_DATA_REQUEST and job.export_path:
+            message += f", exported to {job.export_path}"
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ... import jobs
+
+
+class Command(BaseCommand):
+    help = "Delete data request export files older than the retention window."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-hours', type=int, default=settings.COMPLIANCE_EXPORT_RETENTION_HOURS)
+        parser.add_argument('--report-only', action='store_true', help="Only list expired exports; delete nothing.")
+
+    def handle(self, *args, **options):
+        if options['report_only']:
+            for job in jobs.expired_exports(options['retention_hours']).order_by('id'):
+                self.stdout.write(f"Compliance job {job.id} for {job.shop_domain}: {job.export_path}")
+            return
+
+        pruned = 0
+        for job in jobs.prune_exports(options['retention_hours']):
+            pruned += 1
+            self.stdout.write(f"Deleted {job.export_path}")
+
+        self.stdout.write(self.style.SUCCESS(f"Pruned {pruned} exports older than {options['retention_hours']}h."))
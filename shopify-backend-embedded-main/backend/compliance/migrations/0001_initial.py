@@ -0,0 +1,37 @@
+# Generated by Django 5.1.2 on 2026-10-18 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComplianceJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(choices=[('customers/data_request', 'Customer data request'), ('customers/redact', 'Customer redaction'), ('shop/redact', 'Shop redaction')], max_length=32)),
+                ('shop_domain', models.CharField(max_length=255)),
+                ('event_id', models.CharField(blank=True, max_length=255, null=True, unique=True)),
+                ('data_request_id', models.BigIntegerField(blank=True, null=True)),
+                ('customer_id', models.BigIntegerField(blank=True, null=True)),
+                ('order_ids', models.JSONField(default=list)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=16)),
+                ('attempts', models.IntegerField(default=0)),
+                ('cursor', models.BigIntegerField(default=0)),
+                ('processed', models.BigIntegerField(default=0)),
+                ('export_path', models.TextField(blank=True, null=True)),
+                ('export_size', models.BigIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.BigIntegerField()),
+                ('updated_at', models.BigIntegerField()),
+                ('available_at', models.BigIntegerField()),
+                ('completed_at', models.BigIntegerField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -1,3 +1,45 @@
 from django.db import models
 
-# Create your models here.
+
+class ComplianceJob(models.Model):
+    CUSTOMERS_DATA_REQUEST = 'customers/data_request'
+    CUSTOMERS_REDACT = 'customers/redact'
+    SHOP_REDACT = 'shop/redact'
+    TOPIC_CHOICES = [
+        (CUSTOMERS_DATA_REQUEST, 'Customer data request'),
+        (CUSTOMERS_REDACT, 'Customer redaction'),
+        (SHOP_REDACT, 'Shop redaction'),
+    ]
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (COMPLETED, 'Completed'), (FAILED, 'Failed')]
+
+    topic = models.CharField(max_length=32, choices=TOPIC_CHOICES)
+    shop_domain = models.CharField(max_length=255)
+    # Redeliveries of the same webhook share an event id and are stored once.
+    event_id = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    data_request_id = models.BigIntegerField(null=True, blank=True)
+    customer_id = models.BigIntegerField(null=True, blank=True)
+    # Shopify order ids named by the request; the customer's email and phone are not kept.
+    order_ids = models.JSONField(default=list)
+
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.IntegerField(default=0)
+    # Highest api_order.id exported so far, and rows exported, redacted or purged so far.
+    cursor = models.BigIntegerField(default=0)
+    processed = models.BigIntegerField(default=0)
+    export_path = models.TextField(null=True, blank=True)
+    # Size of the export file at the last checkpoint; a resumed export truncates back to it.
+    export_size = models.BigIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+
+    created_at = models.BigIntegerField()
+    updated_at = models.BigIntegerField()
+    available_at = models.BigIntegerField()
+    completed_at = models.BigIntegerField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.topic} {self.id} for {self.shop_domain} ({self.status})"
@@ -1,3 +1,233 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import tempfile
+import time
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.db import transaction
+from django.db.models import Sum
+from django.test import Client, TestCase, override_settings
+
+from api.models import Order, OrderDailyRollup, QueuedWebhook, RedactedOrder, Shop
+from api.tests import FakeShopifyMixin
+from api.utils import ingest, loadgen, reconcile
+
+from . import jobs
+from .models import ComplianceJob
+
+SHOP = 'privacy.myshopify.com'
+CUSTOMER_ID = 115310627314723954
+
+
+def store_orders(shop, order_ids, created_at=1700000000):
+    rows = [(order_id, shop.id, 'USD', Decimal('10.000'), created_at, created_at, 'paid', None) for order_id in order_ids]
+    with transaction.atomic():
+        ingest.upsert_orders(rows)
+
+
+def queue_order_webhook(order_id, attempts=0, customer_id=CUSTOMER_ID):
+    body = dict(loadgen.order_payload(order_id, '2024-01-01T10:00:00Z'), customer={'id': customer_id})
+    return QueuedWebhook.objects.create(
+        topic='orders/updated', shop_domain=SHOP, body=json.dumps(body).encode(),
+        attempts=attempts, created_at=1, available_at=1,
+    )
+
+
+class ComplianceTestCase(TestCase):
+    def setUp(self):
+        self.shop = Shop.objects.create(domain=SHOP, access_token='token', access_scopes='', created_at=1)
+        store_orders(self.shop, [1, 2, 3, 4, 5])
+
+        export_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(export_dir.cleanup)
+        export_settings = override_settings(COMPLIANCE_EXPORT_DIR=export_dir.name)
+        export_settings.enable()
+        self.addCleanup(export_settings.disable)
+
+    def create_job(self, topic, order_ids=(), **fields):
+        jobs.enqueue(topic, {'shop_domain': SHOP, 'customer': {'id': CUSTOMER_ID}, 'orders_requested': list(order_ids)}, **fields)
+        return ComplianceJob.objects.order_by('-id').first()
+
+    def run_job(self, job, batch_size=2):
+        return jobs.run_job(jobs.claim_job(job.id), batch_size)
+
+
+class ComplianceWebhookTests(ComplianceTestCase):
+    def post(self, topic, payload, event_id='event-1'):
+        body = json.dumps(payload).encode()
+        return Client().post(
+            '/v1/shopify/compliance', body, content_type='application/json',
+            HTTP_X_SHOPIFY_TOPIC=topic, HTTP_X_SHOPIFY_SHOP_DOMAIN=SHOP, HTTP_X_SHOPIFY_EVENT_ID=event_id,
+            HTTP_X_SHOPIFY_HMAC_SHA256=loadgen.sign_webhook(body),
+        )
+
+    def test_each_topic_is_queued_as_its_job(self):
+        payloads = {
+            ComplianceJob.CUSTOMERS_DATA_REQUEST: {
+                'shop_domain': SHOP, 'customer': {'id': CUSTOMER_ID}, 'orders_requested': [1], 'data_request': {'id': 9},
+            },
+            ComplianceJob.CUSTOMERS_REDACT: {'shop_domain': SHOP, 'customer': {'id': CUSTOMER_ID}, 'orders_to_redact': [2, 3]},
+            ComplianceJob.SHOP_REDACT: {'shop_domain': SHOP},
+        }
+        for topic, payload in payloads.items():
+            self.assertEqual(self.post(topic, payload, event_id=topic).status_code, 200)
+
+        queued = {job.topic: job for job in ComplianceJob.objects.all()}
+        self.assertEqual(set(queued), set(payloads))
+        self.assertEqual(queued[ComplianceJob.CUSTOMERS_DATA_REQUEST].data_request_id, 9)
+        self.assertEqual(queued[ComplianceJob.CUSTOMERS_REDACT].order_ids, [2, 3])
+        self.assertEqual(queued[ComplianceJob.SHOP_REDACT].status, ComplianceJob.PENDING)
+
+    def test_redelivery_is_queued_once(self):
+        payload = {'shop_domain': SHOP, 'customer': {'id': CUSTOMER_ID}, 'orders_to_redact': [2]}
+        self.post(ComplianceJob.CUSTOMERS_REDACT, payload)
+        self.post(ComplianceJob.CUSTOMERS_REDACT, payload)
+
+        self.assertEqual(ComplianceJob.objects.count(), 1)
+
+    def test_unsupported_topic_and_bad_signature_are_rejected(self):
+        self.assertEqual(self.post('customers/delete', {'shop_domain': SHOP}).status_code, 400)
+
+        response = Client().post(
+            '/v1/shopify/compliance', b'{}', content_type='application/json',
+            HTTP_X_SHOPIFY_TOPIC=ComplianceJob.SHOP_REDACT, HTTP_X_SHOPIFY_HMAC_SHA256='bad',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ComplianceJob.objects.exists())
+
+    def test_payload_that_is_not_an_object_is_rejected(self):
+        for payload in ([], 'x', 1):
+            with self.subTest(payload=payload):
+                self.assertEqual(self.post(ComplianceJob.SHOP_REDACT, payload).status_code, 400)
+
+        self.assertFalse(ComplianceJob.objects.exists())
+
+    def test_jobs_are_routed_to_their_handler(self):
+        for topic in (ComplianceJob.CUSTOMERS_DATA_REQUEST, ComplianceJob.CUSTOMERS_REDACT, ComplianceJob.SHOP_REDACT):
+            job = self.create_job(topic, [1], event_id=topic)
+            handler = mock.Mock()
+
+            with mock.patch.dict(jobs.HANDLERS, {topic: handler}):
+                self.run_job(job)
+
+            handler.assert_called_once()
+            self.assertEqual(handler.call_args.args[1:], (self.shop.id, 2))
+            self.assertEqual(ComplianceJob.objects.get(id=job.id).status, ComplianceJob.COMPLETED)
+
+    def test_unknown_shop_completes_without_work(self):
+        jobs.enqueue(ComplianceJob.SHOP_REDACT, {'shop_domain': 'never-installed.myshopify.com'})
+
+        job = self.run_job(ComplianceJob.objects.get())
+
+        self.assertEqual(job.status, ComplianceJob.COMPLETED)
+        self.assertEqual(Order.objects.count(), 5)
+
+
+class ExportTests(ComplianceTestCase):
+    def read_export(self, job):
+        with gzip.open(job.export_path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_export_writes_the_requested_orders(self):
+        job = self.run_job(self.create_job(ComplianceJob.CUSTOMERS_DATA_REQUEST, [1, 3, 5]))
+
+        self.assertEqual([row['order_id'] for row in self.read_export(job)], [1, 3, 5])
+        self.assertEqual(job.processed, 3)
+
+    def test_resumed_export_truncates_back_to_its_checkpoint(self):
+        job = self.create_job(ComplianceJob.CUSTOMERS_DATA_REQUEST, [1, 2, 3, 4, 5])
+        append_member, calls = jobs.append_member, []
+
+        def crash_after_second_write(f, rows):
+            # The second batch reaches the file but the worker dies before checkpointing it.
+            append_member(f, rows)
+            calls.append(rows)
+            if len(calls) == 2:
+                raise RuntimeError("worker stopped")
+
+        with mock.patch.object(jobs, 'append_member', crash_after_second_write), self.assertRaises(RuntimeError):
+            self.run_job(job)
+
+        interrupted = ComplianceJob.objects.get(id=job.id)
+        self.assertEqual(interrupted.processed, 2)
+        self.assertGreater(os.path.getsize(interrupted.export_path), interrupted.export_size)
+
+        ComplianceJob.objects.filter(id=job.id).update(available_at=0)
+        job = self.run_job(interrupted)
+
+        self.assertEqual([row['order_id'] for row in self.read_export(job)], [1, 2, 3, 4, 5])
+        self.assertEqual(job.processed, 5)
+
+    def test_expired_exports_are_deleted(self):
+        old = self.run_job(self.create_job(ComplianceJob.CUSTOMERS_DATA_REQUEST, [1], event_id='old'))
+        recent = self.run_job(self.create_job(ComplianceJob.CUSTOMERS_DATA_REQUEST, [2], event_id='recent'))
+        ComplianceJob.objects.filter(id=old.id).update(completed_at=int(time.time()) - 48 * 3600)
+
+        pruned = list(jobs.prune_exports(retention_hours=24))
+
+        self.assertEqual([job.id for job in pruned], [old.id])
+        self.assertFalse(os.path.exists(old.export_path))
+        self.assertTrue(os.path.exists(recent.export_path))
+        self.assertIsNone(ComplianceJob.objects.get(id=old.id).export_path)
+
+
+class RedactionTests(ComplianceTestCase):
+    def rollup_totals(self):
+        return OrderDailyRollup.objects.filter(shop=self.shop).aggregate(orders=Sum('order_count'), subtotal=Sum('subtotal_sum'))
+
+    def test_redaction_retracts_orders_from_the_rollups(self):
+        self.assertEqual(self.rollup_totals(), {'orders': 5, 'subtotal': Decimal('50.000')})
+
+        job = self.run_job(self.create_job(ComplianceJob.CUSTOMERS_REDACT, [1, 2, 3]))
+
+        self.assertEqual(job.processed, 3)
+        self.assertEqual(sorted(Order.objects.values_list('order_id', flat=True)), [4, 5])
+        self.assertEqual(self.rollup_totals(), {'orders': 2, 'subtotal': Decimal('20.000')})
+
+    def test_redaction_deletes_queued_webhooks_and_dead_letters(self):
+        pending = queue_order_webhook(1)
+        dead_letter = queue_order_webhook(2, attempts=10)
+        same_customer = queue_order_webhook(99)
+        unrelated = queue_order_webhook(4, customer_id=1)
+
+        self.run_job(self.create_job(ComplianceJob.CUSTOMERS_REDACT, [1, 2]))
+
+        remaining = set(QueuedWebhook.objects.values_list('id', flat=True))
+        self.assertNotIn(pending.id, remaining)
+        self.assertNotIn(dead_letter.id, remaining)
+        self.assertNotIn(same_customer.id, remaining)
+        self.assertIn(unrelated.id, remaining)
+
+    def test_redacted_orders_are_not_stored_again(self):
+        self.run_job(self.create_job(ComplianceJob.CUSTOMERS_REDACT, [1, 2]))
+
+        later = (1, self.shop.id, 'USD', Decimal('10.000'), 1700000000, 1700009999, 'refunded', None)
+        with transaction.atomic():
+            self.assertEqual(ingest.upsert_orders([later]), [])
+
+        self.assertEqual(sorted(RedactedOrder.objects.values_list('order_id', flat=True)), [1, 2])
+        self.assertFalse(Order.objects.filter(order_id__in=[1, 2]).exists())
+
+
+class ReconcileAfterRedactionTests(FakeShopifyMixin, TestCase):
+    fake_options = {'orders': 5}
+
+    def setUp(self):
+        super().setUp()
+        self.shop = Shop.objects.create(domain=SHOP, access_token='token', access_scopes='', created_at=1)
+
+    def test_reconciliation_does_not_restore_redacted_orders(self):
+        reconcile.reconcile_shop(self.shop)
+        redacted = [order['id'] for order in self.fake.orders[:2]]
+        jobs.enqueue(ComplianceJob.CUSTOMERS_REDACT, {'shop_domain': SHOP, 'customer': {'id': CUSTOMER_ID}, 'orders_to_redact': redacted})
+        jobs.run_job(jobs.claim_job(), 100)
+
+        # From scratch: every order is listed again, and Shopify still counts the redacted ones.
+        Shop.objects.filter(id=self.shop.id).update(orders_reconciled_at=None)
+        stats = reconcile.reconcile_shop(Shop.objects.get(id=self.shop.id))
+
+        self.assertEqual(stats, {'inserted': 0, 'updated': 0})
+        self.assertEqual(Order.objects.filter(shop=self.shop).count(), 3)
+        self.assertFalse(Order.objects.filter(order_id__in=redacted).exists())
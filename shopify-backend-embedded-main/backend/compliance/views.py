@@ -8,10 +8,16 @@ from rest_framework import status
 
 from api.utils import webhook
 
+from . import jobs
+from .models import ComplianceJob
+
 logger = logging.getLogger(__name__)
 
+COMPLIANCE_TOPICS = {topic for topic, _ in ComplianceJob.TOPIC_CHOICES}
+
+
 class ComplianceWebhook(APIView):
-    """Handle compliance-related webhook requests."""
+    """Handle compliance-related webhook requests by queueing a compliance job for the topic."""
 
     @method_decorator(csrf_exempt)
     def post(self, request):
@@ -19,10 +25,28 @@ class ComplianceWebhook(APIView):
         if not webhook.validate_webhook(request):
             logger.warning("Invalid compliance webhook signature.")
             return Response({"error": "Invalid webhook signature"}, status=status.HTTP_400_BAD_REQUEST)
-        
+
+        topic = request.META.get('HTTP_X_SHOPIFY_TOPIC')
+        if topic not in COMPLIANCE_TOPICS:
+            return Response({"error": f"Unsupported topic: {topic}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not isinstance(request.data, dict):
+            logger.error(f"Invalid compliance webhook payload for topic {topic}: not a JSON object")
+            return Response({"error": "Invalid payload"}, status=status.HTTP_400_BAD_REQUEST)
+
         try:
+            # Exports and redactions can touch many rows; `manage.py process_compliance_jobs` runs them.
+            jobs.enqueue(
+                topic,
+                request.data,
+                event_id=request.META.get('HTTP_X_SHOPIFY_EVENT_ID'),
+                shop_domain=request.META.get('HTTP_X_SHOPIFY_SHOP_DOMAIN'),
+            )
             return Response(status=status.HTTP_200_OK)
-        
+
+        except (TypeError, ValueError) as e:
+            logger.error(f"Invalid compliance webhook payload for topic {topic}: {e}")
+            return Response({"error": "Invalid payload"}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             logger.error(f"Error processing compliance webhook: {e}")
             return Response({"error": "Internal server error"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)